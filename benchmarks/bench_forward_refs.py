@@ -0,0 +1,62 @@
+"""Memory retained by forward references built at runtime.
+
+Each simulated request allocates a large payload in a local variable
+and builds a forward reference, which outlives the request.  We report
+how much payload is still alive afterwards, with and without
+_ForwardRef.keep_frames.
+
+Run with either Python 2 or 3 from the repository root:
+
+    python benchmarks/bench_forward_refs.py
+"""
+
+from __future__ import print_function
+
+import gc
+import os
+import sys
+import weakref
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'python2' if sys.version_info[0] < 3
+                                else 'src'))
+
+import typing  # noqa
+
+REQUESTS = 100
+PAYLOAD_SIZE = 1024 * 1024
+
+
+class Payload(object):
+
+    def __init__(self, size):
+        self.data = bytearray(size)
+
+
+def handle_request(alive):
+    payload = Payload(PAYLOAD_SIZE)
+    alive.append(weakref.ref(payload))
+    return typing.Union[int, typing._ForwardRef('Payload')]
+
+
+def retained(keep_frames):
+    typing._ForwardRef.keep_frames = keep_frames
+    try:
+        alive = []
+        refs = [handle_request(alive) for _ in range(REQUESTS)]
+        gc.collect()
+        count = sum(1 for ref in alive if ref() is not None)
+        del refs
+        return count * PAYLOAD_SIZE
+    finally:
+        typing._ForwardRef.keep_frames = False
+
+
+def main():
+    for keep_frames in (True, False):
+        print('keep_frames=%-5s retained %8.1f KiB after %d requests' %
+              (keep_frames, retained(keep_frames) / 1024.0, REQUESTS))
+
+
+if __name__ == '__main__':
+    main()
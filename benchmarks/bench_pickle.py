@@ -0,0 +1,56 @@
+"""Pickled size and round trip time of task descriptors holding types.
+
+Each task carries a few subscripted types, as when sending typed work
+items to multiprocessing or concurrent.futures workers.  We report the
+bytes per task and the time to pickle and unpickle one task, for each
+pickle protocol from 2 on.
+
+Run with either Python 2 or 3 from the repository root:
+
+    python benchmarks/bench_pickle.py
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'python2' if sys.version_info[0] < 3
+                                else 'src'))
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+import typing  # noqa
+from typing import Callable, Dict, List, Optional, Tuple, Union  # noqa
+
+NUMBER = 10000
+
+
+def make_task(i):
+    return {
+        'id': i,
+        'input': Dict[str, List[int]],
+        'output': Optional[Tuple[int, ...]],
+        'key': Union[int, str],
+        'callback': Callable[[int], None],
+    }
+
+
+def main():
+    task = make_task(0)
+    for proto in range(2, pickle.HIGHEST_PROTOCOL + 1):
+        size = len(pickle.dumps(task, proto))
+        usec = min(timeit.repeat(
+            lambda: pickle.loads(pickle.dumps(task, proto)),
+            repeat=5, number=NUMBER)) / NUMBER * 1e6
+        print('protocol %d: %4d bytes/task %8.2f usec/round trip' %
+              (proto, size, usec))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Memory used by NamedTuple records versus a RecordBatch.
+
+Builds ROWS records of a typical shape and reports the bytes per row
+held by a list of records, and by RecordBatch with the array module
+and, if installed, NumPy.
+
+Run with either Python 2 or 3 from the repository root:
+
+    python benchmarks/bench_record_batch.py
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'python2' if sys.version_info[0] < 3
+                                else 'src'))
+
+import typing  # noqa
+
+ROWS = 100000
+
+Row = typing.NamedTuple('Row', [('id', int), ('price', float),
+                                ('quantity', typing.Optional[int]),
+                                ('active', bool)])
+
+
+def make_rows():
+    return [(i, i * 0.25, i % 7 or None, i % 2 == 0) for i in range(ROWS)]
+
+
+def records_size(records):
+    """Return the size of a list of records, including the fields.
+
+    Small ints, True, False and None are shared, so they don't count.
+    """
+    size = sys.getsizeof(records)
+    for record in records:
+        size += sys.getsizeof(record)
+        for value in record:
+            if isinstance(value, float) or (
+                    isinstance(value, int) and not -5 <= value <= 256):
+                size += sys.getsizeof(value)
+    return size
+
+
+def main():
+    rows = make_rows()
+    records = [Row._make(row) for row in rows]
+    print('%-20s %8.1f bytes/row' % ('records', records_size(records) /
+                                     float(ROWS)))
+    for use_numpy in (False, True):
+        try:
+            batch = typing.RecordBatch(Row, rows, use_numpy=use_numpy)
+        except ImportError:
+            continue
+        print('%-20s %8.1f bytes/row' % (
+            'numpy' if use_numpy else 'array', batch.nbytes / float(ROWS)))
+
+
+if __name__ == '__main__':
+    main()
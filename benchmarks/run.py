@@ -0,0 +1,124 @@
+"""Run the typing microbenchmarks.
+
+Usage (from the repository root, with Python 2 or 3):
+
+    python benchmarks/run.py [-k SUBSTRING] [--save] [--check]
+
+Timings are the best of several repeats, in microseconds per call.  They
+are compared with benchmarks/baseline.json, which holds one set of
+results per major Python version.  --save stores the current results
+there; --check exits with status 1 if any benchmark got slower than
+THRESHOLD times its baseline.  Baselines are only comparable on the
+machine that produced them.
+"""
+
+from __future__ import print_function
+
+import compileall
+import json
+import os
+import subprocess
+import sys
+import timeit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+TREE = os.path.join(ROOT, 'python2' if sys.version_info[0] < 3 else 'src')
+sys.path.insert(0, TREE)
+
+BASELINE = os.path.join(HERE, 'baseline.json')
+VERSION = 'py%d' % sys.version_info[0]
+REPEAT = 5
+MIN_TIME = 0.2  # Seconds per repeat.
+THRESHOLD = 1.25
+
+
+def time_callable(func):
+    """Return the best time per call of func, in microseconds."""
+    timer = timeit.Timer(func)
+    number = 1
+    while timer.timeit(number) < MIN_TIME:
+        number *= 10
+    return min(timer.repeat(REPEAT, number)) / number * 1e6
+
+
+def time_import(lazy=False):
+    """Return the best time to import typing in a fresh interpreter.
+
+    With lazy=True, PYTHONTYPINGLAZY is set.
+    """
+    # Time the import, not the compilation.
+    compileall.compile_file(os.path.join(TREE, 'typing.py'), quiet=1)
+    code = ('import sys, time; sys.path.insert(0, %r); t = time.time(); '
+            'import typing; print(time.time() - t)' % TREE)
+    env = dict(os.environ)
+    env.pop('PYTHONTYPINGLAZY', None)
+    if lazy:
+        env['PYTHONTYPINGLAZY'] = '1'
+    times = []
+    for _ in range(REPEAT * 4):
+        out = subprocess.check_output([sys.executable, '-c', code], env=env)
+        times.append(float(out.decode('ascii')))
+    return min(times) * 1e6
+
+
+def run(pattern=''):
+    import suite
+    results = {}
+    for bench in suite.BENCHMARKS:
+        if pattern in bench.__name__:
+            func = bench()
+            if func is not None:  # Else not supported here.
+                results[bench.__name__] = time_callable(func)
+    if pattern in 'import_typing':
+        results['import_typing'] = time_import()
+    if pattern in 'import_typing_lazy':
+        results['import_typing_lazy'] = time_import(lazy=True)
+    return results
+
+
+def load_baseline():
+    if not os.path.exists(BASELINE):
+        return {}
+    with open(BASELINE) as f:
+        return json.load(f)
+
+
+def save_baseline(baseline):
+    with open(BASELINE, 'w') as f:
+        json.dump(baseline, f, indent=2, separators=(',', ': '),
+                  sort_keys=True)
+        f.write('\n')
+
+
+def main(args):
+    pattern = ''
+    if '-k' in args:
+        pattern = args[args.index('-k') + 1]
+    baseline = load_baseline()
+    expected = baseline.get(VERSION, {})
+    results = run(pattern)
+    regressions = []
+    for name in sorted(results):
+        usec = results[name]
+        line = '%-32s %12.3f usec' % (name, usec)
+        if name in expected:
+            ratio = usec / expected[name]
+            line += '   %5.2fx baseline' % ratio
+            if ratio > THRESHOLD:
+                regressions.append(name)
+                line += '  SLOWER'
+        print(line)
+    if '--save' in args:
+        expected.update((name, round(usec, 3))
+                        for name, usec in results.items())
+        baseline[VERSION] = expected
+        save_baseline(baseline)
+    if '--check' in args and regressions:
+        print('Regressions: %s' % ', '.join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
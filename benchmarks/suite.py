@@ -0,0 +1,372 @@
+"""Microbenchmarks for the typing hot paths.
+
+Each benchmark is a function registered with @benchmark.  It does its
+setup and returns the zero-argument callable to be timed, or None if
+it doesn't apply to this version.  The suite runs unchanged against
+both src/ and python2/; see run.py.
+"""
+
+import functools
+import types
+import typing
+from typing import (Any, Callable, Generic, List, Mapping, NamedTuple,
+                    Optional, Sequence, Tuple, TypeVar, Union)
+
+BENCHMARKS = []
+
+
+def benchmark(func):
+    BENCHMARKS.append(func)
+    return func
+
+
+T = TypeVar('T')
+
+
+class Employee(object):
+    pass
+
+
+class Manager(Employee):
+    pass
+
+
+class Node(Generic[T]):
+    pass
+
+
+class Point(Generic[T]):
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+class HasInt(object):
+
+    def __int__(self):
+        return 0
+
+
+# Subscription.
+
+@benchmark
+def getitem_generic():
+    return lambda: List[int]
+
+
+@benchmark
+def getitem_generic_nested():
+    return lambda: Mapping[str, List[Tuple[int, Employee]]]
+
+
+@benchmark
+def getitem_user_generic():
+    return lambda: Node[int]
+
+
+@benchmark
+def getitem_union():
+    return lambda: Union[int, str, Employee]
+
+
+@benchmark
+def getitem_optional():
+    return lambda: Optional[Employee]
+
+
+@benchmark
+def getitem_tuple():
+    return lambda: Tuple[int, str, float]
+
+
+@benchmark
+def getitem_callable():
+    return lambda: Callable[[int, str], float]
+
+
+# Instance and subclass checks.
+
+@benchmark
+def isinstance_abc():
+    value = {}
+    return lambda: isinstance(value, typing.Mapping)
+
+
+@benchmark
+def isinstance_abc_negative():
+    value = []
+    return lambda: isinstance(value, typing.Mapping)
+
+
+@benchmark
+def issubclass_abc():
+    return lambda: issubclass(list, typing.Iterable)
+
+
+@benchmark
+def issubclass_protocol():
+    return lambda: issubclass(HasInt, typing.SupportsInt)
+
+
+@benchmark
+def issubclass_protocol_negative():
+    return lambda: issubclass(Employee, typing.SupportsInt)
+
+
+@benchmark
+def issubclass_variance():
+    sub = Sequence[Mapping[str, Manager]]
+    sup = Sequence[Mapping[str, Employee]]
+    return lambda: issubclass(sub, sup)
+
+
+# Introspection.
+
+@benchmark
+def get_type_hints():
+
+    def func(a, b=None, *args, **kwds):
+        # type: (List[Employee], int, *str) -> Optional[Employee]
+        pass
+
+    func.__annotations__ = {'a': 'List[Employee]', 'b': int,
+                            'args': str, 'return': 'Optional[Employee]'}
+    namespace = dict(globals())
+    return lambda: typing.get_type_hints(func, namespace)
+
+
+def _handlers_module(count=100):
+    """Return a module with count annotated handler functions.
+
+    Returns None if their hints are not available.
+    """
+    module = types.ModuleType('handlers')
+    exec('from typing import *', module.__dict__)
+    module.Employee = Employee
+    for i in range(count):
+        exec('def handler_%d(a, b=None): pass' % i, module.__dict__)
+        handler = module.__dict__['handler_%d' % i]
+        handler.__annotations__ = {'a': 'List[Employee]', 'b': 'int',
+                                   'return': 'Optional[Employee]'}
+    if not typing.get_type_hints(module.handler_0):
+        return None  # Python 2 needs the source for the type comments.
+    return module
+
+
+@benchmark
+def get_type_hints_module_cold():
+    if not hasattr(typing, 'get_module_type_hints'):
+        return None
+    module = _handlers_module()
+    if module is None:
+        return None
+
+    def run():
+        typing.get_type_hints.cache_clear()
+        typing.get_module_type_hints(module)
+
+    return run
+
+
+@benchmark
+def get_type_hints_each_cold():
+    if not hasattr(typing, 'get_module_type_hints'):
+        return None
+    module = _handlers_module()
+    if module is None:
+        return None
+    handlers = [f for name, f in vars(module).items()
+                if name.startswith('handler_')]
+
+    def run():
+        typing.get_type_hints.cache_clear()
+        for handler in handlers:
+            typing.get_type_hints(handler)
+
+    return run
+
+
+def _annotated(**hints):
+    """Set __annotations__, which Python 2 syntax cannot."""
+
+    def decorator(func):
+        func.__annotations__ = hints
+        return func
+
+    return decorator
+
+
+@benchmark
+def dispatch_overloads():
+    if not hasattr(typing, 'dispatch_overloads'):
+        return None
+
+    @typing.overload
+    @_annotated(employee=Manager)
+    def title(employee):
+        # type: (Manager) -> str
+        return 'manager'
+
+    @typing.overload
+    @_annotated(employee=Employee)
+    def title(employee):
+        # type: (Employee) -> str
+        return 'employee'
+
+    @typing.dispatch_overloads
+    def title(employee):
+        return 'other'
+
+    return functools.partial(title, Manager())
+
+
+@benchmark
+def pickle_roundtrip():
+    if '__reduce__' not in vars(typing.GenericMeta):
+        return None
+    import pickle
+    tp = Mapping[str, List[Tuple[int, Employee]]]
+    return lambda: pickle.loads(pickle.dumps(tp, 2))
+
+
+@benchmark
+def fingerprint():
+    if not hasattr(typing, 'fingerprint'):
+        return None
+    tp = Mapping[str, List[Tuple[int, Employee]]]
+    return functools.partial(typing.fingerprint, tp)
+
+
+@benchmark
+def fingerprint_cold():
+    if not hasattr(typing, 'fingerprint'):
+        return None
+    tp = Mapping[str, List[Tuple[int, Employee]]]
+
+    def run():
+        typing.fingerprint.cache_clear()
+        typing.fingerprint(tp)
+
+    return run
+
+
+def _records(count=100):
+    return [{'name': 'Joe %d' % i, 'id': i, 'boss': None}
+            for i in range(count)]
+
+
+@benchmark
+def compile_decoder():
+    if not hasattr(typing, 'compile_decoder'):
+        return None
+    emp = NamedTuple('Emp', [('name', typing.Text), ('id', int),
+                             ('boss', Optional[typing.Text])])
+    decode = typing.compile_decoder(List[emp])
+    return functools.partial(decode, _records())
+
+
+@benchmark
+def compile_decoder_checker():
+    # Checking and converting in two passes, for comparison.
+    if not hasattr(typing, 'compile_decoder'):
+        return None
+    emp = NamedTuple('Emp', [('name', typing.Text), ('id', int),
+                             ('boss', Optional[typing.Text])])
+    check = typing.compile_checker(List[typing.Dict[str, Any]])
+    records = _records()
+
+    def run():
+        if check(records):
+            [emp(r['name'], r['id'], r.get('boss')) for r in records]
+
+    return run
+
+
+@benchmark
+def compile_encoder():
+    if not hasattr(typing, 'compile_encoder'):
+        return None
+    emp = NamedTuple('Emp', [('name', typing.Text), ('id', int),
+                             ('boss', Optional[typing.Text])])
+    encode = typing.compile_encoder(List[emp])
+    return functools.partial(encode, [emp(**r) for r in _records()])
+
+
+@benchmark
+def compile_stream_checker():
+    if not hasattr(typing, 'compile_stream_checker'):
+        return None
+    wrap = typing.compile_stream_checker(typing.Iterator[int])
+    data = list(range(1000))
+    return lambda: sum(wrap(iter(data)))
+
+
+# Creation and instantiation.
+
+@benchmark
+def namedtuple_class():
+    fields = [('name', str), ('id', int), ('boss', Optional[Employee])]
+    return lambda: NamedTuple('Emp', fields)
+
+
+@benchmark
+def namedtuple_class_collections():
+    # The implementation NamedTuple used to wrap, for comparison.
+    import collections
+    names = ['name', 'id', 'boss']
+    return lambda: collections.namedtuple('Emp', names)
+
+
+@benchmark
+def namedtuple_new():
+    cls = NamedTuple('Emp', [('name', str), ('id', int)])
+    return functools.partial(cls, 'Joe', 42)
+
+
+def _record_batch(rows=1000):
+    if not hasattr(typing, 'RecordBatch'):
+        return None
+    row = NamedTuple('Row', [('id', int), ('price', float),
+                             ('quantity', Optional[int])])
+    data = [(i, i * 0.25, i % 7 or None) for i in range(rows)]
+    return typing.RecordBatch(row, data, use_numpy=False), data
+
+
+@benchmark
+def record_batch_build():
+    result = _record_batch()
+    if result is None:
+        return None
+    batch, data = result
+    return functools.partial(typing.RecordBatch, batch.record_type, data,
+                             use_numpy=False)
+
+
+@benchmark
+def record_batch_to_records():
+    result = _record_batch()
+    if result is None:
+        return None
+    return result[0].to_records
+
+
+@benchmark
+def generic_new():
+    return Node
+
+
+@benchmark
+def generic_new_subscripted():
+    cls = Node[int]
+    return cls
+
+
+@benchmark
+def generic_new_init():
+    return functools.partial(Point, 1, 2)
+
+
+@benchmark
+def generic_new_init_subscripted():
+    return functools.partial(Point[int], 1, 2)
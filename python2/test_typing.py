@@ -1,9 +1,10 @@
 from __future__ import absolute_import, unicode_literals
 
+import abc
 import pickle
 import re
 import sys
-from unittest import TestCase, main
+from unittest import TestCase, main, skipUnless
 
 from typing import Any
 from typing import TypeVar, AnyStr
@@ -13,6 +14,8 @@ from typing import Tuple
 from typing import Callable
 from typing import Generic
 from typing import cast
+from typing import compile_checker, compile_decoder, compile_encoder
+from typing import compile_stream_checker
 from typing import NamedTuple
 from typing import IO, TextIO, BinaryIO
 from typing import Pattern, Match
@@ -277,11 +280,31 @@ class UnionTests(TestCase):
 
     def test_repr(self):
         self.assertEqual(repr(Union), 'typing.Union')
+        # Equal unions are canonicalized, so the order of the first
+        # construction wins.
+        typing._union_cache.cache_clear()
         u = Union[Employee, int]
         self.assertEqual(repr(u), 'typing.Union[%s.Employee, int]' % __name__)
         u = Union[int, Employee]
+        self.assertEqual(repr(u), 'typing.Union[%s.Employee, int]' % __name__)
+        typing._union_cache.cache_clear()
+        u = Union[int, Employee]
         self.assertEqual(repr(u), 'typing.Union[int, %s.Employee]' % __name__)
 
+    def test_canonical(self):
+        assert Union[int, str] is Union[str, int]
+        assert Union[int, Union[str, float]] is Union[float, int, str]
+        assert Union[int, str] is not Union[int, float]
+
+    def test_many_members(self):
+        classes = [type(str('C%d' % i), (Employee,), {}) for i in range(50)]
+        u = Union[tuple(classes) + (int, Employee)]
+        self.assertEqual(u, Union[int, Employee])
+        u = Union[tuple(classes) + (int, typing.Sized)]
+        self.assertEqual(len(u.__union_params__), 52)
+        u = Union[tuple(classes) + (list, typing.Sized)]
+        assert list not in u.__union_params__
+
     def test_cannot_subclass(self):
         with self.assertRaises(TypeError):
             class C(Union):
@@ -537,6 +560,28 @@ class ProtocolTests(TestCase):
         with self.assertRaises(TypeError):
             isinstance(0, typing.SupportsAbs)
 
+    def test_protocol_attrs(self):
+        assert typing.SupportsInt._protocol_attrs == {'__int__'}
+        assert typing.SupportsAbs._protocol_attrs == {'__abs__'}
+
+    def test_subclass_cache(self):
+        class C(object):
+            def __int__(self):
+                return 0
+
+        assert issubclass(C, typing.SupportsInt)
+        assert C in typing.SupportsInt._protocol_cache
+        assert not issubclass(object, typing.SupportsInt)
+        assert object not in typing.SupportsInt._protocol_cache
+
+    def test_subclass_method_added_later(self):
+        class C(object):
+            pass
+
+        assert not issubclass(C, typing.SupportsInt)
+        C.__int__ = lambda self: 0
+        assert issubclass(C, typing.SupportsInt)
+
 
 class GenericTests(TestCase):
 
@@ -561,6 +606,21 @@ class GenericTests(TestCase):
         with self.assertRaises(TypeError):
             Generic[T, S, T]
 
+    def test_new_subscripted(self):
+
+        class C(Generic[T]):
+            calls = 0
+
+            def __init__(self, x):
+                C.calls += 1
+                self.x = x
+
+        c = C[int](42)
+        assert type(c) is C
+        assert c.x == 42
+        assert C.calls == 1
+        assert C[int].__origin_root__ is C
+
     def test_repr(self):
         self.assertEqual(repr(SimpleMapping),
                          __name__ + '.' + 'SimpleMapping<~XK, ~XV>')
@@ -677,6 +737,23 @@ class GenericTests(TestCase):
         assert A[T] == A[T]
         assert A[T] != B[T]
 
+    def test_hash(self):
+
+        class A(Generic[T]):
+            pass
+
+        class B(Generic[T]):
+            pass
+
+        assert hash(A[int]) == hash(A[int])
+        assert hash(A[T]) == A[T].__tree_hash__
+        hashes = set(hash(typing.List[t]) for t in (int, float, bytes))
+        assert len(hashes) == 3
+        assert hash(A[int]) != hash(B[int])
+        d = {typing.List[int]: 1, typing.List[float]: 2}
+        assert d[typing.List[int]] == 1
+        assert d[typing.List[float]] == 2
+
     def test_multiple_inheritance(self):
 
         class A(Generic[T, VT]):
@@ -763,6 +840,101 @@ class GenericTests(TestCase):
             D[T]
 
 
+class GenericCacheTests(TestCase):
+
+    def test_interned(self):
+        assert typing.List[int] is typing.List[int]
+        assert typing.Mapping[KT, VT] is typing.Mapping[KT, VT]
+        assert SimpleMapping[XK, XV] is SimpleMapping[XK, XV]
+        assert typing.List[int] is not typing.List[str]
+
+    def test_cache_info(self):
+        typing._generic_cache.cache_clear()
+        info = typing._generic_cache.cache_info()
+        assert info.hits == info.misses == info.currsize == 0
+        typing.List[Employee]
+        typing.List[Employee]
+        info = typing._generic_cache.cache_info()
+        assert info.hits == 1
+        assert info.misses == 1
+        assert info.currsize == 1
+
+    def test_bounded(self):
+        cache = typing._InternCache(maxsize=2)
+
+        class A(object):
+            pass
+
+        a, b, c = A(), A(), A()
+        cache[1] = a
+        cache[2] = b
+        cache[3] = c
+        assert len(cache) == 2
+        # Evicted entries are still found while they are alive.
+        assert cache.get(1) is a
+        del a, b
+        import gc
+        gc.collect()
+        assert cache.get(2) is None
+
+    def test_unhashable_key(self):
+        cache = typing._TypeCache()
+        cache[[]] = 42
+        assert cache.get([]) is None
+        assert len(cache) == 0
+
+    def test_instancecheck_cache(self):
+        Mapping = typing.Mapping
+        assert isinstance({}, Mapping)
+        assert dict in Mapping._abc_instance_cache
+        assert not isinstance([], Mapping)
+        assert list in Mapping._abc_instance_negative_cache
+        assert not isinstance([], Mapping)
+
+    def test_instancecheck_register(self):
+
+        class M(object):
+            pass
+
+        m = M()
+        assert not isinstance(m, typing.Mapping)
+        typing.Mapping.__extra__.register(M)
+        # register() invalidates the negative cache.
+        assert isinstance(m, typing.Mapping)
+
+    def test_subclass_cache(self):
+        typing._subclass_cache.cache_clear()
+        Sequence = typing.Sequence
+        assert issubclass(Sequence[Manager], Sequence[Employee])
+        assert issubclass(Sequence[Manager], Sequence[Employee])
+        assert typing._subclass_cache.cache_info().hits == 1
+        assert not issubclass(Sequence[Employee], Sequence[Manager])
+        assert not issubclass(Sequence[Employee], Sequence[Manager])
+        assert typing._subclass_cache.cache_info().hits == 2
+
+    def test_subclass_cache_register(self):
+
+        class A(object):
+            __metaclass__ = abc.ABCMeta
+
+        class B(object):
+            pass
+
+        Sequence = typing.Sequence
+        assert not issubclass(Sequence[B], Sequence[A])
+        A.register(B)
+        assert issubclass(Sequence[B], Sequence[A])
+
+    def test_subclass_cache_forward_ref(self):
+        namespace = {'Sequence': typing.Sequence}
+        exec("S = Sequence['Foo']", namespace)
+        S = namespace['S']
+        Sequence = typing.Sequence
+        assert not issubclass(Sequence[Manager], S)
+        namespace['Foo'] = Employee
+        assert issubclass(Sequence[Manager], S)
+
+
 class VarianceTests(TestCase):
 
     def test_invariance(self):
@@ -807,6 +979,357 @@ class VarianceTests(TestCase):
                               typing.Mapping[Manager, Manager])
 
 
+# A module with string field types, to compile from a different module.
+TEAM_SOURCE = """
+from typing import NamedTuple, Optional, compile_checker
+
+class Boss(object):
+    pass
+
+Emp = NamedTuple('Emp', [('id', 'int'), ('boss', 'Optional[Boss]')])
+
+check_boss = compile_checker('Boss')
+"""
+
+
+def make_module(name, source):
+    import types
+    module = types.ModuleType(str(name))
+    exec(source, module.__dict__)
+    return module
+
+
+class CompileCheckerTests(TestCase):
+
+    def test_simple(self):
+        check = compile_checker(int)
+        assert check(42)
+        assert not check('42')
+        assert compile_checker(None)(None)
+        assert not compile_checker(None)(0)
+        assert compile_checker(Any)(object())
+
+    def test_cached(self):
+        assert compile_checker(typing.List[int]) is \
+            compile_checker(typing.List[int])
+
+    def test_nested(self):
+        check = compile_checker(
+            typing.List[typing.Dict[unicode, Tuple[int, float]]])
+        assert check([{'a': (1, 2.0)}, {}])
+        assert check([])
+        assert not check([{'a': (1, 2)}])
+        assert not check([{1: (1, 2.0)}])
+        assert not check(({'a': (1, 2.0)},))
+        assert not check([{'a': (1, 2.0, 3.0)}])
+
+    def test_union_optional(self):
+        check = compile_checker(Optional[Union[int, unicode]])
+        assert check(None)
+        assert check(1)
+        assert check('1')
+        assert not check(1.0)
+
+    def test_tuple(self):
+        assert compile_checker(Tuple)((1, 'a'))
+        assert not compile_checker(Tuple)([1])
+        check = compile_checker(Tuple[int, ...])
+        assert check(())
+        assert check((1, 2, 3))
+        assert not check((1, 'a'))
+
+    def test_abcs(self):
+        check = compile_checker(typing.Mapping[unicode, int])
+        assert check({'a': 1})
+        assert not check({'a': 'b'})
+        assert not check([('a', 1)])
+        check = compile_checker(typing.AbstractSet[int])
+        assert check(frozenset([1, 2]))
+        assert not check(set(['1']))
+        check = compile_checker(typing.Sequence[Employee])
+        assert check([Manager(), Founder()])
+        assert not check([Manager(), 42])
+        check = compile_checker(typing.ItemsView[unicode, int])
+        assert check({'a': 1}.viewitems())
+        assert not check({'a': 'b'}.viewitems())
+
+    def test_iterators_not_consumed(self):
+        it = iter([1, 2, 3])
+        assert compile_checker(typing.Iterator[unicode])(it)
+        assert compile_checker(typing.Iterable[unicode])(it)
+        self.assertEqual(list(it), [1, 2, 3])
+
+    def test_typevar(self):
+        assert compile_checker(T)(object())
+        check = compile_checker(AnyStr)
+        assert check(b'')
+        assert not check(42)
+        X = TypeVar('X', bound=Employee)
+        assert compile_checker(X)(Manager())
+        assert not compile_checker(X)(42)
+
+    def test_user_generic(self):
+        check = compile_checker(SimpleMapping[XK, int])
+        assert check(MySimpleMapping())
+        assert not check({})
+
+    def test_protocol(self):
+        assert compile_checker(typing.SupportsInt)(4.2)
+        assert not compile_checker(typing.SupportsInt)('')
+
+    def test_callable(self):
+        assert compile_checker(Callable[[int], int])(len)
+        assert not compile_checker(Callable[[int], int])(42)
+
+    def test_pattern(self):
+        check = compile_checker(Pattern[bytes])
+        assert check(re.compile(b'a'))
+        assert not check(re.compile(u'a'))
+        assert compile_checker(Pattern)(re.compile('a'))
+
+    def test_namedtuple(self):
+        Emp = NamedTuple('Emp', [('name', unicode), ('id', int)])
+        check = compile_checker(Emp)
+        assert check(Emp('Joe', 42))
+        assert not check(Emp('Joe', '42'))
+        assert not check(('Joe', 42))
+
+    def test_forward_ref(self):
+        check = compile_checker(typing.List['Employee'])
+        assert check([Employee()])
+        assert not check([42])
+
+    def test_forward_ref_other_module(self):
+        moda = make_module('moda', TEAM_SOURCE)
+        modb = make_module('modb', TEAM_SOURCE)
+        assert moda.check_boss(moda.Boss())
+        assert modb.check_boss(modb.Boss())
+        assert not modb.check_boss(moda.Boss())
+        check = compile_checker(moda.Emp)
+        assert check(moda.Emp(1, None))
+        assert check(moda.Emp(1, moda.Boss()))
+        assert not check(moda.Emp(1, modb.Boss()))
+
+    def test_errors(self):
+        with self.assertRaises(TypeError):
+            compile_checker(42)
+        with self.assertRaises(TypeError):
+            compile_checker(Union)
+
+
+class CompileStreamCheckerTests(TestCase):
+
+    def test_iterator(self):
+        check = compile_stream_checker(typing.Iterator[int])
+        assert list(check(iter([1, 2]))) == [1, 2]
+        items = check(iter([1, '2']))
+        assert next(items) == 1
+        with self.assertRaises(TypeError):
+            next(items)
+        with self.assertRaises(TypeError):
+            check([1])
+
+    def test_iterable(self):
+        check = compile_stream_checker(typing.Iterable[int])
+        items = check([1, 2])
+        assert list(items) == list(items) == [1, 2]
+        with self.assertRaises(TypeError):
+            list(check([1, None]))
+
+    def test_any_unwrapped(self):
+        items = iter([1])
+        assert compile_stream_checker(typing.Iterator)(items) is items
+        assert compile_stream_checker(typing.Iterator[Any])(items) is items
+
+    def test_generator(self):
+
+        def echo():
+            received = yield 1
+            while True:
+                received = yield received
+
+        check = compile_stream_checker(typing.Generator[int, int, None])
+        gen = check(echo())
+        assert next(gen) == 1
+        assert gen.send(2) == 2
+        with self.assertRaises(TypeError):
+            gen.send('3')
+        gen.close()
+        with self.assertRaises(StopIteration):
+            next(gen)
+        with self.assertRaises(TypeError):
+            check(iter([1]))
+
+    def test_cached(self):
+        assert compile_stream_checker(typing.Iterator[int]) is \
+            compile_stream_checker(typing.Iterator[int])
+
+    def test_errors(self):
+        with self.assertRaises(TypeError):
+            compile_stream_checker(typing.List[int])
+        with self.assertRaises(TypeError):
+            compile_stream_checker(int)
+
+
+class CompileDecoderTests(TestCase):
+
+    def test_simple(self):
+        assert compile_decoder(int)(42) == 42
+        assert compile_decoder(typing.Text)('x') == 'x'
+        assert compile_decoder(None)(None) is None
+        value = compile_decoder(float)(1)
+        assert value == 1.0 and type(value) is float
+        with self.assertRaises(TypeError):
+            compile_decoder(int)(True)
+        with self.assertRaises(TypeError):
+            compile_decoder(float)('1')
+
+    def test_cached(self):
+        assert compile_decoder(typing.List[int]) is \
+            compile_decoder(typing.List[int])
+
+    def test_containers(self):
+        decode = compile_decoder(
+            typing.Dict[typing.Text, Tuple[int, typing.Set[float]]])
+        assert decode({'a': [1, [2, 3.5]]}) == {'a': (1, {2.0, 3.5})}
+        assert compile_decoder(Tuple[int, ...])([1, 2]) == (1, 2)
+        assert compile_decoder(typing.FrozenSet[int])([1, 1]) == \
+            frozenset([1])
+        assert compile_decoder(typing.Sequence[Any])([1, 'a']) == [1, 'a']
+        with self.assertRaises(TypeError):
+            compile_decoder(Tuple[int, int])([1])
+
+    def test_union(self):
+        decode = compile_decoder(Optional[Union[int, typing.List[int]]])
+        assert decode(None) is None
+        assert decode(1) == 1
+        assert decode([1]) == [1]
+        with self.assertRaises(TypeError):
+            decode('1')
+
+    def test_union_order(self):
+
+        class C(object):
+            pass
+
+        # Equal unions are the same object, so build a new one.
+        for tp in [Union[float, int, C], Union[C, int, float]]:
+            decode = compile_decoder(tp)
+            value = decode(1)
+            assert value == 1 and type(value) is int
+            value = decode(1.5)
+            assert value == 1.5 and type(value) is float
+
+    def test_namedtuple(self):
+        Emp = NamedTuple('Emp', [('name', typing.Text), ('id', int),
+                                 ('boss', Optional[typing.Text])])
+        decode = compile_decoder(typing.List[Emp])
+        emps = decode([{'name': 'Joe', 'id': 1, 'extra': 0},
+                       {'name': 'Jim', 'id': 2, 'boss': 'Joe'}])
+        assert emps == [Emp('Joe', 1, None), Emp('Jim', 2, 'Joe')]
+        assert type(emps[0]) is Emp
+        with self.assertRaises(TypeError):
+            decode([{'name': 'Joe'}])
+
+    def test_namedtuple_other_module(self):
+        moda = make_module('moda', TEAM_SOURCE)
+        decode = compile_decoder(moda.Emp)
+        assert decode({'id': 1}) == moda.Emp(1, None)
+        boss = moda.Boss()
+        assert decode({'id': 1, 'boss': boss}).boss is boss
+        with self.assertRaises(TypeError):
+            decode({'boss': None})
+        namespace = {'compile_decoder': compile_decoder, 'Foo': int}
+        exec("decode = compile_decoder('Foo')", namespace)
+        assert namespace['decode'](1) == 1
+        namespace['Foo'] = str
+        exec("decode = compile_decoder('Foo')", namespace)
+        with self.assertRaises(TypeError):
+            namespace['decode'](1)
+
+    def test_error_path(self):
+        Emp = NamedTuple('Emp', [('skills', typing.List[int])])
+        decode = compile_decoder(typing.Dict[typing.Text, Emp])
+        with self.assertRaises(TypeError) as cm:
+            decode({'joe': {'skills': [1, 2, 'x']}})
+        message = str(cm.exception)
+        assert "value[u'joe']['skills'][2]" in message
+        assert message.startswith('Expected int')
+
+    def test_errors(self):
+        with self.assertRaises(TypeError):
+            compile_decoder(Union)
+        with self.assertRaises(TypeError):
+            compile_decoder(42)
+
+
+class CompileEncoderTests(TestCase):
+
+    def test_simple(self):
+        assert compile_encoder(int)(42) == 42
+        assert compile_encoder(None)(None) is None
+        assert compile_encoder(Any)(compile_encoder) is compile_encoder
+
+    def test_cached(self):
+        assert compile_encoder(typing.List[int]) is \
+            compile_encoder(typing.List[int])
+        Emp = NamedTuple('Emp', [('id', int)])
+        assert compile_encoder(Emp) is not compile_encoder(Emp, flat=True)
+
+    def test_containers(self):
+        encode = compile_encoder(
+            typing.Dict[typing.Text, Tuple[int, typing.FrozenSet[float]]])
+        assert encode({'a': (1, frozenset([2.5]))}) == {'a': [1, [2.5]]}
+        assert compile_encoder(Tuple[int, ...])((1, 2)) == [1, 2]
+        assert compile_encoder(typing.Iterable[int])(iter([1])) == [1]
+
+    def test_namedtuple(self):
+        Emp = NamedTuple('Emp', [('name', typing.Text),
+                                 ('skills', typing.Set[typing.Text])])
+        Team = NamedTuple('Team', [('lead', Optional[Emp]),
+                                   ('members', typing.List[Emp])])
+        joe = Emp('Joe', {'typing'})
+        team = Team(None, [joe])
+        encode = compile_encoder(Team)
+        data = {'lead': None,
+                'members': [{'name': 'Joe', 'skills': ['typing']}]}
+        assert encode(team) == data
+        assert encode(Team(joe, [])) == {'lead': data['members'][0],
+                                         'members': []}
+        assert compile_decoder(Team)(data) == team
+        encode = compile_encoder(Team, flat=True)
+        assert encode(team) == [None, [['Joe', ['typing']]]]
+
+    def test_namedtuple_other_module(self):
+        moda = make_module('moda', TEAM_SOURCE)
+        encode = compile_encoder(moda.Emp)
+        assert encode(moda.Emp(1, None)) == {'id': 1, 'boss': None}
+        boss = moda.Boss()
+        assert compile_encoder(moda.Emp, flat=True)(moda.Emp(1, boss)) == \
+            [1, boss]
+
+    def test_union(self):
+        Emp = NamedTuple('Emp', [('name', typing.Text)])
+        encode = compile_encoder(Union[int, Emp, typing.List[Emp]])
+        assert encode(1) == 1
+        assert encode(Emp('Joe')) == {'name': 'Joe'}
+        assert encode([Emp('Joe')]) == [{'name': 'Joe'}]
+
+    def test_union_order(self):
+        Emp = NamedTuple('Emp', [('name', typing.Text)])
+        X = TypeVar('X')
+        for tp in [Union[X, Emp], Union[Emp, X]]:
+            encode = compile_encoder(tp)
+            assert encode(Emp('Joe')) == {'name': 'Joe'}
+            assert encode(1) == 1
+
+    def test_errors(self):
+        with self.assertRaises(TypeError):
+            compile_encoder(Union)
+        with self.assertRaises(TypeError):
+            compile_encoder(42)
+
+
 class CastTests(TestCase):
 
     def test_basics(self):
@@ -825,6 +1348,118 @@ class CastTests(TestCase):
         cast('hello', 42)
 
 
+class PickleTests(TestCase):
+
+    def roundtrips(self, tp):
+        for proto in range(pickle.HIGHEST_PROTOCOL + 1):
+            yield pickle.loads(pickle.dumps(tp, proto))
+
+    def test_subscripted(self):
+        for tp in [typing.Dict[str, typing.List[int]], Union[int, None],
+                   Optional[SimpleMapping[str, int]],
+                   typing.Iterable[Tuple[int, ...]],
+                   typing.SupportsAbs[int], Generic[KT, VT]]:
+            for copy in self.roundtrips(tp):
+                self.assertIs(copy, tp)
+
+    def test_tuple_and_callable(self):
+        for tp in [Tuple[int, None], Tuple[None, ...], Tuple[()],
+                   Callable[[int, None], str], Callable[..., None],
+                   Callable[[], int]]:
+            for copy in self.roundtrips(tp):
+                self.assertEqual(copy, tp)
+                self.assertEqual(repr(copy), repr(tp))
+
+    def test_by_reference(self):
+        for tp in [Any, Union, Optional, Tuple, Callable, typing.List,
+                   typing.SupportsInt, SimpleMapping, T]:
+            for copy in self.roundtrips(tp):
+                self.assertIs(copy, tp)
+
+    def test_compact(self):
+        tp = typing.Dict[str, typing.List[int]]
+        self.assertLess(len(pickle.dumps(tp, 2)), 150)
+
+
+class FingerprintTests(TestCase):
+
+    def test_distinct(self):
+        types = [int, None, Any, typing.List, typing.List[int],
+                 typing.List[str], typing.Sequence[int], Tuple[int],
+                 Tuple[int, ...], Callable[[int], str],
+                 Callable[..., str], Callable[[], int], Union[int, str],
+                 T, KT, typing.Pattern[str], SimpleMapping[str, int],
+                 typing._ForwardRef('int'), Generic[T]]
+        digests = set(typing.fingerprint(t) for t in types)
+        self.assertEqual(len(digests), len(types))
+        self.assertEqual(typing.fingerprint(None),
+                         typing.fingerprint(type(None)))
+
+    def test_union_order(self):
+        self.assertEqual(typing.fingerprint(Union[int, str, float]),
+                         typing.fingerprint(Union[float, str, int]))
+
+    def test_typevar_module(self):
+        module = make_module('typevar_module',
+                             "from typing import TypeVar\n"
+                             "T = TypeVar('T')\n")
+        self.assertEqual(repr(module.T), repr(T))
+        self.assertNotEqual(typing.fingerprint(module.T),
+                            typing.fingerprint(T))
+
+    def test_memoized(self):
+        tp = typing.Dict[str, typing.List[float]]
+        digest = typing.fingerprint(tp)
+        self.assertIs(typing.fingerprint(tp), digest)
+
+        class C(tp):
+            pass
+
+        self.assertNotEqual(typing.fingerprint(C), digest)
+
+    def test_cache_weak(self):
+        import gc
+        import weakref
+        typing.fingerprint.cache_clear()
+        typing.fingerprint(int)
+        self.assertEqual(typing.fingerprint(int), typing.fingerprint(int))
+        info = typing.fingerprint.cache_info()
+        self.assertEqual((info.hits, info.misses), (2, 1))
+
+        class C(typing.List[int]):
+            pass
+
+        digest = typing.fingerprint(C)
+        self.assertNotIn('__fingerprint__', vars(C))
+        self.assertEqual(typing.fingerprint(C), digest)
+        ref = weakref.ref(C)
+        del C
+        gc.collect()
+        self.assertIsNone(ref())
+
+    def test_not_a_type(self):
+        with self.assertRaises(TypeError):
+            typing.fingerprint(42)
+
+    def test_stable(self):
+        import os
+        import subprocess
+        tp = typing.Mapping[str, Union[Tuple[int, ...], SimpleMapping]]
+        code = '\n'.join([
+            "import sys, typing, test_typing",
+            "from typing import Mapping, Tuple, Union",
+            "tp = Mapping[str, Union[Tuple[int, ...],",
+            "                        test_typing.SimpleMapping]]",
+            "sys.stdout.write(typing.fingerprint(tp))",
+        ])
+        cwd = os.path.dirname(os.path.abspath(typing.__file__))
+        for seed in ('1', '2'):
+            env = dict(os.environ, PYTHONHASHSEED=seed)
+            out = subprocess.check_output([sys.executable, '-c', code],
+                                          env=env, cwd=cwd)
+            self.assertEqual(out.decode('ascii'), typing.fingerprint(tp))
+
+
 class ForwardRefTests(TestCase):
 
     def test_forwardref_instance_type_error(self):
@@ -832,12 +1467,288 @@ class ForwardRefTests(TestCase):
         with self.assertRaises(TypeError):
             isinstance(42, fr)
 
+    def test_code_cache(self):
+        fr1 = typing._ForwardRef('List[int]')
+        fr2 = typing._ForwardRef('List[int]')
+        assert fr1 is not fr2
+        assert fr1.__forward_code__ is fr2.__forward_code__
+
+    def test_frame_not_kept(self):
+        import gc
+        import weakref
+
+        class Big(object):
+            pass
+
+        def make():
+            big = Big()
+
+            class Local(object):
+                pass
+
+            fr = typing._ForwardRef('Local')
+            return fr, Local, weakref.ref(big)
+
+        fr, Local, big = make()
+        gc.collect()
+        assert big() is None
+        assert fr.__forward_frame__ is None
+        assert fr.__forward_locals__ == {'Local': Local}
+        assert issubclass(Local, fr)
+
+    def test_keep_frames(self):
+        typing._ForwardRef.keep_frames = True
+        try:
+            fr = typing._ForwardRef('Later')
+        finally:
+            typing._ForwardRef.keep_frames = False
+
+        class Later(object):
+            pass
+
+        assert fr.__forward_frame__ is not None
+        assert issubclass(Later, fr)
+
     def test_syntax_error(self):
 
         with self.assertRaises(SyntaxError):
             Generic['/T']
 
 
+class Node(Generic[T]):
+    pass
+
+
+class GetTypeHintsTests(TestCase):
+
+    def test_signature_comment(self):
+
+        def foo(x, y):
+            # type: (int, typing.List[Node[int]]) -> str
+            return str(x)
+
+        self.assertEqual(typing.get_type_hints(foo),
+                         {'x': int, 'y': typing.List[Node[int]],
+                          'return': str})
+
+    def test_quoted_types(self):
+
+        def foo(x, y):
+            # type: ('int', 'typing.List[Node[int]]') -> 'Node[str]'
+            pass
+
+        self.assertEqual(typing.get_type_hints(foo),
+                         {'x': int, 'y': typing.List[Node[int]],
+                          'return': Node[str]})
+
+    def test_argument_comments(self):
+
+        def foo(x,  # type: int
+                y   # type: Node[str]
+                ):
+            # type: (...) -> None
+            pass
+
+        self.assertEqual(typing.get_type_hints(foo),
+                         {'x': int, 'y': Node[str], 'return': type(None)})
+
+    def test_no_comments(self):
+
+        def foo(x):
+            # Not a type comment.
+            return x
+
+        self.assertEqual(typing.get_type_hints(foo), {})
+
+    def test_type_ignore(self):
+
+        def foo(x):
+            # type: ignore
+            return x
+
+        self.assertEqual(typing.get_type_hints(foo), {})
+
+    def test_method(self):
+
+        class C(object):
+
+            def meth(self, x):
+                # type: (int) -> None
+                pass
+
+            def meth_self(self, x):
+                # type: (C, int) -> None
+                pass
+
+        self.assertEqual(typing.get_type_hints(C.meth),
+                         {'x': int, 'return': type(None)})
+        self.assertEqual(typing.get_type_hints(C().meth),
+                         {'x': int, 'return': type(None)})
+        self.assertEqual(typing.get_type_hints(C.meth_self, locals()),
+                         {'self': C, 'x': int, 'return': type(None)})
+
+    def test_star_args(self):
+
+        def foo(x, *args, **kwargs):
+            # type: (int, *str, **Tuple[int, str]) -> None
+            pass
+
+        self.assertEqual(typing.get_type_hints(foo),
+                         {'x': int, 'args': str,
+                          'kwargs': Tuple[int, str], 'return': type(None)})
+
+    def test_wrong_count(self):
+
+        def foo(x, y, z):
+            # type: (int) -> None
+            pass
+
+        with self.assertRaises(TypeError):
+            typing.get_type_hints(foo)
+
+        def bar(x, y):
+            # type: (int) -> None
+            pass
+
+        with self.assertRaises(TypeError):
+            typing.get_type_hints(bar)
+
+    def test_optional_default(self):
+
+        def foo(x, y=None, z=0):
+            # type: (int, int, int) -> None
+            pass
+
+        self.assertEqual(typing.get_type_hints(foo),
+                         {'x': int, 'y': Optional[int], 'z': int,
+                          'return': type(None)})
+
+    def test_no_type_check(self):
+
+        @typing.no_type_check
+        def foo(x):
+            # type: (int) -> None
+            pass
+
+        self.assertEqual(typing.get_type_hints(foo), {})
+
+    def test_cache(self):
+
+        def foo(x):
+            # type: (int) -> None
+            pass
+
+        typing.get_type_hints.cache_clear()
+        hints = typing.get_type_hints(foo)
+        hints['x'] = str  # The caller's copy.
+        self.assertEqual(typing.get_type_hints(foo)['x'], int)
+        info = typing.get_type_hints.cache_info()
+        self.assertEqual((info.hits, info.misses), (1, 1))
+        foo.__defaults__ = (None,)
+        self.assertEqual(typing.get_type_hints(foo)['x'], Optional[int])
+        self.assertEqual(typing.get_type_hints.cache_info().misses, 2)
+
+    def test_comments_parsed_once(self):
+
+        def foo(x):
+            # type: (int) -> None
+            pass
+
+        comments = typing._type_comments(foo)
+        self.assertIs(typing._type_comments(foo), comments)
+
+    def test_comments_per_module(self):
+        import linecache
+        import types
+        modules = []
+        for name, tp in [('m1', 'int'), ('m2', 'str')]:
+            source = ('def f(x):\n'
+                      '    # type: (%s) -> None\n'
+                      '    pass\n' % tp)
+            filename = '<%s>' % name
+            linecache.cache[filename] = (len(source), None,
+                                         source.splitlines(True), filename)
+            self.addCleanup(linecache.cache.pop, filename, None)
+            module = types.ModuleType(str(name))
+            exec(compile(source, filename, 'exec'), module.__dict__)
+            modules.append(module)
+        m1, m2 = modules
+        self.assertEqual(m1.f.__code__, m2.f.__code__)
+        self.assertEqual(typing.get_type_hints(m1.f)['x'], int)
+        self.assertEqual(typing.get_type_hints(m2.f)['x'], str)
+
+    def test_forward_cache(self):
+        import linecache
+        import types
+        source = ('X = int\n'
+                  'def f(a):\n'
+                  '    # type: (X) -> None\n'
+                  '    pass\n'
+                  'def g(b):\n'
+                  '    # type: (X) -> None\n'
+                  '    pass\n'
+                  'def h(c):\n'
+                  '    # type: (X) -> None\n'
+                  '    pass\n')
+        filename = '<forward_cache_module>'
+        linecache.cache[filename] = (len(source), None,
+                                     source.splitlines(True), filename)
+        self.addCleanup(linecache.cache.pop, filename, None)
+        module = types.ModuleType(str('forward_cache_module'))
+        exec(compile(source, filename, 'exec'), module.__dict__)
+        sys.modules[module.__name__] = module
+        self.addCleanup(sys.modules.pop, module.__name__)
+        typing._forward_cache.cache_clear()
+        self.assertEqual(typing.get_type_hints(module.f)['a'], int)
+        self.assertEqual(typing.get_type_hints(module.g)['b'], int)
+        info = typing._forward_cache.cache_info()
+        self.assertEqual((info.hits, info.misses), (2, 2))
+        # Rebinding a global used by the comment invalidates the entry.
+        module.X = unicode
+        self.assertEqual(typing.get_type_hints(module.h)['c'], unicode)
+        info = typing._forward_cache.cache_info()
+        self.assertEqual((info.hits, info.misses), (3, 3))
+
+    def test_class_type_hints(self):
+
+        class C(object):
+
+            def meth(self, x):
+                # type: (int) -> None
+                pass
+
+            @staticmethod
+            def static(x):
+                # type: (str) -> None
+                pass
+
+            def plain(self):
+                pass
+
+        self.assertEqual(typing.get_class_type_hints(C),
+                         {'meth': {'x': int, 'return': type(None)},
+                          'static': {'x': str, 'return': type(None)}})
+
+    def test_module_type_hints(self):
+        hints = typing.get_module_type_hints(sys.modules[__name__])
+        self.assertEqual(hints['Hinted.meth'],
+                         {'x': Node[int], 'return': type(None)})
+        self.assertEqual(hints['hinted'], {'x': Optional[int], 'return': str})
+        self.assertNotIn('cast', hints)
+
+
+class Hinted(object):
+
+    def meth(self, x):
+        # type: (Node[int]) -> None
+        pass
+
+
+def hinted(x=None):
+    # type: (int) -> str
+    return str(x)
+
+
 class OverloadTests(TestCase):
 
     def test_overload_exists(self):
@@ -866,6 +1777,144 @@ class OverloadTests(TestCase):
 
         blah()
 
+    def test_dispatch(self):
+        from typing import overload, dispatch_overloads
+
+        @overload
+        def describe(x):
+            # type: (int) -> str
+            return 'int'
+
+        @overload
+        def describe(x, y=None):
+            # type: (typing.Sequence[int], typing.Callable) -> str
+            return 'sequence'
+
+        @overload
+        def describe(x, **kwargs):
+            # type: (unicode, **int) -> str
+            return 'unicode'
+
+        @dispatch_overloads
+        def describe(x, *args, **kwargs):
+            return 'other'
+
+        self.assertEqual(describe(1), 'int')
+        self.assertEqual(describe(True), 'int')
+        self.assertEqual(describe([1]), 'sequence')
+        self.assertEqual(describe((), len), 'sequence')
+        self.assertEqual(describe((), None), 'sequence')
+        self.assertEqual(describe((), 1), 'other')
+        self.assertEqual(describe(1.0), 'other')
+        self.assertEqual(describe(x=1), 'int')
+        self.assertEqual(describe('', a=1), 'unicode')
+        self.assertEqual(describe('', a=''), 'other')
+        self.assertEqual(describe([], y=None), 'sequence')
+        self.assertEqual(describe(1, 2, 3), 'other')
+        self.assertEqual(describe.__name__, 'describe')
+        self.assertEqual(len(describe.overloads), 3)
+        self.assertIs(describe.dispatch(int), describe.overloads[0])
+        self.assertIs(describe.dispatch(list, y=type(None)),
+                      describe.overloads[1])
+
+    def test_dispatch_method(self):
+        from typing import overload, dispatch_overloads
+
+        class C(object):
+
+            @overload
+            def meth(self, x):
+                # type: (int) -> str
+                return 'int'
+
+            @dispatch_overloads
+            def meth(self, x):
+                return 'other'
+
+        self.assertEqual(C().meth(1), 'int')
+        self.assertEqual(C().meth(''), 'other')
+
+    def test_dispatch_none(self):
+        from typing import overload, dispatch_overloads
+
+        @overload
+        def utf8(value):
+            # type: (None) -> None
+            return None
+
+        @overload
+        def utf8(value):
+            # type: (unicode) -> bytes
+            return value.encode('utf-8')
+
+        @dispatch_overloads
+        def utf8(value):
+            raise TypeError
+
+        self.assertIsNone(utf8(None))
+        self.assertEqual(utf8(u'a'), b'a')
+        self.assertIs(utf8.dispatch(type(None)), utf8.overloads[0])
+
+    def test_dispatch_methods_same_name(self):
+        from typing import overload, dispatch_overloads
+
+        class A(object):
+
+            @overload
+            def meth(self, x):
+                # type: (int) -> str
+                return 'int'
+
+            def meth(self, x):
+                return 'A'
+
+        class B(object):
+
+            @overload
+            def meth(self, x):
+                # type: (unicode) -> str
+                return 'str'
+
+            @dispatch_overloads
+            def meth(self, x):
+                return 'B'
+
+        self.assertEqual(A().meth(1), 'A')
+        self.assertEqual(B().meth(1), 'B')
+        self.assertEqual(B().meth(''), 'str')
+        self.assertEqual(len(B.meth.overloads), 1)
+        # A's variants were dropped once its implementation was seen.
+        self.assertNotIn('meth', [name for _, name, _
+                                  in typing._overload_registry.values()])
+
+    def test_dispatch_register(self):
+        from typing import overload, dispatch_overloads
+
+        class M(object):
+            pass
+
+        @overload
+        def f(x):
+            # type: (typing.Mapping) -> str
+            return 'mapping'
+
+        @dispatch_overloads
+        def f(x):
+            return 'other'
+
+        self.assertEqual(f(M()), 'other')
+        typing.Mapping.__extra__.register(M)
+        self.assertEqual(f(M()), 'mapping')
+
+    def test_dispatch_without_overloads(self):
+        from typing import dispatch_overloads
+
+        with self.assertRaises(TypeError):
+
+            @dispatch_overloads
+            def undeclared():
+                pass
+
 
 class CollectionsAbcTests(TestCase):
 
@@ -1096,6 +2145,113 @@ class NamedTupleTests(TestCase):
             jane2 = pickle.loads(z)
             self.assertEqual(jane2, jane)
 
+    def test_namedtuple_api(self):
+        Point = NamedTuple('Point', [('x', int), ('y', int)])
+        p = Point(1, y=2)
+        self.assertEqual(p, (1, 2))
+        self.assertEqual(repr(p), 'Point(x=1, y=2)')
+        self.assertEqual(Point.__doc__, 'Point(x, y)')
+        self.assertEqual(Point.y.__doc__, 'Alias for field number 1')
+        self.assertEqual(Point.__module__, __name__)
+        self.assertEqual(Point.__slots__, ())
+        self.assertEqual(Point._make([3, 4]), (3, 4))
+        self.assertEqual(p._replace(y=5), (1, 5))
+        self.assertEqual(dict(p._asdict()), {'x': 1, 'y': 2})
+        with self.assertRaises(AttributeError):
+            p.z = 3
+        with self.assertRaises(TypeError):
+            Point._make([1])
+        with self.assertRaises(ValueError):
+            p._replace(z=3)
+        with self.assertRaises(TypeError):
+            Point(1)
+        with self.assertRaises(TypeError):
+            Point(1, 2, 3)
+        with self.assertRaises(TypeError):
+            Point(1, x=2)
+        with self.assertRaises(TypeError):
+            Point(1, z=2)
+
+    def test_invalid_names(self):
+        for typename, fields in [('1x', []), ('class', []),
+                                 ('P', [('_x', int)]),
+                                 ('P', [('x', int), ('x', str)]),
+                                 ('P', [('x y', int)])]:
+            with self.assertRaises(ValueError):
+                NamedTuple(typename, fields)
+
+    def test_validate(self):
+
+        class Boss(object):
+            pass
+
+        Emp = NamedTuple('Emp', [('name', typing.Text),
+                                 ('ids', typing.List[int]),
+                                 ('boss', 'Optional[Boss]')])
+        self.assertEqual(len(Emp._field_checkers), 3)
+        Emp('Joe', [1], None)._validate()
+        Emp('Jim', [], Boss())._validate()
+        with self.assertRaises(TypeError):
+            Emp('Jim', ['1'], None)._validate()
+        with self.assertRaises(TypeError):
+            Emp('Jim', [], 'Joe')._validate()
+
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class RecordBatchTests(TestCase):
+
+    Row = NamedTuple('Row', [('id', int), ('score', Optional[float]),
+                             ('ok', bool), ('name', typing.Text),
+                             ('raw', Optional[bytes]),
+                             ('tags', typing.List[str])])
+
+    rows = [(1, 0.5, True, 'a', b'x', ['t']),
+            (2, None, False, 'bc', None, []),
+            (3, 2.0, True, '', b'', ['u', 'v'])]
+
+    def check_batch(self, use_numpy):
+        batch = typing.RecordBatch(self.Row, self.rows, use_numpy=use_numpy)
+        self.assertEqual(batch.use_numpy, use_numpy)
+        self.assertEqual(len(batch), 3)
+        records = batch.to_records()
+        self.assertEqual(records, [self.Row(*row) for row in self.rows])
+        self.assertTrue(all(type(r) is self.Row for r in records))
+        self.assertIs(type(records[0].ok), bool)
+        self.assertEqual(batch[1], self.Row(*self.rows[1]))
+        self.assertEqual(batch[-1], self.Row(*self.rows[-1]))
+        self.assertEqual(list(batch), records)
+        self.assertEqual(batch[1:].to_records(), records[1:])
+        self.assertEqual(list(batch.column('id')), [1, 2, 3])
+        self.assertEqual(list(batch.column('score')), [0.5, 0.0, 2.0])
+        self.assertGreater(batch.nbytes, 0)
+        with self.assertRaises(IndexError):
+            batch[3]
+        empty = typing.RecordBatch(self.Row, use_numpy=use_numpy)
+        self.assertEqual(len(empty), 0)
+        self.assertEqual(empty.to_records(), [])
+
+    def test_array(self):
+        self.check_batch(False)
+        batch = typing.RecordBatch(self.Row, self.rows, use_numpy=False)
+        self.assertIn(batch.column('id').typecode, ('q', 'l'))
+        self.assertEqual(batch.column('name'), ['a', 'bc', ''])
+
+    @skipUnless(numpy, 'requires NumPy')
+    def test_numpy(self):
+        self.check_batch(True)
+        batch = typing.RecordBatch(self.Row, self.rows)
+        self.assertEqual(batch.column('id').dtype, numpy.dtype('i8'))
+        self.assertEqual(batch.column('tags').dtype, numpy.dtype(object))
+
+    def test_wrong_rows(self):
+        with self.assertRaises(TypeError):
+            typing.RecordBatch(self.Row, [(1, 2)], use_numpy=False)
+
 
 class IOTests(TestCase):
 
@@ -1193,13 +2349,117 @@ class AllTests(TestCase):
         # Check that Text is defined.
         assert 'Text' in a
 
-    def test_get_type_hints_dummy(self):
 
-        def foo(x):
-            # type: (int) -> int
-            return x + 1
+class ProfilingTests(TestCase):
+
+    def test_profiling(self):
+        typing.profiling_report(clear=True)
+        typing.enable_profiling()
+        try:
 
-        assert typing.get_type_hints(foo) is None
+            class C(Generic[T]):
+                pass
+
+            C[Employee]
+            Union[Employee, Manager, int]
+        finally:
+            typing.disable_profiling()
+        C[int]
+        report = typing.profiling_report(clear=True).splitlines()
+        rows = [line.split() for line in report[1:-1]]
+        assert ['typing.GenericMeta', __name__, '2'] in [r[:3] for r in rows]
+        assert ['typing.UnionMeta', __name__, '1'] in [r[:3] for r in rows]
+        assert report[-1].split()[:2] == ['total', '3']
+        assert len(typing.profiling_report().splitlines()) == 2
+
+    def test_disable_restores(self):
+        typing.enable_profiling()
+        new = typing.GenericMeta.__dict__['__new__'].__func__
+        typing.disable_profiling()
+        restored = typing.GenericMeta.__dict__['__new__'].__func__
+        assert restored is new.__profiled__
+
+
+class StatsTests(TestCase):
+
+    def test_stats(self):
+        typing.stats(clear=True)
+        typing.enable_stats()
+        try:
+            typing.List[Employee]
+            typing.List[Employee]
+            isinstance([], typing.Sequence)
+            issubclass(Manager, Union[Employee, int])
+        finally:
+            typing.disable_stats()
+        typing.List[int]
+        calls = typing.stats(clear=True)['calls']
+        getitem = calls['GenericMeta', '__getitem__']
+        assert getitem['count'] == 2
+        assert getitem['types'] == {typing.List: 2}
+        assert getitem['seconds'] > 0
+        assert calls['GenericMeta', '__instancecheck__']['count'] == 1
+        assert calls['UnionMeta', '__subclasscheck__']['count'] == 1
+        assert typing.stats()['calls'] == {}
+
+    def test_stats_types_weak(self):
+        import gc
+        import weakref
+
+        class C(Generic[T]):
+            pass
+
+        typing.stats(clear=True)
+        typing.enable_stats()
+        try:
+            isinstance(1, C)
+        finally:
+            typing.disable_stats()
+        calls = typing.stats()['calls']
+        assert calls['GenericMeta', '__instancecheck__']['types'] == {C: 1}
+        del calls
+        ref = weakref.ref(C)
+        del C
+        gc.collect()
+        assert ref() is None
+        calls = typing.stats(clear=True)['calls']
+        assert calls['GenericMeta', '__instancecheck__']['count'] == 1
+
+    def test_cache_stats(self):
+        typing._generic_cache.cache_clear()
+        typing.List[Employee]
+        typing.List[Employee]
+        caches = typing.stats()['caches']
+        assert caches['_generic_cache']['hits'] == 1
+        assert caches['_generic_cache']['hit_ratio'] == 0.5
+        assert '_union_cache' in caches
+
+    def test_disable_restores(self):
+        typing.enable_stats()
+        typing.disable_stats()
+        assert not hasattr(typing.GenericMeta.__getitem__, '__stats_wrapped__')
+
+
+class LazyTests(TestCase):
+
+    def test_lazy_mode(self):
+        import os
+        import subprocess
+        code = '\n'.join([
+            "import typing",
+            "assert 'TextIO' not in vars(typing)",
+            "assert 'TextIO' in dir(typing)",
+            "from typing.io import TextIO",
+            "assert TextIO is typing.TextIO",
+            "assert typing.IO in TextIO.__mro__",
+            "assert issubclass(int, typing.SupportsInt)",
+            "assert typing.ItemsView[int, str] is typing.ItemsView[int, str]",
+            "assert not hasattr(typing, 'Nonexistent')",
+            "from typing import *",
+        ])
+        env = dict(os.environ, PYTHONTYPINGLAZY='1')
+        cwd = os.path.dirname(os.path.abspath(typing.__file__))
+        subprocess.check_call([sys.executable, '-c', code], env=env, cwd=cwd)
 
 
 if __name__ == '__main__':
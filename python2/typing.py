@@ -3,14 +3,23 @@ from __future__ import absolute_import, unicode_literals
 import abc
 from abc import abstractmethod, abstractproperty
 import collections
+import copy_reg
 import functools
+import operator
+import os
 import re as stdlib_re  # Avoid confusion with the re we export.
 import sys
+import time
 import types
+import weakref
 try:
     import collections.abc as collections_abc
 except ImportError:
     import collections as collections_abc  # Fallback for PY3.2.
+try:
+    import thread
+except ImportError:
+    import dummy_thread as thread
 
 
 # Please keep __all__ alphabetized within each category.
@@ -59,10 +68,19 @@ __all__ = [
     # One-off things.
     'AnyStr',
     'cast',
+    'compile_checker',
+    'compile_decoder',
+    'compile_encoder',
+    'compile_stream_checker',
+    'dispatch_overloads',
+    'fingerprint',
+    'get_class_type_hints',
+    'get_module_type_hints',
     'get_type_hints',
     'no_type_check',
     'no_type_check_decorator',
     'overload',
+    'RecordBatch',
     'Text',
 ]
 
@@ -79,6 +97,322 @@ def _qualname(x):
         return x.__name__
 
 
+def _abc_cache_token():
+    """Return a token that changes whenever an ABC gets a new virtual
+    subclass, like abc.get_cache_token() in Python 3.4+.
+    """
+    return abc.ABCMeta._abc_invalidation_counter
+
+
+# Default bound for the caches below.
+_CACHE_SIZE = 1024
+
+_CacheInfo = collections.namedtuple('CacheInfo',
+                                    ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+class _TypeCache(object):
+    """Internal bounded LRU mapping used to memoize typing objects.
+
+    Keys that cannot be hashed are silently not cached, so callers can
+    always fall back to computing the value.  The cache_info() and
+    cache_clear() methods mirror those of functools.lru_cache().
+    """
+
+    def __init__(self, maxsize=_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = collections.OrderedDict()
+
+    def get(self, key, default=None, valid=None):
+        """Return the value for key, or default.
+
+        If valid is given, it is called with the value, and a false
+        result makes the lookup count as a miss.
+        """
+        try:
+            value = self._data[key]
+        except (KeyError, TypeError):
+            value = self._missing(key)
+            if value is None:
+                self.misses += 1
+                return default
+            self[key] = value
+        else:
+            try:
+                del self._data[key]
+            except KeyError:
+                pass  # Evicted by another thread meanwhile.
+            else:
+                self._data[key] = value
+        if valid is not None and not valid(value):
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def __setitem__(self, key, value):
+        data = self._data
+        try:
+            data[key] = value
+        except TypeError:
+            return  # Unhashable key.
+        while len(data) > self.maxsize:
+            try:
+                self._evicted(*data.popitem(last=False))
+            except KeyError:
+                break
+
+    def __len__(self):
+        return len(self._data)
+
+    def _missing(self, key):
+        """Hook called on an LRU miss; may return a value or None."""
+        return None
+
+    def _evicted(self, key, value):
+        """Hook called for every entry dropped by the LRU policy."""
+        pass
+
+    def cache_info(self):
+        return _CacheInfo(self.hits, self.misses, self.maxsize, len(self))
+
+    def cache_clear(self):
+        self._data.clear()
+        self.hits = self.misses = 0
+
+
+class _InternCache(_TypeCache):
+    """Internal interning cache for typing objects.
+
+    The LRU part bounds how many objects the cache keeps alive by
+    itself.  Entries evicted from it are remembered weakly, so as long
+    as anything else still holds on to an interned object, asking for
+    it again returns the identical object.
+    """
+
+    def __init__(self, maxsize=_CACHE_SIZE):
+        super(_InternCache, self).__init__(maxsize)
+        self._weak = weakref.WeakValueDictionary()
+
+    def _missing(self, key):
+        try:
+            return self._weak.get(key)
+        except TypeError:
+            return None
+
+    def _evicted(self, key, value):
+        try:
+            self._weak[key] = value
+        except TypeError:
+            pass  # Not weakly referenceable.
+
+    def cache_clear(self):
+        super(_InternCache, self).cache_clear()
+        self._weak.clear()
+
+
+class _AttrCache(_TypeCache):
+    """Internal unbounded cache storing each entry on its key object.
+
+    Keeping the entry in an attribute of the key (e.g. a function)
+    means it dies with the key, even if the cached value refers back
+    to it.  Each entry also records a token, a tuple of the objects its
+    value was computed from; a lookup passing a token whose items are
+    not identical to the recorded ones counts as a miss.
+    """
+
+    def __init__(self, attr):
+        super(_AttrCache, self).__init__(None)
+        self.attr = attr
+        self._data = weakref.WeakSet()  # Keys holding an entry.
+
+    def get(self, key, token=(), default=None):
+        entry = getattr(key, self.attr, None)
+        if entry is not None:
+            entry_token, value = entry
+            if (len(entry_token) == len(token) and
+                    all(a is b for a, b in zip(entry_token, token))):
+                self.hits += 1
+                return value
+        self.misses += 1
+        return default
+
+    def put(self, key, token, value):
+        try:
+            setattr(key, self.attr, (token, value))
+            self._data.add(key)
+        except (AttributeError, TypeError):
+            pass  # Read-only or not weakly referenceable.
+
+    def cache_clear(self):
+        for key in list(self._data):
+            try:
+                delattr(key, self.attr)
+            except AttributeError:
+                pass
+        super(_AttrCache, self).cache_clear()
+
+
+class _WeakKeyCache(_TypeCache):
+    """Internal unbounded cache holding its keys weakly.
+
+    Entries die with their key.  Keys that cannot be hashed or weakly
+    referenced are silently not cached.
+    """
+
+    def __init__(self):
+        super(_WeakKeyCache, self).__init__(None)
+        self._data = weakref.WeakKeyDictionary()
+
+    def get(self, key, default=None):
+        try:
+            value = self._data[key]
+        except (KeyError, TypeError):
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def __setitem__(self, key, value):
+        try:
+            self._data[key] = value
+        except TypeError:
+            pass  # Unhashable or not weakly referenceable.
+
+
+# Profiling of class creation.
+#
+# When enabled, each outermost call to the __new__() of a typing
+# metaclass is counted and timed, keyed on the metaclass and on the
+# module that caused it (typing itself, while it is being imported).
+# Set the environment variable PYTHONTYPINGPROFILE to a file name, or
+# to '-' for standard error, to profile from the start and have the
+# report written there at exit.
+
+_profile_enabled = False
+_profile_stats = {}  # (metaclass, module) -> [count, seconds].
+_profile_local = thread._local()
+_profile_metaclasses = []  # See _profiled().
+_profile_timer = getattr(time, 'perf_counter', time.time)
+
+
+def _profiled(meta):
+    """Class decorator registering a metaclass defining __new__()."""
+    _profile_metaclasses.append(meta)
+    if _profile_enabled:
+        _profile_install(meta)
+    return meta
+
+
+def _caller_module():
+    """Return the name of the module whose code called into typing."""
+    # Skip typing's functions, and any metaclass __new__() (including
+    # ABCMeta's, which may pass the call on to ours).
+    frame = sys._getframe(1)
+    typing_globals = globals()
+    while frame is not None and (
+            frame.f_code.co_name == '__new__' or
+            (frame.f_globals is typing_globals and
+             frame.f_code.co_name != '<module>')):
+        frame = frame.f_back
+    if frame is None:
+        return '?'
+    return frame.f_globals.get('__name__', '?')
+
+
+def _profile_install(meta):
+    new = meta.__dict__['__new__'].__func__
+    if hasattr(new, '__profiled__'):
+        return
+
+    def __new__(cls, *args, **kwds):
+        if getattr(_profile_local, 'active', False):
+            return new(cls, *args, **kwds)
+        _profile_local.active = True
+        start = _profile_timer()
+        try:
+            return new(cls, *args, **kwds)
+        finally:
+            elapsed = _profile_timer() - start
+            _profile_local.active = False
+            key = ('%s.%s' % (cls.__module__, _qualname(cls)),
+                   _caller_module())
+            entry = _profile_stats.setdefault(key, [0, 0.0])
+            entry[0] += 1
+            entry[1] += elapsed
+
+    __new__.__profiled__ = new
+    meta.__new__ = staticmethod(__new__)
+
+
+def _profile_uninstall(meta):
+    new = meta.__dict__['__new__'].__func__
+    if hasattr(new, '__profiled__'):
+        meta.__new__ = staticmethod(new.__profiled__)
+
+
+def enable_profiling():
+    """Start profiling the creation of typing classes.
+
+    This is not thread-safe with respect to class creation running
+    concurrently in other threads.
+    """
+    global _profile_enabled
+    _profile_enabled = True
+    for meta in _profile_metaclasses:
+        _profile_install(meta)
+
+
+def disable_profiling():
+    """Stop profiling the creation of typing classes.
+
+    The statistics are kept until profiling_report(clear=True).
+    """
+    global _profile_enabled
+    _profile_enabled = False
+    for meta in _profile_metaclasses:
+        _profile_uninstall(meta)
+
+
+def profiling_report(clear=False):
+    """Return the class creation statistics as a text table.
+
+    Rows are sorted by metaclass and module, so that reports from
+    different runs or releases can be compared with diff.
+    """
+    header = '%-32s %-32s %8s %12s'
+    row = '%-32s %-32s %8d %12.3f'
+    lines = [header % ('metaclass', 'module', 'count', 'msec')]
+    total_count = 0
+    total_time = 0.0
+    for (meta, module), (count, seconds) in sorted(_profile_stats.items()):
+        lines.append(row % (meta, module, count, seconds * 1000))
+        total_count += count
+        total_time += seconds
+    lines.append(row % ('total', '', total_count, total_time * 1000))
+    if clear:
+        _profile_stats.clear()
+    return '\n'.join(lines) + '\n'
+
+
+def _profile_dump(filename):
+    report = profiling_report()
+    if filename == '-':
+        sys.stderr.write(report)
+    else:
+        with open(filename, 'w') as f:
+            f.write(report)
+
+
+if os.environ.get('PYTHONTYPINGPROFILE'):
+    import atexit
+    atexit.register(_profile_dump, os.environ['PYTHONTYPINGPROFILE'])
+    _profile_enabled = True
+
+
+@_profiled
 class TypingMeta(type):
     """Metaclass for every type defined below.
 
@@ -117,6 +451,15 @@ class TypingMeta(type):
     def __repr__(self):
         return '%s.%s' % (self.__module__, _qualname(self))
 
+    def __reduce__(self):
+        """Pickle support, registered with copyreg.
+
+        Unsubscripted types are pickled by reference, like any class.
+        Subclasses pickle subscripted types as the origin plus the
+        parameters, so that unpickling subscripts the origin again.
+        """
+        return self.__name__
+
 
 class Final(object):
     """Mix-in class to prevent instantiation."""
@@ -127,17 +470,34 @@ class Final(object):
         raise TypeError("Cannot instantiate %r" % self.__class__)
 
 
+# Compiled forward reference expressions, keyed on their source.
+_forward_code_cache = _TypeCache()
+
+
+@_profiled
 class _ForwardRef(TypingMeta):
-    """Wrapper to hold a forward reference."""
+    """Wrapper to hold a forward reference.
+
+    The reference remembers where it was created, so that it can be
+    evaluated on first use.  Only the module globals and the caller's
+    locals named in the expression are kept.
+    Set _ForwardRef.keep_frames to True to keep the whole caller frame
+    instead, e.g. to see locals assigned after the reference was made.
+    """
+
+    keep_frames = False
 
     def __new__(cls, arg):
         if not isinstance(arg, basestring):
             raise TypeError('ForwardRef must be a string -- got %r' % (arg,))
-        try:
-            code = compile(arg, '<string>', 'eval')
-        except SyntaxError:
-            raise SyntaxError('ForwardRef must be an expression -- got %r' %
-                              (arg,))
+        code = _forward_code_cache.get(arg)
+        if code is None:
+            try:
+                code = compile(arg, '<string>', 'eval')
+            except SyntaxError:
+                raise SyntaxError('ForwardRef must be an expression '
+                                  '-- got %r' % (arg,))
+            _forward_code_cache[arg] = code
         self = super(_ForwardRef, cls).__new__(cls, arg, (), {})
         self.__forward_arg__ = arg
         self.__forward_code__ = code
@@ -148,9 +508,36 @@ class _ForwardRef(TypingMeta):
         while frame is not None and frame.f_globals is typing_globals:
             frame = frame.f_back
         assert frame is not None
-        self.__forward_frame__ = frame
+        if self.keep_frames:
+            self.__forward_frame__ = frame
+        else:
+            self.__forward_frame__ = None
+            self._capture_namespaces(frame.f_globals, frame.f_locals)
         return self
 
+    def _capture_namespaces(self, globalns, localns):
+        # Modules can't be weakly referenced in Python 2, so just keep
+        # their globals.
+        self.__forward_globals__ = globalns
+        if localns is globalns:
+            self.__forward_locals__ = None
+        else:
+            names = self.__forward_code__.co_names
+            self.__forward_locals__ = dict((name, localns[name])
+                                           for name in names
+                                           if name in localns)
+
+    def _namespaces(self):
+        """Return (globalns, localns) to evaluate the reference in."""
+        frame = self.__forward_frame__
+        if frame is not None:
+            return frame.f_globals, frame.f_locals
+        globalns = self.__forward_globals__
+        localns = self.__forward_locals__
+        if localns is None:
+            localns = globalns
+        return globalns, localns
+
     def _eval_type(self, globalns, localns):
         if not isinstance(localns, dict):
             raise TypeError('ForwardRef localns must be a dict -- got %r' %
@@ -176,8 +563,7 @@ class _ForwardRef(TypingMeta):
 
     def __subclasscheck__(self, cls):
         if not self.__forward_evaluated__:
-            globalns = self.__forward_frame__.f_globals
-            localns = self.__forward_frame__.f_locals
+            globalns, localns = self._namespaces()
             try:
                 self._eval_type(globalns, localns)
             except NameError:
@@ -322,6 +708,7 @@ def _type_repr(obj):
         return repr(obj)
 
 
+@_profiled
 class AnyMeta(TypingMeta):
     """Metaclass for Any."""
 
@@ -357,6 +744,7 @@ class TypeVarMeta(TypingMeta):
         return super(TypeVarMeta, cls).__new__(cls, name, bases, namespace)
 
 
+@_profiled
 class TypeVar(TypingMeta):
     """Type variable.
 
@@ -422,6 +810,8 @@ class TypeVar(TypingMeta):
             self.__bound__ = _type_check(bound, "Bound must be a type.")
         else:
             self.__bound__ = None
+        # Tells apart type variables of the same name in fingerprint().
+        self.__defining_module__ = _caller_module()
         return self
 
     def _get_type_vars(self, tvars):
@@ -466,6 +856,39 @@ T_contra = TypeVar('T_contra', contravariant=True)  # Ditto contravariant.
 AnyStr = TypeVar('AnyStr', bytes, unicode)
 
 
+def _remove_subclasses(params):
+    """Helper for UnionMeta.__new__.
+
+    Returns params without those that are a subclass of another
+    parameter, preserving order.  Type variables and type aliases are
+    never discarded.
+
+    For a plain class t2 (whose metaclass is type), issubclass(t1, t2)
+    is the same as t2 in t1.__mro__, so those are found with one MRO
+    scan per parameter.  Only parameters with their own subclass check
+    (ABCs, typing types, type aliases) are tried pairwise.
+    """
+    survivors = set(params)
+    plain = {id(t) for t in params if type(t) is type}
+    special = [t for t in params
+               if type(t) is not type and not isinstance(t, TypeVar)]
+    for t1 in params:
+        if isinstance(t1, (TypeVar, _TypeAlias)):
+            # _TypeAlias is not a real class.
+            continue
+        if (any(id(c) in plain for c in t1.__mro__[1:]) or
+                any(t2 is not t1 and t2 in survivors and issubclass(t1, t2)
+                    for t2 in special)):
+            survivors.remove(t1)
+            plain.discard(id(t1))
+    return [t for t in params if t in survivors]
+
+
+# Canonical unions, keyed on (metaclass, frozenset of flattened params).
+_union_cache = _InternCache()
+
+
+@_profiled
 class UnionMeta(TypingMeta):
     """Metaclass for Union."""
 
@@ -483,6 +906,11 @@ class UnionMeta(TypingMeta):
                 params.extend(p.__union_params__)
             else:
                 params.append(_type_check(p, msg))
+        # Equal unions are canonicalized to the same object.
+        key = (cls, frozenset(params))
+        cached = _union_cache.get(key)
+        if cached is not None:
+            return cached
         # Weed out strict duplicates, preserving the first of each occurrence.
         all_params = set(params)
         if len(all_params) < len(params):
@@ -499,25 +927,19 @@ class UnionMeta(TypingMeta):
         # If both Any and object are present, Any wins.
         # Never discard type variables, except against Any.
         # (In particular, Union[str, AnyStr] != AnyStr.)
-        all_params = set(params)
-        for t1 in params:
-            if t1 is Any:
-                return Any
-            if isinstance(t1, TypeVar):
-                continue
-            if isinstance(t1, _TypeAlias):
-                # _TypeAlias is not a real class.
-                continue
-            if any(issubclass(t1, t2)
-                   for t2 in all_params - {t1} if not isinstance(t2, TypeVar)):
-                all_params.remove(t1)
-        # It's not a union if there's only one type left.
-        if len(all_params) == 1:
-            return all_params.pop()
-        # Create a new class with these params.
-        self = super(UnionMeta, cls).__new__(cls, name, bases, {})
-        self.__union_params__ = tuple(t for t in params if t in all_params)
-        self.__union_set_params__ = frozenset(self.__union_params__)
+        if any(t is Any for t in params):
+            self = Any
+        else:
+            params = _remove_subclasses(params)
+            # It's not a union if there's only one type left.
+            if len(params) == 1:
+                self = params[0]
+            else:
+                # Create a new class with these params.
+                self = super(UnionMeta, cls).__new__(cls, name, bases, {})
+                self.__union_params__ = tuple(params)
+                self.__union_set_params__ = frozenset(params)
+        _union_cache[key] = self
         return self
 
     def _eval_type(self, globalns, localns):
@@ -540,6 +962,11 @@ class UnionMeta(TypingMeta):
                                      for t in self.__union_params__))
         return r
 
+    def __reduce__(self):
+        if self.__union_params__ is None:
+            return super(UnionMeta, self).__reduce__()
+        return operator.getitem, (Union, _pickle_params(self.__union_params__))
+
     def __getitem__(self, parameters):
         if self.__union_params__ is not None:
             raise TypeError(
@@ -640,6 +1067,7 @@ class Union(Final):
     __union_set_params__ = None
 
 
+@_profiled
 class OptionalMeta(TypingMeta):
     """Metaclass for Optional."""
 
@@ -662,6 +1090,7 @@ class Optional(Final):
     __slots__ = ()
 
 
+@_profiled
 class TupleMeta(TypingMeta):
     """Metaclass for Tuple."""
 
@@ -698,6 +1127,14 @@ class TupleMeta(TypingMeta):
                 ', '.join(params))
         return r
 
+    def __reduce__(self):
+        if self.__tuple_params__ is None:
+            return super(TupleMeta, self).__reduce__()
+        params = _pickle_params(self.__tuple_params__)
+        if self.__tuple_use_ellipsis__:
+            return _getitem_ellipsis, (Tuple, params[0])
+        return operator.getitem, (Tuple, params)
+
     def __getitem__(self, parameters):
         if self.__tuple_params__ is not None:
             raise TypeError("Cannot re-parameterize %r" % (self,))
@@ -764,6 +1201,7 @@ class Tuple(Final):
     __slots__ = ()
 
 
+@_profiled
 class CallableMeta(TypingMeta):
     """Metaclass for Callable."""
 
@@ -816,6 +1254,15 @@ class CallableMeta(TypingMeta):
             r += '[%s, %s]' % (args_r, _type_repr(self.__result__))
         return r
 
+    def __reduce__(self):
+        if self.__args__ is None and self.__result__ is None:
+            return super(CallableMeta, self).__reduce__()
+        result, = _pickle_params((self.__result__,))
+        if self.__args__ is Ellipsis:
+            return _getitem_ellipsis, (Callable, result)
+        args = list(_pickle_params(self.__args__))
+        return operator.getitem, (Callable, (args, result))
+
     def __getitem__(self, parameters):
         if self.__args__ is not None or self.__result__ is not None:
             raise TypeError("This Callable type is already parameterized.")
@@ -874,9 +1321,7 @@ class Callable(Final):
 def _gorg(a):
     """Return the farthest origin of a generic class."""
     assert isinstance(a, GenericMeta)
-    while a.__origin__ is not None:
-        a = a.__origin__
-    return a
+    return a.__origin_root__
 
 
 def _geqv(a, b):
@@ -908,6 +1353,42 @@ def _next_in_mro(cls):
     return next_in_mro
 
 
+# Interned results of GenericMeta.__getitem__(), keyed on (origin, params).
+# The cache is private.  stats() reports its cache_info() under
+# '_generic_cache', but there is no public way to clear it.
+_generic_cache = _InternCache()
+
+# Results of GenericMeta.__subclasscheck__() between two parameterizations
+# of the same generic, keyed on (self, cls, _abc_cache_token()).
+_subclass_cache = _TypeCache()
+
+
+def _has_unresolved_refs(types):
+    """Return whether types contain a forward reference not evaluated yet.
+
+    This looks into the parameters of subscripted types, recursively.
+    """
+    for t in types:
+        if isinstance(t, _ForwardRef):
+            params = () if t.__forward_evaluated__ else None
+        elif isinstance(t, GenericMeta):
+            params = t.__args__ or ()
+        elif isinstance(t, UnionMeta):
+            params = t.__union_params__ or ()
+        elif isinstance(t, TupleMeta):
+            params = t.__tuple_params__ or ()
+        elif isinstance(t, CallableMeta):
+            params = (t.__result__,)
+            if isinstance(t.__args__, tuple):
+                params += tuple(t.__args__)
+        else:
+            params = ()
+        if params is None or _has_unresolved_refs(params):
+            return True
+    return False
+
+
+@_profiled
 class GenericMeta(TypingMeta, abc.ABCMeta):
     """Metaclass for generic types."""
 
@@ -960,12 +1441,26 @@ class GenericMeta(TypingMeta, abc.ABCMeta):
         self.__parameters__ = tvars
         self.__args__ = args
         self.__origin__ = origin
+        # The farthest origin, see _gorg().
+        self.__origin_root__ = (self if origin is None
+                                else origin.__origin_root__)
+        # Computed once here, since types are frequently used as dict keys.
+        # Unparameterized classes compare by identity (see __eq__ below).
+        if origin is None:
+            self.__tree_hash__ = type.__hash__(self)
+        else:
+            self.__tree_hash__ = hash((origin, args, tvars))
         if extra is not None:
             self.__extra__ = extra
         # Else __extra__ is inherited, eventually from the
         # (meta-)class default above.
         # Speed hack (https://github.com/python/typing/issues/196).
         self.__next_in_mro__ = _next_in_mro(self)
+        # Results of __instancecheck__, see there.  The '_abc_' prefix
+        # keeps these out of protocol attributes.
+        self._abc_instance_cache = weakref.WeakSet()
+        self._abc_instance_negative_cache = weakref.WeakSet()
+        self._abc_instance_negative_cache_version = _abc_cache_token()
         return self
 
     def _get_type_vars(self, tvars):
@@ -985,6 +1480,15 @@ class GenericMeta(TypingMeta, abc.ABCMeta):
                 ', '.join(_type_repr(p) for p in self.__parameters__))
         return r
 
+    def __reduce__(self):
+        if self.__origin__ is None:
+            return super(GenericMeta, self).__reduce__()
+        if self.__args__ is None:
+            # Generic[T, ...] or _Protocol[T, ...].
+            return operator.getitem, (self.__origin__, self.__parameters__)
+        return operator.getitem, (self.__origin__,
+                                  _pickle_params(self.__args__))
+
     def __eq__(self, other):
         if not isinstance(other, GenericMeta):
             return NotImplemented
@@ -996,7 +1500,7 @@ class GenericMeta(TypingMeta, abc.ABCMeta):
             return self is other
 
     def __hash__(self):
-        return hash((self.__name__, self.__parameters__))
+        return self.__tree_hash__
 
     def __getitem__(self, params):
         if not isinstance(params, tuple):
@@ -1006,6 +1510,10 @@ class GenericMeta(TypingMeta, abc.ABCMeta):
                 "Parameter list to %s[...] cannot be empty" % _qualname(self))
         msg = "Parameters to generic types must be types."
         params = tuple(_type_check(p, msg) for p in params)
+        key = (self, params)
+        cached = _generic_cache.get(key)
+        if cached is not None:
+            return cached
         if self is Generic:
             # Generic can only be subscripted with unique type variables.
             if not all(isinstance(p, TypeVar) for p in params):
@@ -1036,25 +1544,61 @@ class GenericMeta(TypingMeta, abc.ABCMeta):
                     ("many" if alen > elen else "few", repr(self), alen, elen))
             tvars = _type_vars(params)
             args = params
-        return self.__class__(self.__name__,
-                              (self,) + self.__bases__,
-                              dict(self.__dict__),
-                              tvars=tvars,
-                              args=args,
-                              origin=self,
-                              extra=self.__extra__)
+        result = self.__class__(self.__name__,
+                                (self,) + self.__bases__,
+                                dict(self.__dict__),
+                                tvars=tvars,
+                                args=args,
+                                origin=self,
+                                extra=self.__extra__)
+        _generic_cache[key] = result
+        return result
 
     def __instancecheck__(self, instance):
         # Since we extend ABC.__subclasscheck__ and
         # ABC.__instancecheck__ inlines the cache checking done by the
-        # latter, we must extend __instancecheck__ too. For simplicity
-        # we just skip the cache check -- instance checks for generic
-        # classes are supposed to be rare anyways.
-        return self.__subclasscheck__(instance.__class__)
+        # latter, we must extend __instancecheck__ too.  We keep our own
+        # caches, invalidating negative results on any register() call,
+        # just like ABCMeta does.
+        cls = instance.__class__
+        if cls in self._abc_instance_cache:
+            return True
+        token = _abc_cache_token()
+        if self._abc_instance_negative_cache_version != token:
+            self._abc_instance_negative_cache = weakref.WeakSet()
+            self._abc_instance_negative_cache_version = token
+        elif cls in self._abc_instance_negative_cache:
+            return False
+        result = self.__subclasscheck__(cls)
+        try:
+            if result:
+                self._abc_instance_cache.add(cls)
+            else:
+                self._abc_instance_negative_cache.add(cls)
+        except TypeError:
+            pass  # Not weakly referenceable.
+        return result
 
     def __subclasscheck__(self, cls):
         if cls is Any:
             return True
+        if (isinstance(cls, GenericMeta) and
+                self.__origin__ is not None and
+                self.__origin__ is cls.__origin__):
+            # Checking the arguments recurses into them, so memoize.
+            # The token makes register() calls invalidate the entries.
+            key = (self, cls, _abc_cache_token())
+            result = _subclass_cache.get(key)
+            if result is None:
+                result = self._subclasscheck(cls)
+                # A forward reference that can't be evaluated yet may
+                # give a different result later.
+                if not _has_unresolved_refs(self.__args__ + cls.__args__):
+                    _subclass_cache[key] = result
+            return result
+        return self._subclasscheck(cls)
+
+    def _subclasscheck(self, cls):
         if isinstance(cls, GenericMeta):
             # For a class C(Generic[T]) where T is co-variant,
             # C[X] is a subclass of C[Y] iff X is a subclass of Y.
@@ -1125,8 +1669,9 @@ class Generic(object):
         if cls.__origin__ is None:
             return cls.__next_in_mro__.__new__(cls)
         else:
-            origin = _gorg(cls)
-            obj = cls.__next_in_mro__.__new__(origin)
+            # Instantiate the unparameterized class; type.__call__()
+            # won't run __init__() for us since it's not a subclass.
+            obj = cls.__next_in_mro__.__new__(cls.__origin_root__)
             obj.__init__(*args, **kwds)
             return obj
 
@@ -1149,8 +1694,7 @@ def _get_defaults(func):
     arg_names = code.co_varnames
     arg_names = arg_names[:pos_count]
     defaults = func.__defaults__ or ()
-    kwdefaults = func.__kwdefaults__
-    res = dict(kwdefaults) if kwdefaults else {}
+    res = {}
     pos_offset = pos_count - len(defaults)
     for name, value in zip(arg_names[pos_offset:], defaults):
         assert name not in res
@@ -1159,8 +1703,346 @@ def _get_defaults(func):
 
 
 def get_type_hints(obj, globalns=None, localns=None):
-    """In Python 2 this is not supported and always returns None."""
-    return None
+    """Return type hints for a function or method object.
+
+    Python 2 has no annotations, so the hints are read from PEP 484 type
+    comments in the source of the function, either a signature comment
+    after the def line::
+
+      def embezzle(self, account, funds=None):
+          # type: (str, int) -> None
+
+    or one comment per argument, plus a signature comment for the
+    return type with '...' for the arguments.  The first argument of
+    methods may be left out.  String types are evaluated as forward
+    references, and Optional[t] is added if a default value equal to
+    None is set, as in Python 3.
+
+    BEWARE -- the behavior of globalns and localns is counterintuitive
+    (unless you are familiar with how eval() and exec() work).  The
+    search order is locals first, then globals.
+
+    - If no dict arguments are passed, an attempt is made to use the
+      globals from obj, and these are also used as the locals.  If the
+      object does not appear to have globals, an exception is raised.
+
+    - If one dict argument is passed, it is used for both globals and
+      locals.
+
+    - If two dict arguments are passed, they specify globals and
+      locals, respectively.
+
+    The comments are parsed once per code object.  Results are cached
+    on the function as long as the same dict is used for globals and
+    locals.  Replacing the function's __code__ or __defaults__
+    invalidates its entry; rebinding names in the namespace does not.
+    Use get_type_hints.cache_info() and get_type_hints.cache_clear() to
+    inspect or reset the cache.
+    """
+    if getattr(obj, '__no_type_check__', None):
+        return {}
+    if globalns is None:
+        globalns = getattr(obj, '__globals__', {})
+        if localns is None:
+            localns = globalns
+    elif localns is None:
+        localns = globalns
+    if localns is not globalns:
+        return _get_type_hints(obj, globalns, localns)
+    return dict(_cached_type_hints(obj, globalns))
+
+
+# Results of get_type_hints(), stored on the function itself.
+_hints_cache = _AttrCache('__type_hints_cache__')
+get_type_hints.cache_info = _hints_cache.cache_info
+get_type_hints.cache_clear = _hints_cache.cache_clear
+
+
+def _cached_type_hints(obj, globalns, evaluated=None):
+    """Return the cached hints for obj, using globalns for the locals too.
+
+    The result must not be modified.  See _get_type_hints() for
+    evaluated.
+    """
+    func = getattr(obj, '__func__', obj)
+    token = (func.__code__, func.__defaults__, globalns)
+    hints = _hints_cache.get(func, token)
+    if hints is None:
+        hints = _get_type_hints(obj, globalns, globalns, evaluated)
+        _hints_cache.put(func, token, hints)
+    return hints
+
+
+def _get_type_hints(obj, globalns, localns, evaluated=None):
+    """Uncached implementation of get_type_hints().
+
+    If evaluated is a dict, type comments are looked up there before
+    evaluating them, and the results are stored there.  It must only
+    be shared between calls using the same namespaces.
+    """
+    func = getattr(obj, '__func__', obj)
+    defaults = _get_defaults(func)
+    hints = dict(_type_comments(func))
+    for name, value in hints.items():
+        if evaluated is not None and value in evaluated:
+            value = evaluated[value]
+        else:
+            source = value
+            if localns is globalns:
+                value = _eval_forward(value, globalns)
+            else:
+                value = _eval_type(_ForwardRef(value), globalns, localns)
+            if isinstance(value, _ForwardRef):
+                # A quoted type, as in "# type: ('C') -> None".
+                value = _eval_type(value, globalns, localns)
+            if evaluated is not None:
+                evaluated[source] = value
+        if name in defaults and defaults[name] is None:
+            value = Optional[value]
+        hints[name] = value
+    return hints
+
+
+# Parsed type comments, keyed on (file name, first line, code object).
+# Code objects compare equal regardless of their file, so identical
+# functions in different modules would share an entry otherwise.
+_type_comment_cache = _TypeCache()
+
+
+def _type_comments(func):
+    """Return the type comments of a function as a dict of strings.
+
+    The dict maps argument names and 'return' to type expressions, like
+    __annotations__ in Python 3.  Functions without available source
+    have no type comments.
+    """
+    code = func.__code__
+    key = (code.co_filename, code.co_firstlineno, code)
+    comments = _type_comment_cache.get(key)
+    if comments is None:
+        comments = _parse_type_comments(func)
+        _type_comment_cache[key] = comments
+    return comments
+
+
+def _parse_type_comments(func):
+    import inspect
+    import tokenize
+    try:
+        lines = inspect.getsourcelines(func)[0]
+    except (IOError, TypeError):
+        return {}
+    arg_comments = {}
+    signature = None
+    depth = 0
+    seen_def = in_body = False
+    last_arg = previous = None
+    try:
+        for kind, string, _, _, _ in tokenize.generate_tokens(
+                iter(lines).next):
+            if not seen_def:
+                seen_def = kind == tokenize.NAME and string == 'def'
+            elif not in_body:
+                # The argument list.
+                if kind == tokenize.OP and string in '([{':
+                    depth += 1
+                elif kind == tokenize.OP and string in ')]}':
+                    depth -= 1
+                elif kind == tokenize.OP and string == ':' and depth == 0:
+                    in_body = True
+                elif (kind == tokenize.NAME and depth == 1 and
+                        previous in ('(', ',', '*', '**')):
+                    last_arg = string
+                elif kind == tokenize.COMMENT and last_arg is not None:
+                    comment = _type_comment(string)
+                    if comment is not None:
+                        arg_comments[last_arg] = comment
+            elif kind == tokenize.COMMENT:
+                # Only the first comment can be the signature comment.
+                signature = _type_comment(string)
+                break
+            elif kind not in (tokenize.NEWLINE, tokenize.NL, tokenize.INDENT):
+                break
+            if kind not in (tokenize.NL, tokenize.COMMENT):
+                previous = string
+    except tokenize.TokenError:
+        pass  # Ran out of source lines.
+    if signature is None:
+        return arg_comments
+    return _apply_signature_comment(func, signature, arg_comments)
+
+
+def _type_comment(comment):
+    comment = comment[1:].strip()
+    if not comment.startswith('type:'):
+        return None
+    comment = comment[5:].strip()
+    if comment == 'ignore' or comment.startswith('ignore '):
+        return None
+    return comment
+
+
+def _split_types(source):
+    """Split a comma separated list of types, ignoring nested commas."""
+    types = []
+    depth = 0
+    start = 0
+    for i, char in enumerate(source):
+        if char in '([{':
+            depth += 1
+        elif char in ')]}':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            types.append(source[start:i].strip())
+            start = i + 1
+    types.append(source[start:].strip())
+    return [t for t in types if t]
+
+
+def _apply_signature_comment(func, signature, arg_comments):
+    name = func.__name__
+    if not signature.startswith('('):
+        raise SyntaxError('Bad signature type comment for %s: %r' %
+                          (name, signature))
+    depth = 0
+    for end, char in enumerate(signature):
+        if char in '([{':
+            depth += 1
+        elif char in ')]}':
+            depth -= 1
+            if depth == 0:
+                break
+    rest = signature[end + 1:].strip()
+    if depth or not rest.startswith('->'):
+        raise SyntaxError('Bad signature type comment for %s: %r' %
+                          (name, signature))
+    comments = dict(arg_comments)
+    comments['return'] = rest[2:].strip()
+    arg_types = signature[1:end].strip()
+    if arg_types == '...':
+        return comments
+    code = func.__code__
+    positional = list(code.co_varnames[:code.co_argcount])
+    index = code.co_argcount
+    star = starstar = None
+    if code.co_flags & 0x04:  # CO_VARARGS
+        star = code.co_varnames[index]
+        index += 1
+    if code.co_flags & 0x08:  # CO_VARKEYWORDS
+        starstar = code.co_varnames[index]
+    positional_types = []
+    for arg_type in _split_types(arg_types):
+        if arg_type.startswith('**') and starstar is not None:
+            comments[starstar] = arg_type[2:].strip()
+        elif arg_type.startswith('*') and star is not None:
+            comments[star] = arg_type[1:].strip()
+        else:
+            positional_types.append(arg_type)
+    if (len(positional_types) == len(positional) - 1 and
+            positional[0] in ('self', 'cls')):
+        positional = positional[1:]  # Unannotated self or cls.
+    if len(positional_types) != len(positional):
+        raise TypeError('Type comment for %s has %d argument types, '
+                        'expected %d' % (name, len(positional_types),
+                                         len(positional)))
+    comments.update(zip(positional, positional_types))
+    return comments
+
+
+# Evaluated type comments, keyed on (module name, source); modules
+# cannot be weakly referenced here.  Each entry is (dependencies,
+# value), where dependencies pairs the global names used by the
+# expression with the objects they were bound to, or _unbound.
+_forward_cache = _TypeCache()
+_unbound = object()
+
+
+def _eval_forward(source, globalns):
+    """Evaluate a type comment in a module namespace, with caching.
+
+    Entries are only used while the names the expression refers to are
+    still bound to the same objects in globalns.  Attributes of those
+    objects, e.g. List in 'typing.List', are not checked.  Namespaces
+    that are not the dict of a module in sys.modules are not cached.
+    """
+    module_name = globalns.get('__name__')
+    module = sys.modules.get(module_name)
+    if module is None or getattr(module, '__dict__', None) is not globalns:
+        return _eval_type(_ForwardRef(source), globalns, globalns)
+    key = (module_name, source)
+    entry = _forward_cache.get(key, valid=lambda entry: all(
+        globalns.get(name, _unbound) is obj for name, obj in entry[0]))
+    if entry is not None:
+        return entry[1]
+    ref = _ForwardRef(source)
+    value = _eval_type(ref, globalns, globalns)
+    dependencies = tuple((name, globalns.get(name, _unbound))
+                         for name in ref.__forward_code__.co_names)
+    _forward_cache[key] = (dependencies, value)
+    return value
+
+
+def get_module_type_hints(module):
+    """Return type hints for the functions and methods in a module.
+
+    The result maps qualified names, such as 'func' or 'Class.method',
+    to the result of get_type_hints() for each function defined in the
+    module or in one of its classes (see get_class_type_hints()) that
+    has type comments.  Names imported from other modules are skipped.
+
+    This is faster than calling get_type_hints() on each function,
+    since every type comment is only evaluated once per namespace.
+    """
+    result = {}
+    evaluated = {}
+    for name, value in list(vars(module).items()):
+        if getattr(value, '__module__', None) != module.__name__:
+            continue
+        if isinstance(value, (type, types.ClassType)):
+            _collect_class_hints(value, name + '.', result, evaluated, set())
+        else:
+            _collect_function_hints(value, name, result, evaluated)
+    return result
+
+
+def get_class_type_hints(cls):
+    """Return type hints for the methods of a class.
+
+    The result maps method names to the result of get_type_hints() for
+    each function, static method or class method with type comments
+    defined in the class body.  Nested classes are included, with names
+    such as 'Nested.method'.  Like get_module_type_hints(), this
+    evaluates each type comment only once per namespace.
+    """
+    result = {}
+    _collect_class_hints(cls, '', result, {}, set())
+    return result
+
+
+def _collect_class_hints(cls, prefix, result, evaluated, seen):
+    if cls in seen or getattr(cls, '__no_type_check__', None):
+        return
+    seen.add(cls)
+    for name, value in list(cls.__dict__.items()):
+        if isinstance(value, (type, types.ClassType)):
+            if value.__module__ == cls.__module__:
+                _collect_class_hints(value, prefix + name + '.',
+                                     result, evaluated, seen)
+        else:
+            _collect_function_hints(value, prefix + name, result, evaluated)
+
+
+def _collect_function_hints(func, name, result, evaluated):
+    if isinstance(func, (staticmethod, classmethod)):
+        func = func.__func__
+    if (not isinstance(func, types.FunctionType) or
+            getattr(func, '__no_type_check__', None) or
+            not _type_comments(func)):
+        return
+    globalns = func.__globals__
+    # The namespaces are kept alive by the functions, so ids are safe.
+    shared = evaluated.setdefault(id(globalns), {})
+    result[name] = dict(_cached_type_hints(func, globalns, shared))
 
 
 def no_type_check(arg):
@@ -1231,10 +2113,204 @@ def overload(func):
       def utf8(value: str) -> bytes: ...
       def utf8(value):
           # implementation goes here
+
+    The variants are also recorded for dispatch_overloads().
     """
+    try:
+        name = func.__name__
+        line = func.__code__.co_firstlineno
+    except AttributeError:
+        pass  # Not a plain function.
+    else:
+        namespace = sys._getframe(1).f_locals
+        key = (id(namespace), name)
+        _prune_overloads()
+        entry = _overload_registry.get(key)
+        if entry is None or entry[0] is not namespace:
+            entry = _overload_registry[key] = (namespace, name, {})
+        entry[2][line] = func
     return _overload_dummy
 
 
+# The @overload variants of each function not yet passed to
+# dispatch_overloads(), keyed on (id(namespace), name), where namespace
+# holds the locals of the scope defining the function.  Each entry is
+# (namespace, name, variants), with the variants by line; redefining a
+# variant replaces it.
+_overload_registry = {}
+
+
+def _prune_overloads():
+    """Forget the variants of functions given a plain implementation.
+
+    Those are the entries whose name is no longer bound to the dummy
+    returned by @overload.  This runs whenever @overload or
+    dispatch_overloads() is used, so stubs never followed by
+    dispatch_overloads() are not kept for long.
+    """
+    for key, (namespace, name, variants) in list(_overload_registry.items()):
+        if namespace.get(name) is not _overload_dummy:
+            _overload_registry.pop(key, None)
+
+
+def dispatch_overloads(func):
+    """Decorator dispatching calls to the preceding @overload variants.
+
+    Use it instead of a plain implementation, with the variants
+    carrying the bodies.  For example:
+
+      @overload
+      def utf8(value):
+          # type: (None) -> None
+          return None
+      @overload
+      def utf8(value):
+          # type: (bytes) -> bytes
+          return value
+      @overload
+      def utf8(value):
+          # type: (unicode) -> bytes
+          return value.encode('utf-8')
+      @dispatch_overloads
+      def utf8(value):
+          raise TypeError('Cannot encode %r' % (value,))
+
+    A call runs the first variant whose type hints accept the classes of
+    the arguments, or the decorated function if none does.  Parameters
+    without hints accept anything.  The classes are checked with
+    issubclass(), so only the origin of a parameterized type counts:
+    List[int] accepts any list.
+
+    The choice is cached per tuple of argument classes, and the cache is
+    cleared whenever an ABC gets a new virtual subclass.  The hints are
+    resolved on the first call, so they may refer to names defined
+    later.  The returned function has an overloads attribute holding the
+    variants, and a dispatch(*classes, **keyword_classes) method
+    returning the function that would be called.
+    """
+    key = (id(sys._getframe(1).f_locals), func.__name__)
+    entry = _overload_registry.pop(key, None)
+    _prune_overloads()
+    if entry is None:
+        raise TypeError("No @overload variants of %s to dispatch to."
+                        % _qualname(func))
+    variants = entry[2]
+    variants = tuple(variants[line] for line in sorted(variants))
+    signatures = []  # Resolved on first use.
+    table = {}
+    token = [None]
+
+    def lookup(classes, keyword_classes):
+        current = _abc_cache_token()
+        if token[0] != current:
+            table.clear()
+            token[0] = current
+        key = classes + keyword_classes
+        try:
+            return table[key]
+        except KeyError:
+            pass
+        if not signatures:
+            signatures.append([(variant, _overload_signature(variant))
+                               for variant in variants])
+        for variant, signature in signatures[0]:
+            if _overload_accepts(signature, classes, keyword_classes):
+                break
+        else:
+            variant = func
+        if len(table) >= _CACHE_SIZE:
+            table.clear()
+        table[key] = variant
+        return variant
+
+    @functools.wraps(func)
+    def dispatcher(*args, **kwds):
+        classes = tuple(arg.__class__ for arg in args)
+        keyword_classes = ()
+        if kwds:
+            keyword_classes = tuple(sorted(
+                (name, value.__class__) for name, value in kwds.items()))
+        return lookup(classes, keyword_classes)(*args, **kwds)
+
+    def dispatch(*classes, **keyword_classes):
+        return lookup(classes, tuple(sorted(keyword_classes.items())))
+
+    dispatcher.overloads = variants
+    dispatcher.dispatch = dispatch
+    return dispatcher
+
+
+def _overload_signature(func):
+    """Return what _overload_accepts() needs to know about a variant.
+
+    That is (positional, varargs, varkw, keywords, required, hints):
+    the names of positional parameters, of the * and ** parameters or
+    None, of all parameters that can be passed by keyword, and of those
+    without defaults, and the hints to check arguments against.
+    """
+    code = func.__code__
+    count = code.co_argcount
+    names = code.co_varnames
+    positional = keywords = names[:count]
+    required = set(positional[:count - len(func.__defaults__ or ())])
+    index = count
+    varargs = varkw = None
+    if code.co_flags & 0x04:  # CO_VARARGS
+        varargs = names[index]
+        index += 1
+    if code.co_flags & 0x08:  # CO_VARKEYWORDS
+        varkw = names[index]
+    hints = dict((name, _dispatch_hint(hint))
+                 for name, hint in get_type_hints(func).items()
+                 if name != 'return')
+    return positional, varargs, varkw, frozenset(keywords), required, hints
+
+
+def _dispatch_hint(hint):
+    """Adapt a hint for issubclass() with the class of an argument.
+
+    None becomes type(None), and Callable[...] the plain Callable ABC:
+    issubclass() against Callable[...] compares signatures, which the
+    class of an argument does not have.
+    """
+    if hint is None:
+        return type(None)
+    if isinstance(hint, CallableMeta):
+        return collections_abc.Callable
+    if isinstance(hint, UnionMeta) and hint.__union_params__:
+        return Union[tuple(_dispatch_hint(t)
+                           for t in hint.__union_params__)]
+    return hint
+
+
+def _overload_accepts(signature, classes, keyword_classes):
+    """Return whether a variant accepts arguments of the given classes.
+
+    keyword_classes is a sequence of (name, class) pairs.
+    """
+    positional, varargs, varkw, keywords, required, hints = signature
+    if len(classes) > len(positional) and varargs is None:
+        return False
+    bound = list(zip(positional, classes))
+    bound.extend((varargs, cls) for cls in classes[len(positional):])
+    names = set(positional[:len(classes)])
+    for name, cls in keyword_classes:
+        if name in names:
+            return False
+        if name in keywords:
+            bound.append((name, cls))
+            names.add(name)
+        elif varkw is not None:
+            bound.append((varkw, cls))
+        else:
+            return False
+    if not required <= names:
+        return False
+    return all(name not in hints or issubclass(cls, hints[name])
+               for name, cls in bound)
+
+
+@_profiled
 class _ProtocolMeta(GenericMeta):
     """Internal metaclass for _Protocol.
 
@@ -1242,6 +2318,16 @@ class _ProtocolMeta(GenericMeta):
     from Generic.
     """
 
+    def __new__(cls, *args, **kwds):
+        self = super(_ProtocolMeta, cls).__new__(cls, *args, **kwds)
+        # Find all attributes defined in the protocol, once.
+        if self._is_protocol:
+            self._protocol_attrs = frozenset(self._get_protocol_attrs())
+        # Like ABCMeta's _abc_cache.  There is no negative cache, since
+        # a class can get the missing attributes later by assignment.
+        self._protocol_cache = weakref.WeakSet()
+        return self
+
     def __instancecheck__(self, obj):
         raise TypeError("Protocols cannot be used with isinstance().")
 
@@ -1254,12 +2340,14 @@ class _ProtocolMeta(GenericMeta):
             # Every class is a subclass of the empty protocol.
             return True
 
-        # Find all attributes defined in the protocol.
-        attrs = self._get_protocol_attrs()
+        if cls in self._protocol_cache:
+            return True
 
-        for attr in attrs:
-            if not any(attr in d.__dict__ for d in cls.__mro__):
+        mro = cls.__mro__
+        for attr in self._protocol_attrs:
+            if not any(attr in d.__dict__ for d in mro):
                 return False
+        self._protocol_cache.add(cls)
         return True
 
     def _get_protocol_attrs(self):
@@ -1287,6 +2375,10 @@ class _ProtocolMeta(GenericMeta):
                             attr != '__slots__' and
                             attr != '_get_protocol_attrs' and
                             attr != '__next_in_mro__' and
+                            attr != '__tree_hash__' and
+                            attr != '__origin_root__' and
+                            attr != '_protocol_attrs' and
+                            attr != '_protocol_cache' and
                             attr != '__parameters__' and
                             attr != '__origin__' and
                             attr != '__module__'):
@@ -1309,100 +2401,282 @@ class _Protocol(object):
     _is_protocol = True
 
 
-# Various ABCs mimicking those in collections.abc.
-# A few are simply re-exported for completeness.
+# Pickle subscripted types compactly; see TypingMeta.__reduce__().
+for _meta in (UnionMeta, TupleMeta, CallableMeta, GenericMeta,
+              _ProtocolMeta):
+    copy_reg.pickle(_meta, _meta.__reduce__)
+del _meta
 
-Hashable = collections_abc.Hashable  # Not generic.
 
+def fingerprint(tp):
+    """Return a digest of a type expression that is stable across processes.
 
-class Iterable(Generic[T_co]):
-    __slots__ = ()
-    __extra__ = collections_abc.Iterable
+    Usage::
 
+        key = fingerprint(Dict[str, List[int]])  # A hex string.
+
+    Unlike hash(), the digest doesn't change between processes or
+    interpreter runs, so it can key persistent or shared caches.  It
+    is a SHA-256 digest of the structure of the type: classes and type
+    variables are identified by the module defining them and their
+    name, subscripted types by their origin and parameters, and unions
+    don't depend on the order of their members.  Classes with the same
+    name in the same module, such as classes defined in a function, get
+    the same digest, and forward references are identified by their
+    source.
+
+    The digest is computed once and then cached for as long as the
+    type object lives.  Use fingerprint.cache_info() and
+    fingerprint.cache_clear() to inspect or reset the cache.
+    """
+    if tp is None:
+        tp = type(None)
+    digest = _fingerprint_cache.get(tp)
+    if digest is None:
+        digest = _fingerprint(tp)
+        _fingerprint_cache[tp] = digest
+    return digest
+
+
+_fingerprint_cache = _WeakKeyCache()
+fingerprint.cache_info = _fingerprint_cache.cache_info
+fingerprint.cache_clear = _fingerprint_cache.cache_clear
+
+
+def _fingerprint(tp):
+    """Uncached implementation of fingerprint()."""
+    import hashlib
+    if isinstance(tp, GenericMeta) and tp.__origin__ is not None:
+        args = tp.__args__
+        if args is None:
+            args = tp.__parameters__  # Generic[T, ...].
+        parts = ['generic', fingerprint(tp.__origin__)]
+        parts.extend(fingerprint(t) for t in args)
+    elif isinstance(tp, UnionMeta) and tp.__union_params__ is not None:
+        parts = ['union']
+        parts.extend(sorted(fingerprint(t) for t in tp.__union_params__))
+    elif isinstance(tp, TupleMeta) and tp.__tuple_params__ is not None:
+        parts = ['tuple...' if tp.__tuple_use_ellipsis__ else 'tuple']
+        parts.extend(fingerprint(t) for t in tp.__tuple_params__)
+    elif isinstance(tp, CallableMeta) and (tp.__args__ is not None or
+                                           tp.__result__ is not None):
+        if tp.__args__ is Ellipsis:
+            parts = ['callable...', fingerprint(tp.__result__)]
+        else:
+            parts = ['callable', fingerprint(tp.__result__)]
+            parts.extend(fingerprint(t) for t in tp.__args__)
+    elif isinstance(tp, TypeVar):
+        parts = ['typevar', tp.__defining_module__, repr(tp)]
+        if tp.__bound__ is not None:
+            parts.append(fingerprint(tp.__bound__))
+        parts.extend(fingerprint(t) for t in tp.__constraints__)
+    elif isinstance(tp, _ForwardRef):
+        parts = ['forward', tp.__forward_arg__]
+    elif isinstance(tp, _TypeAlias):
+        parts = ['alias', tp.name, fingerprint(tp.type_var)]
+    elif isinstance(tp, (type, types.ClassType)):
+        parts = ['class', tp.__module__, _qualname(tp)]
+    else:
+        raise TypeError("fingerprint(t): t must be a type, got %r" % (tp,))
+    return hashlib.sha256('\0'.join(parts).encode('utf-8')).hexdigest()
 
-class Iterator(Iterable[T_co]):
-    __slots__ = ()
-    __extra__ = collections_abc.Iterator
 
+def _pickle_params(params):
+    """Replace NoneType, which Python 2 can't pickle, with None."""
+    return tuple(None if p is type(None) else p for p in params)
 
-class SupportsInt(_Protocol):
-    __slots__ = ()
 
-    @abstractmethod
-    def __int__(self):
-        pass
+def _getitem_ellipsis(origin, param):
+    """Return Tuple[param, ...] or Callable[..., param] when unpickling.
 
+    Python 2 can't pickle Ellipsis itself.
+    """
+    if isinstance(origin, TupleMeta):
+        return origin[param, ...]
+    return origin[..., param]
 
-class SupportsFloat(_Protocol):
-    __slots__ = ()
 
-    @abstractmethod
-    def __float__(self):
-        pass
+# Lazily built classes.
+#
+# Each group of rarely used classes below is built by a factory
+# registered with @_lazy().  Normally the factory is called right away.
+# If the environment variable PYTHONTYPINGLAZY is set to a non-empty
+# string, it is only called when one of its names is first looked up
+# on the module, which makes importing typing cheaper.  Code in this
+# module must therefore not refer to those names directly.  Factories
+# declare their names global, so that they are visible to linters and
+# get plain qualified names.
 
+_lazy_mode = bool(os.environ.get('PYTHONTYPINGLAZY'))
+_lazy_factories = {}  # Name -> (factory, names).
+_lazy_lock = thread.allocate_lock()
 
-class SupportsComplex(_Protocol):
-    __slots__ = ()
 
-    @abstractmethod
-    def __complex__(self):
-        pass
+def _lazy(*names):
+    """Decorator registering a factory for the given module globals.
 
+    The factory must return their values as a tuple, in the same order.
+    """
 
-class SupportsAbs(_Protocol[T_co]):
-    __slots__ = ()
+    def decorator(factory):
+        if _lazy_mode:
+            for name in names:
+                _lazy_factories[name] = (factory, names)
+        else:
+            _lazy_build(factory, names)
+        return factory
 
-    @abstractmethod
-    def __abs__(self):
-        pass
+    return decorator
 
 
-if hasattr(collections_abc, 'Reversible'):
-    class Reversible(Iterable[T_co]):
-        __slots__ = ()
-        __extra__ = collections_abc.Reversible
-else:
-    class Reversible(_Protocol[T_co]):
-        __slots__ = ()
+def _lazy_build(factory, names):
+    module = sys.modules.get(__name__)
+    for name, value in zip(names, factory()):
+        globals()[name] = value
+        if module is not None and module.__dict__ is not globals():
+            # See _LazyModule.
+            setattr(module, name, value)
 
-        @abstractmethod
-        def __reversed__(self):
-            pass
 
+def _lazy_get(name):
+    """Return a module global, building it first if necessary.
 
-Sized = collections_abc.Sized  # Not generic.
+    Raise KeyError if there is no such global.
+    """
+    try:
+        return globals()[name]
+    except KeyError:
+        pass
+    with _lazy_lock:
+        if name not in globals():
+            factory, names = _lazy_factories[name]
+            _lazy_build(factory, names)
+            for n in names:
+                del _lazy_factories[n]
+    return globals()[name]
 
 
-class Container(Generic[T_co]):
-    __slots__ = ()
-    __extra__ = collections_abc.Container
+class _LazyModule(types.ModuleType):
+    """Type of the typing module in lazy mode, see _lazy()."""
 
+    def __getattr__(self, name):
+        try:
+            return _lazy_get(name)
+        except KeyError:
+            raise AttributeError("module %r has no attribute %r" %
+                                 (__name__, name))
 
-# Callable was defined earlier.
+    def __dir__(self):
+        return sorted(set(self.__dict__) | set(_lazy_factories))
 
 
-class AbstractSet(Sized, Iterable[T_co], Container[T_co]):
-    __extra__ = collections_abc.Set
+class _LazyAttribute(object):
+    """Descriptor for a namespace attribute naming a lazy module global."""
 
+    def __init__(self, name):
+        self.name = name
 
-class MutableSet(AbstractSet[T]):
-    __extra__ = collections_abc.MutableSet
+    def __get__(self, obj, cls):
+        return _lazy_get(self.name)
 
 
-# NOTE: Only the value type is covariant.
-class Mapping(Sized, Iterable[KT], Container[KT], Generic[KT, VT_co]):
-    __extra__ = collections_abc.Mapping
+# Various ABCs mimicking those in collections.abc.
+# A few are simply re-exported for completeness.
 
+Hashable = collections_abc.Hashable  # Not generic.
 
-class MutableMapping(Mapping[KT, VT]):
-    __extra__ = collections_abc.MutableMapping
 
+class Iterable(Generic[T_co]):
+    __slots__ = ()
+    __extra__ = collections_abc.Iterable
 
-if hasattr(collections_abc, 'Reversible'):
-    class Sequence(Sized, Reversible[T_co], Container[T_co]):
-        __extra__ = collections_abc.Sequence
-else:
-    class Sequence(Sized, Iterable[T_co], Container[T_co]):
+
+class Iterator(Iterable[T_co]):
+    __slots__ = ()
+    __extra__ = collections_abc.Iterator
+
+
+@_lazy('SupportsInt', 'SupportsFloat', 'SupportsComplex', 'SupportsAbs')
+def _make_protocols():
+    global SupportsInt, SupportsFloat, SupportsComplex, SupportsAbs
+
+    class SupportsInt(_Protocol):
+        __slots__ = ()
+
+        @abstractmethod
+        def __int__(self):
+            pass
+
+    class SupportsFloat(_Protocol):
+        __slots__ = ()
+
+        @abstractmethod
+        def __float__(self):
+            pass
+
+    class SupportsComplex(_Protocol):
+        __slots__ = ()
+
+        @abstractmethod
+        def __complex__(self):
+            pass
+
+    class SupportsAbs(_Protocol[T_co]):
+        __slots__ = ()
+
+        @abstractmethod
+        def __abs__(self):
+            pass
+
+    return (SupportsInt, SupportsFloat, SupportsComplex, SupportsAbs)
+
+
+if hasattr(collections_abc, 'Reversible'):
+    class Reversible(Iterable[T_co]):
+        __slots__ = ()
+        __extra__ = collections_abc.Reversible
+else:
+    class Reversible(_Protocol[T_co]):
+        __slots__ = ()
+
+        @abstractmethod
+        def __reversed__(self):
+            pass
+
+
+Sized = collections_abc.Sized  # Not generic.
+
+
+class Container(Generic[T_co]):
+    __slots__ = ()
+    __extra__ = collections_abc.Container
+
+
+# Callable was defined earlier.
+
+
+class AbstractSet(Sized, Iterable[T_co], Container[T_co]):
+    __extra__ = collections_abc.Set
+
+
+class MutableSet(AbstractSet[T]):
+    __extra__ = collections_abc.MutableSet
+
+
+# NOTE: Only the value type is covariant.
+class Mapping(Sized, Iterable[KT], Container[KT], Generic[KT, VT_co]):
+    __extra__ = collections_abc.Mapping
+
+
+class MutableMapping(Mapping[KT, VT]):
+    __extra__ = collections_abc.MutableMapping
+
+
+if hasattr(collections_abc, 'Reversible'):
+    class Sequence(Sized, Reversible[T_co], Container[T_co]):
+        __extra__ = collections_abc.Sequence
+else:
+    class Sequence(Sized, Iterable[T_co], Container[T_co]):
         __extra__ = collections_abc.Sequence
 
 
@@ -1460,22 +2734,25 @@ class FrozenSet(frozenset, AbstractSet[T_co]):
         return frozenset.__new__(cls, *args, **kwds)
 
 
-class MappingView(Sized, Iterable[T_co]):
-    __extra__ = collections_abc.MappingView
+@_lazy('MappingView', 'KeysView', 'ItemsView', 'ValuesView')
+def _make_views():
+    global MappingView, KeysView, ItemsView, ValuesView
 
+    class MappingView(Sized, Iterable[T_co]):
+        __extra__ = collections_abc.MappingView
 
-class KeysView(MappingView[KT], AbstractSet[KT]):
-    __extra__ = collections_abc.KeysView
+    class KeysView(MappingView[KT], AbstractSet[KT]):
+        __extra__ = collections_abc.KeysView
 
+    class ItemsView(MappingView[Tuple[KT, VT_co]],
+                    AbstractSet[Tuple[KT, VT_co]],
+                    Generic[KT, VT_co]):
+        __extra__ = collections_abc.ItemsView
 
-class ItemsView(MappingView[Tuple[KT, VT_co]],
-                AbstractSet[Tuple[KT, VT_co]],
-                Generic[KT, VT_co]):
-    __extra__ = collections_abc.ItemsView
+    class ValuesView(MappingView[VT_co]):
+        __extra__ = collections_abc.ValuesView
 
-
-class ValuesView(MappingView[VT_co]):
-    __extra__ = collections_abc.ValuesView
+    return (MappingView, KeysView, ItemsView, ValuesView)
 
 
 class Dict(dict, MutableMapping[KT, VT]):
@@ -1505,15 +2782,21 @@ else:
     _G_base = types.GeneratorType
 
 
-class Generator(Iterator[T_co], Generic[T_co, T_contra, V_co]):
-    __slots__ = ()
-    __extra__ = _G_base
+@_lazy('Generator')
+def _make_generator():
+    global Generator
 
-    def __new__(cls, *args, **kwds):
-        if _geqv(cls, Generator):
-            raise TypeError("Type Generator cannot be instantiated; "
-                            "create a subclass instead")
-        return super(Generator, cls).__new__(cls, *args, **kwds)
+    class Generator(Iterator[T_co], Generic[T_co, T_contra, V_co]):
+        __slots__ = ()
+        __extra__ = _G_base
+
+        def __new__(cls, *args, **kwds):
+            if _geqv(cls, Generator):
+                raise TypeError("Type Generator cannot be instantiated; "
+                                "create a subclass instead")
+            return super(Generator, cls).__new__(cls, *args, **kwds)
+
+    return (Generator,)
 
 
 def NamedTuple(typename, fields):
@@ -1527,173 +2810,644 @@ def NamedTuple(typename, fields):
 
         Employee = collections.namedtuple('Employee', ['name', 'id'])
 
-    The resulting class has one extra attribute: _field_types,
-    giving a dict mapping field names to types.  (The field names
-    are in the _fields attribute, which is part of the namedtuple
-    API.)
+    The resulting class has two extra attributes: _field_types, giving a
+    dict mapping field names to types, and _field_checkers, a tuple of
+    compile_checker() functions for the fields in order.  (The field
+    names are in the _fields attribute, which is part of the namedtuple
+    API.)  Instances also have a _validate() method, which raises
+    TypeError unless each field matches its type.
+
+    Unlike collections.namedtuple(), the class is built without
+    generating and executing source code, so there is no _source
+    attribute.
     """
-    fields = [(n, t) for n, t in fields]
-    cls = collections.namedtuple(typename, [n for n, t in fields])
-    cls._field_types = dict(fields)
+    fields = [(str(n), t) for n, t in fields]
+    names = tuple(n for n, t in fields)
+    typename = str(typename)
+    _check_field_names(typename, names)
+    namespace = dict(_namedtuple_namespace)
+    namespace['__doc__'] = '%s(%s)' % (typename, ', '.join(names))
+    namespace['__new__'] = _namedtuple_new(len(names))
+    namespace['_fields'] = names
+    namespace['_field_types'] = dict(fields)
+    # Strings are evaluated where the class is defined.
+    namespace['__field_types__'] = field_types = tuple(
+        _ForwardRef(t) if isinstance(t, basestring) else t for n, t in fields)
+    namespace['_field_checkers'] = tuple(_field_checker(t)
+                                         for t in field_types)
+    for index, name in enumerate(names):
+        namespace[name] = _field_property(index)
     # Set the module to the caller's module (otherwise it'd be 'typing').
     try:
-        cls.__module__ = sys._getframe(1).f_globals.get('__name__', '__main__')
+        namespace['__module__'] = sys._getframe(1).f_globals.get(
+            '__name__', '__main__')
     except (AttributeError, ValueError):
         pass
-    return cls
+    return type(typename, (tuple,), namespace)
+
+
+def _check_field_names(typename, names):
+    """Validate names like collections.namedtuple() does."""
+    import keyword
+    seen = set()
+    for name in (typename,) + names:
+        if not _is_identifier(name):
+            raise ValueError('Type names and field names must be valid '
+                             'identifiers: %r' % name)
+        if keyword.iskeyword(name):
+            raise ValueError('Type names and field names cannot be a '
+                             'keyword: %r' % name)
+    for name in names:
+        if name.startswith('_'):
+            raise ValueError('Field names cannot start with an underscore: '
+                             '%r' % name)
+        if name in seen:
+            raise ValueError('Encountered duplicate field name: %r' % name)
+        seen.add(name)
+
+
+def _is_identifier(name):
+    return (bool(name) and not name[0].isdigit() and
+            all(c.isalnum() or c == '_' for c in name))
+
+
+def _field_checker(tp):
+    """Return compile_checker(tp), or a function raising its error."""
+    try:
+        return compile_checker(tp)
+    except TypeError as exc:
+        message = str(exc)
+
+        def check(value):
+            raise TypeError(message)
+
+        return check
+
+
+def _namedtuple_field_types(cls):
+    """Return the types of the fields of a named tuple class, in order.
+
+    String types are forward references to be evaluated where the class
+    was defined, rather than in the caller's namespace.
+    """
+    field_types = getattr(cls, '__field_types__', None)
+    if field_types is not None:
+        return field_types
+    # Not made by NamedTuple(), so fall back to the globals of its module.
+    globalns = getattr(sys.modules.get(cls.__module__), '__dict__', {})
+    field_types = []
+    for name in cls._fields:
+        tp = cls._field_types[name]
+        if isinstance(tp, basestring):
+            tp = _ForwardRef(tp)
+            tp.__forward_frame__ = None
+            tp._capture_namespaces(globalns, globalns)
+        field_types.append(tp)
+    return tuple(field_types)
+
+
+# Field properties, by index.  They don't depend on the class, so all
+# named tuples share them.
+_field_properties = []
+
+
+def _field_property(index):
+    while len(_field_properties) <= index:
+        i = len(_field_properties)
+        _field_properties.append(
+            property(operator.itemgetter(i),
+                     doc='Alias for field number %d' % i))
+    return _field_properties[index]
+
+
+# __new__ methods, by field count.
+_namedtuple_news = {}
+
+
+def _namedtuple_new(count):
+    try:
+        return _namedtuple_news[count]
+    except KeyError:
+        pass
+    tuple_new = tuple.__new__
+
+    def __new__(cls, *args, **kwds):
+        """Create new instance of the named tuple."""
+        if kwds or len(args) != count:
+            args = _bind_fields(cls, args, kwds)
+        return tuple_new(cls, args)
+
+    return _namedtuple_news.setdefault(count, __new__)
+
+
+def _bind_fields(cls, args, kwds):
+    """Return the values for _namedtuple_new() in field order."""
+    fields = cls._fields
+    if len(args) > len(fields):
+        raise TypeError('__new__() takes %d positional arguments but %d '
+                        'were given' % (len(fields) + 1, len(args) + 1))
+    values = list(args)
+    for name in fields[len(args):]:
+        try:
+            values.append(kwds.pop(name))
+        except KeyError:
+            raise TypeError('__new__() missing required argument: %r'
+                            % name)
+    for name in kwds:
+        if name in fields:
+            raise TypeError('__new__() got multiple values for argument '
+                            '%r' % name)
+        raise TypeError('__new__() got an unexpected keyword argument %r'
+                        % name)
+    return values
+
+
+def _namedtuple_make(cls, iterable, new=tuple.__new__, len=len):
+    """Make a new named tuple object from a sequence or iterable."""
+    result = new(cls, iterable)
+    if len(result) != len(cls._fields):
+        raise TypeError('Expected %d arguments, got %d'
+                        % (len(cls._fields), len(result)))
+    return result
+
+
+def _namedtuple_replace(self, **kwds):
+    """Return a new named tuple object replacing specified fields with
+    new values.
+    """
+    result = self._make(map(kwds.pop, self._fields, self))
+    if kwds:
+        raise ValueError('Got unexpected field names: %r' % list(kwds))
+    return result
+
+
+def _namedtuple_repr(self):
+    """Return a nicely formatted representation string."""
+    return '%s(%s)' % (self.__class__.__name__, ', '.join(
+        '%s=%r' % item for item in zip(self._fields, self)))
+
+
+def _namedtuple_asdict(self):
+    """Return a new OrderedDict which maps field names to their values."""
+    return collections.OrderedDict(zip(self._fields, self))
+
+
+def _namedtuple_getnewargs(self):
+    """Return self as a plain tuple.  Used by copy and pickle."""
+    return tuple(self)
+
+
+def _namedtuple_getstate(self):
+    """Exclude the OrderedDict from pickling."""
+    pass
+
+
+def _namedtuple_validate(self):
+    """Raise TypeError unless each field matches its type."""
+    for name, check, value in zip(self._fields, self._field_checkers, self):
+        if not check(value):
+            raise TypeError('%s.%s must be %s, got %r' % (
+                self.__class__.__name__, name,
+                _type_repr(self._field_types[name]), value))
+
+
+# The class-independent part of every named tuple's namespace.
+_namedtuple_namespace = {
+    '__slots__': (),
+    '_make': classmethod(_namedtuple_make),
+    '_replace': _namedtuple_replace,
+    '__repr__': _namedtuple_repr,
+    '_asdict': _namedtuple_asdict,
+    '__dict__': property(_namedtuple_asdict),
+    '__getnewargs__': _namedtuple_getnewargs,
+    '__getstate__': _namedtuple_getstate,
+    '_validate': _namedtuple_validate,
+}
 
 
 # Python-version-specific alias (Python 2: unicode; Python 3: str)
 Text = unicode
 
 
-class IO(Generic[AnyStr]):
-    """Generic base class for TextIO and BinaryIO.
+class RecordBatch(object):
+    """Column storage for records of a NamedTuple class.
 
-    This is an abstract, generic version of the return of open().
+    Usage::
 
-    NOTE: This does not distinguish between the different possible
-    classes (text vs. binary, read vs. write vs. read/write,
-    append-only, unbuffered).  The TextIO and BinaryIO subclasses
-    below capture the distinctions between text vs. binary, which is
-    pervasive in the interface; however we currently do not offer a
-    way to track the other distinctions in the type system.
+        Point = NamedTuple('Point', [('x', int), ('y', Optional[float])])
+        batch = RecordBatch(Point, rows)
+        batch[0]  # Point(x=..., y=...), built on access
+        batch.to_records()  # [Point(...), ...]
+
+    Rows are stored column by column rather than as one tuple each.
+    Fields of type int, float, bool, bytes and Text, or Optional of
+    one of these, are stored unboxed: in a NumPy structured array if
+    NumPy is installed, else in one array.array per numeric column,
+    with bytes and Text columns kept as lists.  Optional fields get an
+    additional column marking the None values.  Fields of other types
+    are stored as objects.  Pass use_numpy=False to use the array
+    module even if NumPy is available.
+
+    Indexing and iteration build records on access.  A slice is a new
+    batch, which shares the storage with NumPy and copies it otherwise.
+    Integers must fit in 64 bits.  With NumPy, trailing NUL bytes of
+    bytes values are lost.
     """
 
-    __slots__ = ()
+    def __init__(self, record_type, rows=(), use_numpy=None):
+        numpy = _import_numpy() if use_numpy is not False else None
+        if use_numpy and numpy is None:
+            raise ImportError("RecordBatch(use_numpy=True) requires NumPy.")
+        self.record_type = record_type
+        self.use_numpy = numpy is not None
+        self._kinds = tuple(_column_kind(record_type._field_types[name])
+                            for name in record_type._fields)
+        columns = list(zip(*rows))
+        if not columns:
+            columns = [()] * len(self._kinds)
+        if len(columns) != len(self._kinds):
+            raise TypeError('Expected rows of %d fields, got %d'
+                            % (len(self._kinds), len(columns)))
+        columns, masks = _split_none(columns, self._kinds)
+        if numpy is not None:
+            self._data = _numpy_columns(numpy, record_type._fields,
+                                        columns, masks, self._kinds)
+        else:
+            self._data = _array_columns(columns, masks, self._kinds)
 
-    @abstractproperty
-    def mode(self):
-        pass
+    @classmethod
+    def _from_data(cls, record_type, kinds, data, use_numpy):
+        self = cls.__new__(cls)
+        self.record_type = record_type
+        self.use_numpy = use_numpy
+        self._kinds = kinds
+        self._data = data
+        return self
 
-    @abstractproperty
-    def name(self):
-        pass
+    def __len__(self):
+        if self.use_numpy:
+            return len(self._data)
+        return len(self._data[0][0]) if self._data else 0
 
-    @abstractmethod
-    def close(self):
-        pass
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            if self.use_numpy:
+                data = self._data[index]
+            else:
+                data = [(column[index], None if mask is None else mask[index])
+                        for column, mask in self._data]
+            return self._from_data(self.record_type, self._kinds, data,
+                                   self.use_numpy)
+        if self.use_numpy:
+            row = self._data[index].item()
+        else:
+            row = [values[index] for values in self._columns()]
+        return self._maker()(row)
 
-    @abstractmethod
-    def closed(self):
-        pass
+    def __iter__(self):
+        make = self._maker()
+        for row in self._rows():
+            yield make(row)
 
-    @abstractmethod
-    def fileno(self):
-        pass
+    def __repr__(self):
+        return '<%s of %d %s>' % (self.__class__.__name__, len(self),
+                                  _type_repr(self.record_type))
 
-    @abstractmethod
-    def flush(self):
-        pass
+    def to_records(self):
+        """Return a list of all the records."""
+        make = self._maker()
+        return [make(row) for row in self._rows()]
 
-    @abstractmethod
-    def isatty(self):
-        pass
+    def column(self, name):
+        """Return the stored values of a field.
 
-    @abstractmethod
-    def read(self, n = -1):
-        pass
+        This is a NumPy array or an array.array or list, without
+        copying.  For Optional fields, None values are stored as 0,
+        0.0, False or an empty string.
+        """
+        index = self.record_type._fields.index(name)
+        if self.use_numpy:
+            return self._data[name]
+        return self._data[index][0]
+
+    @property
+    def nbytes(self):
+        """The size of the storage, excluding objects in lists and in
+        object columns.
+        """
+        if self.use_numpy:
+            return self._data.nbytes
+        import array
+        size = 0
+        for column, mask in self._data:
+            for values in (column, mask):
+                if isinstance(values, array.array):
+                    size += len(values) * values.itemsize
+                elif values is not None:
+                    size += sys.getsizeof(values)
+        return size
+
+    def _rows(self):
+        """Iterate over the rows as tuples, masked values included."""
+        if self.use_numpy:
+            return iter(self._data.tolist())
+        return zip(*self._columns())
+
+    def _columns(self):
+        """Return the columns followed by the masks, like the fields of
+        the NumPy storage.
+        """
+        return ([column for column, mask in self._data] +
+                [mask for column, mask in self._data if mask is not None])
+
+    def _maker(self):
+        """Return a function building a record from a stored row."""
+        make = self.record_type._make
+        count = len(self._kinds)
+        optional = [i for i, (kind, opt) in enumerate(self._kinds) if opt]
+        # Pairs of field and mask indexes.
+        masked = [(i, count + j) for j, i in enumerate(optional)]
+        if self.use_numpy:
+            bools = []
+        else:
+            bools = [i for i, (kind, opt) in enumerate(self._kinds)
+                     if kind is bool]
+        if not masked and not bools:
+            return make
 
-    @abstractmethod
-    def readable(self):
-        pass
+        def make_record(row):
+            values = list(row[:count])
+            for i in bools:
+                values[i] = bool(values[i])
+            for i, mask in masked:
+                if row[mask]:
+                    values[i] = None
+            return make(values)
 
-    @abstractmethod
-    def readline(self, limit = -1):
-        pass
+        return make_record
 
-    @abstractmethod
-    def readlines(self, hint = -1):
-        pass
 
-    @abstractmethod
-    def seek(self, offset, whence = 0):
-        pass
+def _import_numpy():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
 
-    @abstractmethod
-    def seekable(self):
-        pass
 
-    @abstractmethod
-    def tell(self):
-        pass
+def _column_kind(tp):
+    """Return (kind, optional) for the type of a field.
 
-    @abstractmethod
-    def truncate(self, size = None):
-        pass
+    kind is the type of the stored values if they can be stored
+    unboxed, else None.  optional tells whether they may be None.
+    """
+    if isinstance(tp, UnionMeta) and tp.__union_params__:
+        params = tp.__union_params__
+        if len(params) == 2 and type(None) in params:
+            kind = params[0] if params[1] is type(None) else params[1]
+            if kind in (bool, int, long, float, bytes, Text):
+                return kind, True
+    if tp in (bool, int, long, float, bytes, Text):
+        return tp, False
+    return None, False
 
-    @abstractmethod
-    def writable(self):
-        pass
 
-    @abstractmethod
-    def write(self, s):
-        pass
+# Stored in place of None values.
+_column_defaults = {bool: False, int: 0, long: 0, float: 0.0, bytes: b'',
+                    Text: ''}
 
-    @abstractmethod
-    def writelines(self, lines):
-        pass
 
-    @abstractmethod
-    def __enter__(self):
-        pass
+def _split_none(columns, kinds):
+    """Return (columns, masks), replacing None values in Optional columns.
 
-    @abstractmethod
-    def __exit__(self, type, value, traceback):
-        pass
+    The mask of a column is None if the column is not Optional.
+    """
+    values = []
+    masks = []
+    for column, (kind, optional) in zip(columns, kinds):
+        if optional:
+            default = _column_defaults[kind]
+            masks.append([value is None for value in column])
+            column = [default if value is None else value
+                      for value in column]
+        else:
+            masks.append(None)
+        values.append(column)
+    return values, masks
 
 
-class BinaryIO(IO[bytes]):
-    """Typed version of the return of open() in binary mode."""
+# NumPy dtype codes by kind.  Strings get the width of the longest one.
+# NumPy wants native strings on Python 2.
+_numpy_codes = {bool: b'?', int: b'i8', long: b'i8', float: b'f8',
+                bytes: b'S', Text: b'U'}
 
-    __slots__ = ()
 
-    @abstractmethod
-    def write(self, s):
-        pass
+def _numpy_columns(numpy, names, columns, masks, kinds):
+    """Return a structured array holding the columns and masks."""
+    arrays = []
+    for name, column, (kind, optional) in zip(names, columns, kinds):
+        if kind is None:
+            # Don't let NumPy look into sequences.
+            values = numpy.empty(len(column), dtype=object)
+            values[:] = column
+        else:
+            values = numpy.array(column, dtype=_numpy_codes[kind])
+        arrays.append((name, values))
+    for name, mask in zip(names, masks):
+        if mask is not None:
+            # Field names can't start with an underscore.
+            arrays.append((b'_none_' + name, numpy.array(mask, dtype=b'?')))
+    length = len(columns[0]) if columns else 0
+    data = numpy.empty(length, dtype=[(name, values.dtype)
+                                      for name, values in arrays])
+    for name, values in arrays:
+        data[name] = values
+    return data
+
+
+def _array_columns(columns, masks, kinds):
+    """Return a list of (column, mask) pairs using the array module."""
+    import array
+    data = []
+    for column, mask, (kind, optional) in zip(columns, masks, kinds):
+        code = _array_code(kind)
+        if code is not None:
+            column = array.array(code, column)
+        else:
+            column = list(column)
+        if mask is not None:
+            mask = array.array('b', mask)
+        data.append((column, mask))
+    return data
+
+
+def _array_code(kind):
+    """Return the array module typecode for a kind, or None."""
+    import array
+    if kind is float:
+        return 'd'
+    if kind is bool:
+        return 'b'
+    if kind in (int, long):
+        try:
+            array.array('q')
+        except ValueError:
+            return 'l'  # No long long.
+        return 'q'
+    return None
 
-    @abstractmethod
-    def __enter__(self):
-        pass
 
+@_lazy('IO', 'BinaryIO', 'TextIO')
+def _make_io():
+    global IO, BinaryIO, TextIO
 
-class TextIO(IO[unicode]):
-    """Typed version of the return of open() in text mode."""
+    class IO(Generic[AnyStr]):
+        """Generic base class for TextIO and BinaryIO.
 
-    __slots__ = ()
+        This is an abstract, generic version of the return of open().
 
-    @abstractproperty
-    def buffer(self):
-        pass
+        NOTE: This does not distinguish between the different possible
+        classes (text vs. binary, read vs. write vs. read/write,
+        append-only, unbuffered).  The TextIO and BinaryIO subclasses
+        below capture the distinctions between text vs. binary, which is
+        pervasive in the interface; however we currently do not offer a
+        way to track the other distinctions in the type system.
+        """
 
-    @abstractproperty
-    def encoding(self):
-        pass
+        __slots__ = ()
 
-    @abstractproperty
-    def errors(self):
-        pass
+        @abstractproperty
+        def mode(self):
+            pass
 
-    @abstractproperty
-    def line_buffering(self):
-        pass
+        @abstractproperty
+        def name(self):
+            pass
 
-    @abstractproperty
-    def newlines(self):
-        pass
+        @abstractmethod
+        def close(self):
+            pass
 
-    @abstractmethod
-    def __enter__(self):
-        pass
+        @abstractmethod
+        def closed(self):
+            pass
+
+        @abstractmethod
+        def fileno(self):
+            pass
+
+        @abstractmethod
+        def flush(self):
+            pass
+
+        @abstractmethod
+        def isatty(self):
+            pass
+
+        @abstractmethod
+        def read(self, n = -1):
+            pass
+
+        @abstractmethod
+        def readable(self):
+            pass
+
+        @abstractmethod
+        def readline(self, limit = -1):
+            pass
+
+        @abstractmethod
+        def readlines(self, hint = -1):
+            pass
+
+        @abstractmethod
+        def seek(self, offset, whence = 0):
+            pass
+
+        @abstractmethod
+        def seekable(self):
+            pass
+
+        @abstractmethod
+        def tell(self):
+            pass
+
+        @abstractmethod
+        def truncate(self, size = None):
+            pass
+
+        @abstractmethod
+        def writable(self):
+            pass
+
+        @abstractmethod
+        def write(self, s):
+            pass
+
+        @abstractmethod
+        def writelines(self, lines):
+            pass
+
+        @abstractmethod
+        def __enter__(self):
+            pass
+
+        @abstractmethod
+        def __exit__(self, type, value, traceback):
+            pass
+
+    class BinaryIO(IO[bytes]):
+        """Typed version of the return of open() in binary mode."""
+
+        __slots__ = ()
+
+        @abstractmethod
+        def write(self, s):
+            pass
+
+        @abstractmethod
+        def __enter__(self):
+            pass
+
+    class TextIO(IO[unicode]):
+        """Typed version of the return of open() in text mode."""
+
+        __slots__ = ()
+
+        @abstractproperty
+        def buffer(self):
+            pass
+
+        @abstractproperty
+        def encoding(self):
+            pass
+
+        @abstractproperty
+        def errors(self):
+            pass
+
+        @abstractproperty
+        def line_buffering(self):
+            pass
+
+        @abstractproperty
+        def newlines(self):
+            pass
+
+        @abstractmethod
+        def __enter__(self):
+            pass
+
+    return (IO, BinaryIO, TextIO)
 
 
 class io(object):
     """Wrapper namespace for IO generic classes."""
 
     __all__ = ['IO', 'TextIO', 'BinaryIO']
-    IO = IO
-    TextIO = TextIO
-    BinaryIO = BinaryIO
+    IO = _LazyAttribute('IO')
+    TextIO = _LazyAttribute('TextIO')
+    BinaryIO = _LazyAttribute('BinaryIO')
 
 io.__name__ = __name__ + b'.io'
 sys.modules[io.__name__] = io
@@ -1714,3 +3468,1045 @@ class re(object):
 
 re.__name__ = __name__ + b'.re'
 sys.modules[re.__name__] = re
+
+
+# Runtime statistics.
+#
+# enable_stats() wraps the __getitem__(), __instancecheck__() and
+# __subclasscheck__() methods of the metaclasses below to count and time
+# their calls, and disable_stats() restores them, so that there is no
+# overhead while statistics are off.
+
+_stats_metaclasses = [GenericMeta, _ProtocolMeta, UnionMeta, TupleMeta,
+                      CallableMeta, TypeVar]
+_stats_methods = ['__getitem__', '__instancecheck__', '__subclasscheck__']
+# (metaclass, method) -> [count, seconds, calls per type].  The types
+# are weakly referenced, so that counting doesn't keep them alive.
+_stats_calls = {}
+
+
+def _stats_wrap(method):
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, arg):
+        start = _profile_timer()
+        try:
+            return method(self, arg)
+        finally:
+            elapsed = _profile_timer() - start
+            key = (type(self).__name__, name)
+            entry = _stats_calls.get(key)
+            if entry is None:
+                entry = _stats_calls.setdefault(
+                    key, [0, 0.0, weakref.WeakKeyDictionary()])
+            entry[0] += 1
+            entry[1] += elapsed
+            try:
+                entry[2][self] = entry[2].get(self, 0) + 1
+            except TypeError:
+                pass  # Unhashable or not weakly referenceable.
+
+    wrapper.__stats_wrapped__ = method
+    return wrapper
+
+
+def enable_stats():
+    """Start counting subscriptions and instance and subclass checks."""
+    for meta in _stats_metaclasses:
+        for name in _stats_methods:
+            method = meta.__dict__.get(name)
+            if method is not None and not hasattr(method, '__stats_wrapped__'):
+                setattr(meta, name, _stats_wrap(method))
+
+
+def disable_stats():
+    """Stop counting; the statistics are kept until stats(clear=True)."""
+    for meta in _stats_metaclasses:
+        for name in _stats_methods:
+            method = meta.__dict__.get(name)
+            if hasattr(method, '__stats_wrapped__'):
+                setattr(meta, name, method.__stats_wrapped__)
+
+
+def stats(clear=False):
+    """Return the statistics collected since enable_stats().
+
+    The result is a dict.  Its 'calls' item maps (metaclass name, method
+    name) pairs to dicts holding the number of calls ('count'), their
+    cumulative time in seconds ('seconds'), and the number of calls per
+    receiving type ('types'), leaving out types that no longer exist.
+    Its 'caches' item maps the names of the internal caches, such as
+    '_generic_cache' for interned generics, to dicts holding their
+    cache_info() fields and the 'hit_ratio'.  The caches themselves
+    are private.
+    """
+    calls = {}
+    for key, (count, seconds, per_type) in list(_stats_calls.items()):
+        calls[key] = {'count': count, 'seconds': seconds,
+                      'types': dict(per_type.items())}
+    caches = {}
+    for name, cache in list(globals().items()):
+        if isinstance(cache, _TypeCache):
+            info = cache.cache_info()
+            lookups = info.hits + info.misses
+            caches[name] = dict(info._asdict(),
+                                hit_ratio=float(info.hits) / lookups if lookups
+                                else None)
+    if clear:
+        _stats_calls.clear()
+    return {'calls': calls, 'caches': caches}
+
+
+# Decoding of JSON data into typed values.
+
+def compile_decoder(tp):
+    """Return a function converting json.loads() output to a type.
+
+    Usage::
+
+        Emp = NamedTuple('Emp', [('name', str), ('skills', List[str])])
+        decode = compile_decoder(Dict[str, Emp])
+        decode(json.loads(text))  # {'joe': Emp(name='joe', ...)}
+
+    The type expression is analyzed once and the decoder is cached per
+    type, so decoding checks and converts the data in a single pass
+    without re-interpreting the type.  Supported are int, float (which
+    also accepts integers), bool, str, None, Any, Optional and Union
+    (whose members are tried in a fixed order that doesn't depend on
+    how the Union was spelled, float last), and named tuples, read
+    from JSON objects by field name.  Missing Optional fields become None
+    and unknown keys are ignored.  Arrays become lists for List,
+    Sequence and Iterable, sets for Set and AbstractSet, frozensets
+    for FrozenSet, and tuples for Tuple.  Objects become dicts for
+    Dict, Mapping and MutableMapping.  Other classes only accept
+    values that are already instances.
+
+    A value that doesn't match its type raises TypeError, with the path
+    to the value in the message.  Forward references are resolved on
+    first use, but those of named tuple fields are evaluated when the
+    decoder is built if possible, to tell whether the field is Optional.
+    """
+    if tp is None:
+        tp = type(None)
+    elif isinstance(tp, basestring):
+        # Resolved in the caller's namespace, so not cached by the string.
+        return _make_decoder(tp)
+    decoder = _decoder_cache.get(tp)
+    if decoder is None:
+        decoder = _make_decoder(tp)
+        _decoder_cache[tp] = decoder
+    return decoder
+
+
+_decoder_cache = _TypeCache()
+
+
+class _DecodeError(TypeError):
+    """Raised by decoders.  The path is filled in while unwinding."""
+
+    def __init__(self, expected, value):
+        super(_DecodeError, self).__init__(expected, value)
+        self.path = []
+
+    def __str__(self):
+        expected, value = self.args
+        where = ''.join('[%r]' % key for key in reversed(self.path))
+        if value is _missing:
+            got = 'no value'
+        else:
+            got = _type_repr(type(value))
+        return 'Expected %s at value%s, got %s' % (_type_repr(expected),
+                                                   where, got)
+
+
+_missing = object()
+
+
+def _decode_any(value):
+    return value
+
+
+def _decode_none(value):
+    if value is not None:
+        raise _DecodeError(None, value)
+    return value
+
+
+def _decode_int(value):
+    if type(value) is not int and type(value) is not long:
+        raise _DecodeError(int, value)
+    return value
+
+
+def _decode_float(value):
+    if type(value) is float:
+        return value
+    if type(value) is not int and type(value) is not long:
+        raise _DecodeError(float, value)
+    return float(value)
+
+
+def _decode_bool(value):
+    if type(value) is not bool:
+        raise _DecodeError(bool, value)
+    return value
+
+
+def _decode_text(value):
+    if not isinstance(value, basestring):
+        raise _DecodeError(unicode, value)
+    return value
+
+
+def _decode_bytes(value):
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    if not isinstance(value, str):
+        raise _DecodeError(str, value)
+    return value
+
+
+_primitive_decoders = {
+    int: _decode_int,
+    long: _decode_int,
+    float: _decode_float,
+    bool: _decode_bool,
+    unicode: _decode_text,
+    str: _decode_bytes,
+}
+
+
+def _make_decoder(tp):
+    """Build the decoder for compile_decoder()."""
+    tp = _type_check(tp, "compile_decoder(t): t must be a type.")
+    if tp is Any or tp is object:
+        return _decode_any
+    if tp is type(None):
+        return _decode_none
+    if tp in _primitive_decoders:
+        return _primitive_decoders[tp]
+    if isinstance(tp, _ForwardRef):
+        return _make_forward_decoder(tp)
+    if isinstance(tp, TypeVar):
+        if tp.__bound__ is not None:
+            return compile_decoder(tp.__bound__)
+        if tp.__constraints__:
+            return compile_decoder(Union[tp.__constraints__])
+        return _decode_any
+    if isinstance(tp, UnionMeta):
+        if tp.__union_params__ is None:
+            raise TypeError("Cannot decode plain Union.")
+        return _make_union_decoder(tp)
+    if isinstance(tp, OptionalMeta):
+        raise TypeError("Cannot decode plain Optional.")
+    if isinstance(tp, TupleMeta):
+        return _make_tuple_decoder(tp)
+    if isinstance(tp, GenericMeta):
+        return _make_generic_decoder(tp)
+    if isinstance(tp, type) and issubclass(tp, tuple) and hasattr(
+            tp, '_field_types'):
+        return _make_namedtuple_decoder(tp)
+    return _make_instance_decoder(tp)
+
+
+def _make_instance_decoder(tp):
+
+    def decode(value):
+        if not isinstance(value, tp):
+            raise _DecodeError(tp, value)
+        return value
+
+    return decode
+
+
+def _make_forward_decoder(ref):
+
+    def decode(value):
+        if not ref.__forward_evaluated__:
+            ref._eval_type(*ref._namespaces())
+        return compile_decoder(ref.__forward_value__)(value)
+
+    return decode
+
+
+def _union_members(params):
+    """Return the members of a Union other than None, in a fixed order.
+
+    Equal unions are the same object, so __union_params__ keeps the
+    order of whichever spelling was built first.  Float comes last,
+    since its decoder also accepts integers.
+    """
+    return sorted((p for p in params if p is not type(None)),
+                  key=lambda p: (p is float, fingerprint(p)))
+
+
+def _make_union_decoder(tp):
+    params = tp.__union_params__
+    decoders = tuple(compile_decoder(p) for p in _union_members(params))
+    optional = len(decoders) < len(params)
+    if _decode_any in decoders:
+        return _decode_any
+    if len(decoders) == 1:
+        decoder = decoders[0]
+
+        def decode(value):
+            if value is None:
+                return None
+            return decoder(value)
+
+        return decode
+
+    def decode(value):
+        if value is None and optional:
+            return None
+        for decoder in decoders:
+            try:
+                return decoder(value)
+            except _DecodeError:
+                pass
+        raise _DecodeError(tp, value)
+
+    return decode
+
+
+def _failing_index(decoder, items):
+    """Return the index of the first item the decoder rejects."""
+    for index, item in enumerate(items):
+        try:
+            decoder(item)
+        except _DecodeError:
+            return index
+
+
+def _make_array_decoder(tp, item_decoder, factory):
+    """Return a decoder building factory(items) from a JSON array."""
+    if item_decoder is _decode_any:
+
+        def decode(value):
+            if type(value) is not list:
+                raise _DecodeError(tp, value)
+            return value if factory is list else factory(value)
+
+        return decode
+
+    def decode(value):
+        if type(value) is not list:
+            raise _DecodeError(tp, value)
+        try:
+            result = [item_decoder(item) for item in value]
+        except _DecodeError as exc:
+            exc.path.append(_failing_index(item_decoder, value))
+            raise
+        return result if factory is list else factory(result)
+
+    return decode
+
+
+def _make_tuple_decoder(tp):
+    params = tp.__tuple_params__
+    if params is None:
+        return _make_array_decoder(tp, _decode_any, tuple)
+    if tp.__tuple_use_ellipsis__:
+        return _make_array_decoder(tp, compile_decoder(params[0]), tuple)
+    decoders = tuple(compile_decoder(p) for p in params)
+    n = len(decoders)
+
+    def decode(value):
+        if type(value) is not list or len(value) != n:
+            raise _DecodeError(tp, value)
+        try:
+            return tuple([decoder(item)
+                          for decoder, item in zip(decoders, value)])
+        except _DecodeError as exc:
+            for index, decoder in enumerate(decoders):
+                if _failing_index(decoder, value[index:index + 1]) == 0:
+                    exc.path.append(index)
+                    break
+            raise
+
+    return decode
+
+
+def _make_mapping_decoder(tp, key_decoder, value_decoder):
+    if value_decoder is _decode_any and key_decoder is _decode_any:
+        return _make_instance_decoder(dict)
+    if key_decoder is _decode_any:
+
+        def decode(value):
+            if type(value) is not dict:
+                raise _DecodeError(tp, value)
+            try:
+                return dict([(k, value_decoder(v))
+                             for k, v in value.items()])
+            except _DecodeError as exc:
+                for k, v in value.items():
+                    if _failing_index(value_decoder, [v]) == 0:
+                        exc.path.append(k)
+                        break
+                raise
+
+        return decode
+
+    def decode(value):
+        if type(value) is not dict:
+            raise _DecodeError(tp, value)
+        try:
+            return dict([(key_decoder(k), value_decoder(v))
+                         for k, v in value.items()])
+        except _DecodeError as exc:
+            for k, v in value.items():
+                if _failing_index(value_decoder, [v]) == 0:
+                    exc.path.append(k)
+                    break
+            raise
+
+    return decode
+
+
+def _make_generic_decoder(tp):
+    origin = _gorg(tp)
+    extra = origin.__extra__
+    args = tp.__args__ or ()
+    if extra is None or origin.__module__ != __name__:
+        return _make_instance_decoder(origin)
+    decoders = tuple(compile_decoder(a) for a in args)
+    if issubclass(dict, extra) and issubclass(extra, collections_abc.Mapping):
+        if not decoders:
+            decoders = (_decode_any, _decode_any)
+        key_type = args[0] if args else Any
+        if key_type in (unicode, str, Any):
+            key_decoder = _decode_any  # JSON keys are always strings.
+        else:
+            key_decoder = decoders[0]
+        return _make_mapping_decoder(tp, key_decoder, decoders[1])
+    item_decoder = decoders[0] if len(decoders) == 1 else _decode_any
+    if issubclass(list, extra):
+        return _make_array_decoder(tp, item_decoder, list)
+    if issubclass(set, extra):
+        return _make_array_decoder(tp, item_decoder, set)
+    if issubclass(frozenset, extra):
+        return _make_array_decoder(tp, item_decoder, frozenset)
+    return _make_instance_decoder(origin)
+
+
+def _decode_present(value):
+    if value is _missing:
+        raise _DecodeError(Any, value)
+    return value
+
+
+def _make_namedtuple_decoder(cls):
+    fields = []
+    for name, field_type in zip(cls._fields, _namedtuple_field_types(cls)):
+        decoder = compile_decoder(field_type)
+        if isinstance(field_type, _ForwardRef):
+            # Evaluate it now if possible, to see whether it's Optional.
+            try:
+                field_type = field_type._eval_type(*field_type._namespaces())
+            except NameError:
+                pass
+        optional = (field_type is None or field_type is type(None) or
+                    (isinstance(field_type, UnionMeta) and
+                     type(None) in (field_type.__union_params__ or ())))
+        if optional:
+            default = None
+        else:
+            # Decoders other than _decode_any reject the _missing default.
+            default = _missing
+            if decoder is _decode_any:
+                decoder = _decode_present
+        fields.append((name, decoder, default))
+    fields = tuple(fields)
+    new = tuple.__new__
+
+    def decode(value):
+        if type(value) is not dict:
+            raise _DecodeError(cls, value)
+        get = value.get
+        try:
+            return new(cls, [decoder(get(name, default))
+                             for name, decoder, default in fields])
+        except _DecodeError as exc:
+            for name, decoder, default in fields:
+                if _failing_index(decoder, [get(name, default)]) == 0:
+                    exc.path.append(name)
+                    break
+            raise
+
+    return decode
+
+
+# Encoding of typed values into JSON data.
+
+def compile_encoder(tp, flat=False):
+    """Return a function converting values of a type to JSON data.
+
+    The result consists of dicts, lists, strings, numbers, booleans and
+    None, ready for json.dumps()::
+
+        Emp = NamedTuple('Emp', [('name', str), ('skills', List[str])])
+        encode = compile_encoder(Dict[str, Emp])
+        encode({'joe': Emp('Joe', ['typing'])})
+        # {'joe': {'name': 'Joe', 'skills': ['typing']}}
+
+    This is the reverse of compile_decoder().  The encoder is built once
+    per type from its static shape: named tuples are converted field by
+    field in _fields order, using _field_types, and container items
+    according to the type arguments.  Values are trusted to match the
+    type, so there is no per-value type dispatch, except to pick the
+    member of a Union.  With flat=True, named tuples become lists of
+    their field values instead of dicts.
+
+    Sequences and sets become lists, mappings become dicts, and values
+    of other types are returned as is.
+    """
+    if tp is None:
+        tp = type(None)
+    elif isinstance(tp, basestring):
+        # Resolved in the caller's namespace, so not cached by the string.
+        return _make_encoder(tp, flat)
+    key = (tp, flat)
+    encoder = _encoder_cache.get(key)
+    if encoder is None:
+        encoder = _make_encoder(tp, flat)
+        _encoder_cache[key] = encoder
+    return encoder
+
+
+_encoder_cache = _TypeCache()
+
+
+def _encode_as_is(value):
+    return value
+
+
+def _make_encoder(tp, flat):
+    """Build the encoder for compile_encoder()."""
+    tp = _type_check(tp, "compile_encoder(t): t must be a type.")
+    if tp is Any or tp in (int, long, float, bool, unicode, str, type(None)):
+        return _encode_as_is
+    if isinstance(tp, _ForwardRef):
+        return _make_forward_encoder(tp, flat)
+    if isinstance(tp, TypeVar):
+        if tp.__bound__ is not None:
+            return compile_encoder(tp.__bound__, flat)
+        if tp.__constraints__:
+            return compile_encoder(Union[tp.__constraints__], flat)
+        return _encode_as_is
+    if isinstance(tp, UnionMeta):
+        if tp.__union_params__ is None:
+            raise TypeError("Cannot encode plain Union.")
+        return _make_union_encoder(tp.__union_params__, flat)
+    if isinstance(tp, OptionalMeta):
+        raise TypeError("Cannot encode plain Optional.")
+    if isinstance(tp, TupleMeta):
+        return _make_tuple_encoder(tp, flat)
+    if isinstance(tp, GenericMeta):
+        return _make_generic_encoder(tp, flat)
+    if isinstance(tp, type) and issubclass(tp, tuple) and hasattr(
+            tp, '_field_types'):
+        return _make_namedtuple_encoder(tp, flat)
+    return _encode_as_is
+
+
+def _make_forward_encoder(ref, flat):
+
+    def encode(value):
+        if not ref.__forward_evaluated__:
+            ref._eval_type(*ref._namespaces())
+        return compile_encoder(ref.__forward_value__, flat)(value)
+
+    return encode
+
+
+def _make_union_encoder(params, flat):
+    members = _union_members(params)
+    encoders = tuple(compile_encoder(p, flat) for p in members)
+    if all(encoder is _encode_as_is for encoder in encoders):
+        return _encode_as_is
+    if len(encoders) == 1:
+        encoder = encoders[0]
+
+        def encode(value):
+            if value is None:
+                return None
+            return encoder(value)
+
+        return encode
+    # The member must be determined from the value: the class of the
+    # value if it is a member, else the first member accepting it.
+    by_class = dict((p, encoder) for p, encoder in zip(members, encoders)
+                    if isinstance(p, type))
+    checks = tuple(zip([compile_checker(p) for p in members], encoders))
+
+    def encode(value):
+        if value is None:
+            return None
+        encoder = by_class.get(type(value))
+        if encoder is not None:
+            return encoder(value)
+        for check, encoder in checks:
+            if check(value):
+                return encoder(value)
+        return value
+
+    return encode
+
+
+def _make_sequence_encoder(item_encoder):
+    if item_encoder is _encode_as_is:
+        return list
+
+    def encode(value):
+        return [item_encoder(item) for item in value]
+
+    return encode
+
+
+def _make_tuple_encoder(tp, flat):
+    params = tp.__tuple_params__
+    if params is None:
+        return list
+    if tp.__tuple_use_ellipsis__:
+        return _make_sequence_encoder(compile_encoder(params[0], flat))
+    encoders = tuple(compile_encoder(p, flat) for p in params)
+    if all(encoder is _encode_as_is for encoder in encoders):
+        return list
+
+    def encode(value):
+        return [encoder(item) for encoder, item in zip(encoders, value)]
+
+    return encode
+
+
+def _make_generic_encoder(tp, flat):
+    origin = _gorg(tp)
+    extra = origin.__extra__
+    args = tp.__args__ or ()
+    if extra is None or origin.__module__ != __name__:
+        return _encode_as_is
+    encoders = tuple(compile_encoder(a, flat) for a in args)
+    if issubclass(extra, collections_abc.Mapping):
+        if len(encoders) != 2:
+            return dict
+        key_encoder, value_encoder = encoders
+        if args[0] in (unicode, str, Any):
+            key_encoder = _encode_as_is
+        if key_encoder is _encode_as_is:
+            if value_encoder is _encode_as_is:
+                return dict
+
+            def encode(value):
+                return dict([(k, value_encoder(v)) for k, v in value.items()])
+
+            return encode
+
+        def encode(value):
+            return dict([(key_encoder(k), value_encoder(v))
+                         for k, v in value.items()])
+
+        return encode
+    if issubclass(extra, collections_abc.Iterable):
+        item_encoder = encoders[0] if len(encoders) == 1 else _encode_as_is
+        return _make_sequence_encoder(item_encoder)
+    return _encode_as_is
+
+
+def _make_namedtuple_encoder(cls, flat):
+    names = cls._fields
+    encoders = tuple(compile_encoder(t, flat)
+                     for t in _namedtuple_field_types(cls))
+    if all(encoder is _encode_as_is for encoder in encoders):
+        if flat:
+            return list
+
+        def encode(value):
+            return dict(zip(names, value))
+
+        return encode
+    if flat:
+
+        def encode(value):
+            return [encoder(item) for encoder, item in zip(encoders, value)]
+
+        return encode
+
+    def encode(value):
+        return dict(zip(names, [encoder(item) for encoder, item
+                                in zip(encoders, value)]))
+
+    return encode
+
+
+# Runtime checking of values against type expressions.
+
+def _check_any(value):
+    return True
+
+
+def compile_checker(tp):
+    """Return a function checking whether a value matches a type.
+
+    Usage::
+
+        check = compile_checker(Dict[str, List[int]])
+        check({'a': [1, 2]})  # True
+        check({'a': ['1']})  # False
+
+    Unlike isinstance(), the checker also looks inside containers,
+    e.g. at each key and value of a Dict[str, int] or each element of
+    a Tuple[int, str] or Sequence[float].  The type expression is
+    analyzed once and the checker is cached per type, so checking
+    doesn't re-interpret the type each time.
+
+    Some values can't be checked without consuming or calling them:
+    for iterators, generators and callables only the outer type is
+    checked.  See compile_stream_checker() for checking items as they
+    are produced.  Type variables are checked against their bound or
+    constraints, and parameters of user-defined generic classes are
+    ignored (type erasure).  Forward references are resolved on first
+    use.
+    """
+    if tp is None:
+        tp = type(None)
+    elif isinstance(tp, basestring):
+        # Resolved in the caller's namespace, so not cached by the string.
+        return _make_checker(tp)
+    checker = _checker_cache.get(tp)
+    if checker is None:
+        checker = _make_checker(tp)
+        _checker_cache[tp] = checker
+    return checker
+
+
+_checker_cache = _TypeCache()
+
+
+def _make_checker(tp):
+    """Build the checker for compile_checker()."""
+    tp = _type_check(tp, "compile_checker(t): t must be a type.")
+    if tp is Any or tp is object:
+        return _check_any
+    if isinstance(tp, _ForwardRef):
+        return _make_forward_checker(tp)
+    if isinstance(tp, TypeVar):
+        if tp.__bound__ is not None:
+            return compile_checker(tp.__bound__)
+        if tp.__constraints__:
+            return compile_checker(Union[tp.__constraints__])
+        return _check_any
+    if isinstance(tp, UnionMeta):
+        if tp.__union_params__ is None:
+            raise TypeError("Cannot check against plain Union.")
+        return _make_union_checker(tp.__union_params__)
+    if isinstance(tp, OptionalMeta):
+        raise TypeError("Cannot check against plain Optional.")
+    if isinstance(tp, TupleMeta):
+        return _make_tuple_checker(tp)
+    if isinstance(tp, CallableMeta):
+        return callable
+    if isinstance(tp, _TypeAlias):
+        return _make_alias_checker(tp)
+    if isinstance(tp, GenericMeta):
+        return _make_generic_checker(tp)
+    if issubclass(tp, tuple) and hasattr(tp, '_field_types'):
+        return _make_namedtuple_checker(tp)
+
+    def check(value):
+        return isinstance(value, tp)
+
+    return check
+
+
+def _make_forward_checker(ref):
+
+    def check(value):
+        if not ref.__forward_evaluated__:
+            ref._eval_type(*ref._namespaces())
+        return compile_checker(ref.__forward_value__)(value)
+
+    return check
+
+
+def _make_union_checker(params):
+    checkers = tuple(compile_checker(p) for p in params)
+    if _check_any in checkers:
+        return _check_any
+
+    def check(value):
+        for checker in checkers:
+            if checker(value):
+                return True
+        return False
+
+    return check
+
+
+def _make_tuple_checker(tp):
+    params = tp.__tuple_params__
+    if params is None:
+        return lambda value: isinstance(value, tuple)
+    if tp.__tuple_use_ellipsis__:
+        item_checker = compile_checker(params[0])
+        if item_checker is _check_any:
+            return lambda value: isinstance(value, tuple)
+
+        def check(value):
+            if not isinstance(value, tuple):
+                return False
+            for item in value:
+                if not item_checker(item):
+                    return False
+            return True
+
+        return check
+    checkers = tuple(compile_checker(p) for p in params)
+    n = len(checkers)
+
+    def check(value):
+        if not isinstance(value, tuple) or len(value) != n:
+            return False
+        for checker, item in zip(checkers, value):
+            if not checker(item):
+                return False
+        return True
+
+    return check
+
+
+def _make_alias_checker(alias):
+    impl_type = alias.impl_type
+    if isinstance(alias.type_var, TypeVar):
+        return lambda value: isinstance(value, impl_type)
+    type_var = alias.type_var
+    type_checker = alias.type_checker
+
+    def check(value):
+        return (isinstance(value, impl_type) and
+                isinstance(type_checker(value), type_var))
+
+    return check
+
+
+def _make_generic_checker(tp):
+    origin = _gorg(tp)
+    if isinstance(origin, _ProtocolMeta):
+
+        def check_outer(value):
+            return issubclass(type(value), origin)
+
+    else:
+
+        def check_outer(value):
+            return isinstance(value, origin)
+
+    args = tp.__args__
+    extra = origin.__extra__
+    # Only the parameters of typing's own collection classes are known
+    # to describe their items.
+    if (not args or extra is None or origin.__module__ != __name__ or
+            issubclass(extra, collections_abc.Iterator) or
+            not issubclass(extra, collections_abc.Iterable)):
+        return check_outer
+    checkers = tuple(compile_checker(a) for a in args)
+    if all(c is _check_any for c in checkers):
+        return check_outer
+    if issubclass(extra, collections_abc.Mapping) and len(checkers) == 2:
+        key_checker, value_checker = checkers
+
+        def check(value):
+            if not check_outer(value):
+                return False
+            for k, v in value.items():
+                if not key_checker(k) or not value_checker(v):
+                    return False
+            return True
+
+        return check
+    if issubclass(extra, collections_abc.ItemsView) and len(checkers) == 2:
+        item_checker = _make_tuple_checker(Tuple[args])
+    elif len(checkers) == 1:
+        item_checker = checkers[0]
+    else:
+        return check_outer
+
+    def check(value):
+        if not check_outer(value):
+            return False
+        if isinstance(value, collections_abc.Iterator):
+            return True  # Checking the items would consume them.
+        for item in value:
+            if not item_checker(item):
+                return False
+        return True
+
+    return check
+
+
+def _make_namedtuple_checker(cls):
+    checkers = tuple(compile_checker(t)
+                     for t in _namedtuple_field_types(cls))
+
+    def check(value):
+        if not isinstance(value, cls):
+            return False
+        for checker, item in zip(checkers, value):
+            if not checker(item):
+                return False
+        return True
+
+    return check
+
+
+def compile_stream_checker(tp):
+    """Return a function wrapping a stream in a checking proxy.
+
+    Usage::
+
+        check = compile_stream_checker(Iterator[int])
+        for item in check(iter(['1'])):  # TypeError
+            ...
+
+    tp must be an Iterable, Iterator or Generator type.  Their items
+    can't be checked up front without consuming them, so the proxy
+    checks each item as it is produced: items an Iterator[T] or an
+    iterator over an Iterable[T] yields against T, and for a
+    Generator[Y, S, R] the yielded values against Y, the values passed
+    to send() against S and the value the generator returns against R.
+    A mismatch raises TypeError.  The checkers are compiled once per
+    type, so each item costs one call to them.  If the parameters are
+    all Any, the value is returned unwrapped.  Either way, the outer
+    type is checked right away.
+    """
+    if tp is None:
+        tp = type(None)
+    wrapper = _stream_checker_cache.get(tp)
+    if wrapper is None:
+        wrapper = _make_stream_checker(tp)
+        _stream_checker_cache[tp] = wrapper
+    return wrapper
+
+
+_stream_checker_cache = _TypeCache()
+
+
+def _make_stream_checker(tp):
+    """Build the wrapper for compile_stream_checker()."""
+    tp = _type_check(tp, "compile_stream_checker(t): t must be a type.")
+    origin = _gorg(tp) if isinstance(tp, GenericMeta) else None
+    extra = getattr(origin, '__extra__', None)
+    if origin is None or origin.__module__ != __name__ or extra not in (
+            collections_abc.Iterable, collections_abc.Iterator, _G_base):
+        raise TypeError("compile_stream_checker(t): t must be an "
+                        "Iterable, Iterator or Generator type.")
+    check_outer = compile_checker(origin)
+    checkers = tuple(compile_checker(a) for a in tp.__args__ or ())
+    if all(c is _check_any for c in checkers):
+        proxy = None
+    elif extra is _G_base:
+        proxy = _CheckedGenerator
+    elif extra is collections_abc.Iterator:
+        proxy = _CheckedIterator
+    else:
+        proxy = _CheckedIterable
+
+    def wrap(value):
+        if not check_outer(value):
+            raise TypeError("Expected %s, got %s" % (
+                _type_repr(tp), _type_repr(type(value))))
+        if proxy is None:
+            return value
+        return proxy(value, tp, *checkers)
+
+    return wrap
+
+
+def _stream_error(tp, verb, value):
+    return TypeError("%s %s a value of type %s" % (
+        _type_repr(tp), verb, _type_repr(type(value))))
+
+
+class _CheckedIterable(object):
+    """Proxy for an Iterable[T] checking items yielded by its iterators."""
+
+    __slots__ = ('_stream', '_tp', '_check_item')
+
+    def __init__(self, stream, tp, item_checker):
+        self._stream = stream
+        self._tp = tp
+        self._check_item = item_checker
+
+    def __iter__(self):
+        return _CheckedIterator(iter(self._stream), self._tp,
+                                self._check_item)
+
+    def __repr__(self):
+        return '<checked %s %r>' % (_type_repr(self._tp), self._stream)
+
+
+class _CheckedIterator(_CheckedIterable):
+    """Proxy for an Iterator[T] checking each item it yields."""
+
+    __slots__ = ()
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        item = next(self._stream)
+        if not self._check_item(item):
+            raise _stream_error(self._tp, 'yielded', item)
+        return item
+
+    __next__ = next
+
+
+class _CheckedGenerator(_CheckedIterator):
+    """Proxy for a Generator[Y, S, R] checking what passes through it."""
+
+    __slots__ = ('_check_send', '_check_return')
+
+    def __init__(self, stream, tp, item_checker, send_checker,
+                 return_checker):
+        super(_CheckedGenerator, self).__init__(stream, tp, item_checker)
+        self._check_send = send_checker
+        self._check_return = return_checker
+
+    def next(self):
+        return self._checked(next, self._stream)
+
+    __next__ = next
+
+    def send(self, value):
+        if not self._check_send(value):
+            raise _stream_error(self._tp, 'was sent', value)
+        return self._checked(self._stream.send, value)
+
+    def throw(self, *args):
+        return self._checked(self._stream.throw, *args)
+
+    def close(self):
+        self._stream.close()
+
+    def _checked(self, resume, *args):
+        """Resume the generator and check what it yields or returns."""
+        try:
+            item = resume(*args)
+        except StopIteration as exc:
+            value = exc.args[0] if exc.args else None
+            if not self._check_return(value):
+                raise _stream_error(self._tp, 'returned', value)
+            raise
+        if not self._check_item(item):
+            raise _stream_error(self._tp, 'yielded', item)
+        return item
+
+
+if _lazy_mode:
+    # The type of a module can't be changed, so replace it with a copy.
+    # The original must stay alive, or its globals would be cleared.
+    _module = _LazyModule(str(__name__))
+    _module.__dict__.update(globals())
+    _module._original_module = sys.modules[__name__]
+    sys.modules[__name__] = _module
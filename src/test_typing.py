@@ -1,3 +1,4 @@
+import abc
 import contextlib
 import pickle
 import re
@@ -12,7 +13,10 @@ from typing import Tuple
 from typing import Callable
 from typing import Generic
 from typing import cast
+from typing import compile_checker, compile_decoder, compile_encoder
+from typing import compile_stream_checker
 from typing import get_type_hints
+from typing import get_class_type_hints, get_module_type_hints
 from typing import no_type_check, no_type_check_decorator
 from typing import NamedTuple
 from typing import IO, TextIO, BinaryIO
@@ -278,11 +282,31 @@ class UnionTests(TestCase):
 
     def test_repr(self):
         self.assertEqual(repr(Union), 'typing.Union')
+        # Equal unions are canonicalized, so the order of the first
+        # construction wins.
+        typing._union_cache.cache_clear()
         u = Union[Employee, int]
         self.assertEqual(repr(u), 'typing.Union[%s.Employee, int]' % __name__)
         u = Union[int, Employee]
+        self.assertEqual(repr(u), 'typing.Union[%s.Employee, int]' % __name__)
+        typing._union_cache.cache_clear()
+        u = Union[int, Employee]
         self.assertEqual(repr(u), 'typing.Union[int, %s.Employee]' % __name__)
 
+    def test_canonical(self):
+        assert Union[int, str] is Union[str, int]
+        assert Union[int, Union[str, float]] is Union[float, int, str]
+        assert Union[int, str] is not Union[int, float]
+
+    def test_many_members(self):
+        classes = [type(str('C%d' % i), (Employee,), {}) for i in range(50)]
+        u = Union[tuple(classes) + (int, Employee)]
+        self.assertEqual(u, Union[int, Employee])
+        u = Union[tuple(classes) + (int, typing.Sized)]
+        self.assertEqual(len(u.__union_params__), 52)
+        u = Union[tuple(classes) + (list, typing.Sized)]
+        assert list not in u.__union_params__
+
     def test_cannot_subclass(self):
         with self.assertRaises(TypeError):
             class C(Union):
@@ -562,6 +586,28 @@ class ProtocolTests(TestCase):
         with self.assertRaises(TypeError):
             isinstance(0, typing.SupportsAbs)
 
+    def test_protocol_attrs(self):
+        assert typing.SupportsInt._protocol_attrs == {'__int__'}
+        assert typing.SupportsAbs._protocol_attrs == {'__abs__'}
+
+    def test_subclass_cache(self):
+        class C:
+            def __int__(self):
+                return 0
+
+        assert issubclass(C, typing.SupportsInt)
+        assert C in typing.SupportsInt._protocol_cache
+        assert not issubclass(object, typing.SupportsInt)
+        assert object not in typing.SupportsInt._protocol_cache
+
+    def test_subclass_method_added_later(self):
+        class C:
+            pass
+
+        assert not issubclass(C, typing.SupportsInt)
+        C.__int__ = lambda self: 0
+        assert issubclass(C, typing.SupportsInt)
+
 
 class GenericTests(TestCase):
 
@@ -586,6 +632,21 @@ class GenericTests(TestCase):
         with self.assertRaises(TypeError):
             Generic[T, S, T]
 
+    def test_new_subscripted(self):
+
+        class C(Generic[T]):
+            calls = 0
+
+            def __init__(self, x):
+                C.calls += 1
+                self.x = x
+
+        c = C[int](42)
+        assert type(c) is C
+        assert c.x == 42
+        assert C.calls == 1
+        assert C[int].__origin_root__ is C
+
     def test_repr(self):
         self.assertEqual(repr(SimpleMapping),
                          __name__ + '.' + 'SimpleMapping<~XK, ~XV>')
@@ -702,6 +763,23 @@ class GenericTests(TestCase):
         assert A[T] == A[T]
         assert A[T] != B[T]
 
+    def test_hash(self):
+
+        class A(Generic[T]):
+            pass
+
+        class B(Generic[T]):
+            pass
+
+        assert hash(A[int]) == hash(A[int])
+        assert hash(A[T]) == A[T].__tree_hash__
+        hashes = set(hash(typing.List[t]) for t in (int, float, bytes))
+        assert len(hashes) == 3
+        assert hash(A[int]) != hash(B[int])
+        d = {typing.List[int]: 1, typing.List[float]: 2}
+        assert d[typing.List[int]] == 1
+        assert d[typing.List[float]] == 2
+
     def test_multiple_inheritance(self):
 
         class A(Generic[T, VT]):
@@ -788,6 +866,101 @@ class GenericTests(TestCase):
             D[T]
 
 
+class GenericCacheTests(TestCase):
+
+    def test_interned(self):
+        assert typing.List[int] is typing.List[int]
+        assert typing.Mapping[KT, VT] is typing.Mapping[KT, VT]
+        assert SimpleMapping[XK, XV] is SimpleMapping[XK, XV]
+        assert typing.List[int] is not typing.List[str]
+
+    def test_cache_info(self):
+        typing._generic_cache.cache_clear()
+        info = typing._generic_cache.cache_info()
+        assert info.hits == info.misses == info.currsize == 0
+        typing.List[Employee]
+        typing.List[Employee]
+        info = typing._generic_cache.cache_info()
+        assert info.hits == 1
+        assert info.misses == 1
+        assert info.currsize == 1
+
+    def test_bounded(self):
+        cache = typing._InternCache(maxsize=2)
+
+        class A(object):
+            pass
+
+        a, b, c = A(), A(), A()
+        cache[1] = a
+        cache[2] = b
+        cache[3] = c
+        assert len(cache) == 2
+        # Evicted entries are still found while they are alive.
+        assert cache.get(1) is a
+        del a, b
+        import gc
+        gc.collect()
+        assert cache.get(2) is None
+
+    def test_unhashable_key(self):
+        cache = typing._TypeCache()
+        cache[[]] = 42
+        assert cache.get([]) is None
+        assert len(cache) == 0
+
+    def test_instancecheck_cache(self):
+        Mapping = typing.Mapping
+        assert isinstance({}, Mapping)
+        assert dict in Mapping._abc_instance_cache
+        assert not isinstance([], Mapping)
+        assert list in Mapping._abc_instance_negative_cache
+        assert not isinstance([], Mapping)
+
+    def test_instancecheck_register(self):
+
+        class M:
+            pass
+
+        m = M()
+        assert not isinstance(m, typing.Mapping)
+        typing.Mapping.__extra__.register(M)
+        # register() invalidates the negative cache.
+        assert isinstance(m, typing.Mapping)
+
+    def test_subclass_cache(self):
+        typing._subclass_cache.cache_clear()
+        Sequence = typing.Sequence
+        assert issubclass(Sequence[Manager], Sequence[Employee])
+        assert issubclass(Sequence[Manager], Sequence[Employee])
+        assert typing._subclass_cache.cache_info().hits == 1
+        assert not issubclass(Sequence[Employee], Sequence[Manager])
+        assert not issubclass(Sequence[Employee], Sequence[Manager])
+        assert typing._subclass_cache.cache_info().hits == 2
+
+    def test_subclass_cache_register(self):
+
+        class A(metaclass=abc.ABCMeta):
+            pass
+
+        class B:
+            pass
+
+        Sequence = typing.Sequence
+        assert not issubclass(Sequence[B], Sequence[A])
+        A.register(B)
+        assert issubclass(Sequence[B], Sequence[A])
+
+    def test_subclass_cache_forward_ref(self):
+        namespace = {'Sequence': typing.Sequence}
+        exec("S = Sequence['Foo']", namespace)
+        S = namespace['S']
+        Sequence = typing.Sequence
+        assert not issubclass(Sequence[Manager], S)
+        namespace['Foo'] = Employee
+        assert issubclass(Sequence[Manager], S)
+
+
 class VarianceTests(TestCase):
 
     def test_invariance(self):
@@ -832,6 +1005,362 @@ class VarianceTests(TestCase):
                               typing.Mapping[Manager, Manager])
 
 
+# A module with string field types, to compile from a different module.
+TEAM_SOURCE = """
+from typing import NamedTuple, Optional, compile_checker
+
+class Boss:
+    pass
+
+Emp = NamedTuple('Emp', [('id', 'int'), ('boss', 'Optional[Boss]')])
+
+check_boss = compile_checker('Boss')
+"""
+
+
+def make_module(name, source):
+    import types
+    module = types.ModuleType(name)
+    exec(source, module.__dict__)
+    return module
+
+
+class CompileCheckerTests(TestCase):
+
+    def test_simple(self):
+        check = compile_checker(int)
+        assert check(42)
+        assert not check('42')
+        assert compile_checker(None)(None)
+        assert not compile_checker(None)(0)
+        assert compile_checker(Any)(object())
+
+    def test_cached(self):
+        assert compile_checker(typing.List[int]) is \
+            compile_checker(typing.List[int])
+
+    def test_nested(self):
+        check = compile_checker(
+            typing.List[typing.Dict[str, Tuple[int, float]]])
+        assert check([{'a': (1, 2.0)}, {}])
+        assert check([])
+        assert not check([{'a': (1, 2)}])
+        assert not check([{1: (1, 2.0)}])
+        assert not check(({'a': (1, 2.0)},))
+        assert not check([{'a': (1, 2.0, 3.0)}])
+
+    def test_union_optional(self):
+        check = compile_checker(Optional[Union[int, str]])
+        assert check(None)
+        assert check(1)
+        assert check('1')
+        assert not check(1.0)
+
+    def test_tuple(self):
+        assert compile_checker(Tuple)((1, 'a'))
+        assert not compile_checker(Tuple)([1])
+        check = compile_checker(Tuple[int, ...])
+        assert check(())
+        assert check((1, 2, 3))
+        assert not check((1, 'a'))
+
+    def test_abcs(self):
+        check = compile_checker(typing.Mapping[str, int])
+        assert check({'a': 1})
+        assert not check({'a': 'b'})
+        assert not check([('a', 1)])
+        check = compile_checker(typing.AbstractSet[int])
+        assert check(frozenset([1, 2]))
+        assert not check(set(['1']))
+        check = compile_checker(typing.Sequence[Employee])
+        assert check([Manager(), Founder()])
+        assert not check([Manager(), 42])
+        check = compile_checker(typing.ItemsView[str, int])
+        assert check({'a': 1}.items())
+        assert not check({'a': 'b'}.items())
+
+    def test_iterators_not_consumed(self):
+        it = iter([1, 2, 3])
+        assert compile_checker(typing.Iterator[str])(it)
+        assert compile_checker(typing.Iterable[str])(it)
+        self.assertEqual(list(it), [1, 2, 3])
+
+    def test_typevar(self):
+        assert compile_checker(T)(object())
+        check = compile_checker(AnyStr)
+        assert check(b'')
+        assert not check(42)
+        X = TypeVar('X', bound=Employee)
+        assert compile_checker(X)(Manager())
+        assert not compile_checker(X)(42)
+
+    def test_user_generic(self):
+        check = compile_checker(SimpleMapping[XK, int])
+        assert check(MySimpleMapping())
+        assert not check({})
+
+    def test_protocol(self):
+        assert compile_checker(typing.SupportsInt)(4.2)
+        assert not compile_checker(typing.SupportsInt)('')
+
+    def test_callable(self):
+        assert compile_checker(Callable[[int], int])(len)
+        assert not compile_checker(Callable[[int], int])(42)
+
+    def test_pattern(self):
+        check = compile_checker(Pattern[bytes])
+        assert check(re.compile(b'a'))
+        assert not check(re.compile('a'))
+        assert compile_checker(Pattern)(re.compile('a'))
+
+    def test_namedtuple(self):
+        Emp = NamedTuple('Emp', [('name', str), ('id', int)])
+        check = compile_checker(Emp)
+        assert check(Emp('Joe', 42))
+        assert not check(Emp('Joe', '42'))
+        assert not check(('Joe', 42))
+
+    def test_forward_ref(self):
+        check = compile_checker(typing.List['Employee'])
+        assert check([Employee()])
+        assert not check([42])
+
+    def test_forward_ref_other_module(self):
+        moda = make_module('moda', TEAM_SOURCE)
+        modb = make_module('modb', TEAM_SOURCE)
+        assert moda.check_boss(moda.Boss())
+        assert modb.check_boss(modb.Boss())
+        assert not modb.check_boss(moda.Boss())
+        check = compile_checker(moda.Emp)
+        assert check(moda.Emp(1, None))
+        assert check(moda.Emp(1, moda.Boss()))
+        assert not check(moda.Emp(1, modb.Boss()))
+
+    def test_errors(self):
+        with self.assertRaises(TypeError):
+            compile_checker(42)
+        with self.assertRaises(TypeError):
+            compile_checker(Union)
+
+
+class CompileStreamCheckerTests(TestCase):
+
+    def test_iterator(self):
+        check = compile_stream_checker(typing.Iterator[int])
+        assert list(check(iter([1, 2]))) == [1, 2]
+        items = check(iter([1, '2']))
+        assert next(items) == 1
+        with self.assertRaises(TypeError):
+            next(items)
+        with self.assertRaises(TypeError):
+            check([1])
+
+    def test_iterable(self):
+        check = compile_stream_checker(typing.Iterable[int])
+        items = check([1, 2])
+        assert list(items) == list(items) == [1, 2]
+        with self.assertRaises(TypeError):
+            list(check([1, None]))
+
+    def test_any_unwrapped(self):
+        items = iter([1])
+        assert compile_stream_checker(typing.Iterator)(items) is items
+        assert compile_stream_checker(typing.Iterator[Any])(items) is items
+
+    def test_generator(self):
+
+        def echo():
+            received = yield 1
+            while received is not None:
+                received = yield received
+            return 'done'
+
+        check = compile_stream_checker(typing.Generator[int, int, str])
+        gen = check(echo())
+        assert isinstance(gen, typing.Generator)
+        assert next(gen) == 1
+        assert gen.send(2) == 2
+        with self.assertRaises(TypeError):
+            gen.send('3')
+        with self.assertRaises(StopIteration) as cm:
+            next(gen)
+        assert cm.exception.value == 'done'
+        gen = compile_stream_checker(typing.Generator[int, None, int])(
+            echo())
+        next(gen)
+        with self.assertRaises(TypeError):
+            next(gen)
+
+    def test_cached(self):
+        assert compile_stream_checker(typing.Iterator[int]) is \
+            compile_stream_checker(typing.Iterator[int])
+
+    def test_errors(self):
+        with self.assertRaises(TypeError):
+            compile_stream_checker(typing.List[int])
+        with self.assertRaises(TypeError):
+            compile_stream_checker(int)
+
+
+class CompileDecoderTests(TestCase):
+
+    def test_simple(self):
+        assert compile_decoder(int)(42) == 42
+        assert compile_decoder(str)('x') == 'x'
+        assert compile_decoder(None)(None) is None
+        value = compile_decoder(float)(1)
+        assert value == 1.0 and type(value) is float
+        with self.assertRaises(TypeError):
+            compile_decoder(int)(True)
+        with self.assertRaises(TypeError):
+            compile_decoder(float)('1')
+
+    def test_cached(self):
+        assert compile_decoder(typing.List[int]) is \
+            compile_decoder(typing.List[int])
+
+    def test_containers(self):
+        decode = compile_decoder(
+            typing.Dict[str, Tuple[int, typing.Set[float]]])
+        assert decode({'a': [1, [2, 3.5]]}) == {'a': (1, {2.0, 3.5})}
+        assert compile_decoder(Tuple[int, ...])([1, 2]) == (1, 2)
+        assert compile_decoder(typing.FrozenSet[int])([1, 1]) == \
+            frozenset([1])
+        assert compile_decoder(typing.Sequence[Any])([1, 'a']) == [1, 'a']
+        with self.assertRaises(TypeError):
+            compile_decoder(Tuple[int, int])([1])
+
+    def test_union(self):
+        decode = compile_decoder(Optional[Union[int, typing.List[int]]])
+        assert decode(None) is None
+        assert decode(1) == 1
+        assert decode([1]) == [1]
+        with self.assertRaises(TypeError):
+            decode('1')
+
+    def test_union_order(self):
+
+        class C:
+            pass
+
+        # Equal unions are the same object, so build a new one.
+        for tp in [Union[float, int, C], Union[C, int, float]]:
+            decode = compile_decoder(tp)
+            value = decode(1)
+            assert value == 1 and type(value) is int
+            value = decode(1.5)
+            assert value == 1.5 and type(value) is float
+
+    def test_namedtuple(self):
+        Emp = NamedTuple('Emp', [('name', str), ('id', int),
+                                 ('boss', Optional[str])])
+        decode = compile_decoder(typing.List[Emp])
+        emps = decode([{'name': 'Joe', 'id': 1, 'extra': 0},
+                       {'name': 'Jim', 'id': 2, 'boss': 'Joe'}])
+        assert emps == [Emp('Joe', 1, None), Emp('Jim', 2, 'Joe')]
+        assert type(emps[0]) is Emp
+        with self.assertRaises(TypeError):
+            decode([{'name': 'Joe'}])
+
+    def test_namedtuple_other_module(self):
+        moda = make_module('moda', TEAM_SOURCE)
+        decode = compile_decoder(moda.Emp)
+        assert decode({'id': 1}) == moda.Emp(1, None)
+        boss = moda.Boss()
+        assert decode({'id': 1, 'boss': boss}).boss is boss
+        with self.assertRaises(TypeError):
+            decode({'boss': None})
+        namespace = {'compile_decoder': compile_decoder, 'Foo': int}
+        exec("decode = compile_decoder('Foo')", namespace)
+        assert namespace['decode'](1) == 1
+        namespace['Foo'] = str
+        exec("decode = compile_decoder('Foo')", namespace)
+        with self.assertRaises(TypeError):
+            namespace['decode'](1)
+
+    def test_error_path(self):
+        Emp = NamedTuple('Emp', [('skills', typing.List[int])])
+        decode = compile_decoder(typing.Dict[str, Emp])
+        with self.assertRaises(TypeError) as cm:
+            decode({'joe': {'skills': [1, 2, 'x']}})
+        message = str(cm.exception)
+        assert "value['joe']['skills'][2]" in message
+        assert message.startswith('Expected int')
+
+    def test_errors(self):
+        with self.assertRaises(TypeError):
+            compile_decoder(Union)
+        with self.assertRaises(TypeError):
+            compile_decoder(42)
+
+
+class CompileEncoderTests(TestCase):
+
+    def test_simple(self):
+        assert compile_encoder(int)(42) == 42
+        assert compile_encoder(None)(None) is None
+        assert compile_encoder(Any)(compile_encoder) is compile_encoder
+
+    def test_cached(self):
+        assert compile_encoder(typing.List[int]) is \
+            compile_encoder(typing.List[int])
+        Emp = NamedTuple('Emp', [('id', int)])
+        assert compile_encoder(Emp) is not compile_encoder(Emp, flat=True)
+
+    def test_containers(self):
+        encode = compile_encoder(
+            typing.Dict[str, Tuple[int, typing.FrozenSet[float]]])
+        assert encode({'a': (1, frozenset([2.5]))}) == {'a': [1, [2.5]]}
+        assert compile_encoder(Tuple[int, ...])((1, 2)) == [1, 2]
+        assert compile_encoder(typing.Iterable[int])(iter([1])) == [1]
+
+    def test_namedtuple(self):
+        Emp = NamedTuple('Emp', [('name', str),
+                                 ('skills', typing.Set[str])])
+        Team = NamedTuple('Team', [('lead', Optional[Emp]),
+                                   ('members', typing.List[Emp])])
+        joe = Emp('Joe', {'typing'})
+        team = Team(None, [joe])
+        encode = compile_encoder(Team)
+        data = {'lead': None,
+                'members': [{'name': 'Joe', 'skills': ['typing']}]}
+        assert encode(team) == data
+        assert encode(Team(joe, [])) == {'lead': data['members'][0],
+                                         'members': []}
+        assert compile_decoder(Team)(data) == team
+        encode = compile_encoder(Team, flat=True)
+        assert encode(team) == [None, [['Joe', ['typing']]]]
+
+    def test_namedtuple_other_module(self):
+        moda = make_module('moda', TEAM_SOURCE)
+        encode = compile_encoder(moda.Emp)
+        assert encode(moda.Emp(1, None)) == {'id': 1, 'boss': None}
+        boss = moda.Boss()
+        assert compile_encoder(moda.Emp, flat=True)(moda.Emp(1, boss)) == \
+            [1, boss]
+
+    def test_union(self):
+        Emp = NamedTuple('Emp', [('name', str)])
+        encode = compile_encoder(Union[int, Emp, typing.List[Emp]])
+        assert encode(1) == 1
+        assert encode(Emp('Joe')) == {'name': 'Joe'}
+        assert encode([Emp('Joe')]) == [{'name': 'Joe'}]
+
+    def test_union_order(self):
+        Emp = NamedTuple('Emp', [('name', str)])
+        X = TypeVar('X')
+        for tp in [Union[X, Emp], Union[Emp, X]]:
+            encode = compile_encoder(tp)
+            assert encode(Emp('Joe')) == {'name': 'Joe'}
+            assert encode(1) == 1
+
+    def test_errors(self):
+        with self.assertRaises(TypeError):
+            compile_encoder(Union)
+        with self.assertRaises(TypeError):
+            compile_encoder(42)
+
+
 class CastTests(TestCase):
 
     def test_basics(self):
@@ -850,6 +1379,118 @@ class CastTests(TestCase):
         cast('hello', 42)
 
 
+class PickleTests(TestCase):
+
+    def roundtrips(self, tp):
+        for proto in range(pickle.HIGHEST_PROTOCOL + 1):
+            yield pickle.loads(pickle.dumps(tp, proto))
+
+    def test_subscripted(self):
+        for tp in [typing.Dict[str, typing.List[int]], Union[int, None],
+                   Optional[SimpleMapping[str, int]],
+                   typing.Iterable[Tuple[int, ...]],
+                   typing.SupportsAbs[int], Generic[KT, VT]]:
+            for copy in self.roundtrips(tp):
+                self.assertIs(copy, tp)
+
+    def test_tuple_and_callable(self):
+        for tp in [Tuple[int, None], Tuple[None, ...], Tuple[()],
+                   Callable[[int, None], str], Callable[..., None],
+                   Callable[[], int]]:
+            for copy in self.roundtrips(tp):
+                self.assertEqual(copy, tp)
+                self.assertEqual(repr(copy), repr(tp))
+
+    def test_by_reference(self):
+        for tp in [Any, Union, Optional, Tuple, Callable, typing.List,
+                   typing.SupportsInt, SimpleMapping, T]:
+            for copy in self.roundtrips(tp):
+                self.assertIs(copy, tp)
+
+    def test_compact(self):
+        tp = typing.Dict[str, typing.List[int]]
+        self.assertLess(len(pickle.dumps(tp, 2)), 150)
+
+
+class FingerprintTests(TestCase):
+
+    def test_distinct(self):
+        types = [int, None, Any, typing.List, typing.List[int],
+                 typing.List[str], typing.Sequence[int], Tuple[int],
+                 Tuple[int, ...], Callable[[int], str],
+                 Callable[..., str], Callable[[], int], Union[int, str],
+                 T, KT, typing.Pattern[str], SimpleMapping[str, int],
+                 typing._ForwardRef('int'), Generic[T]]
+        digests = set(typing.fingerprint(t) for t in types)
+        self.assertEqual(len(digests), len(types))
+        self.assertEqual(typing.fingerprint(None),
+                         typing.fingerprint(type(None)))
+
+    def test_union_order(self):
+        self.assertEqual(typing.fingerprint(Union[int, str, float]),
+                         typing.fingerprint(Union[float, str, int]))
+
+    def test_typevar_module(self):
+        module = make_module('typevar_module',
+                             "from typing import TypeVar\n"
+                             "T = TypeVar('T')\n")
+        self.assertEqual(repr(module.T), repr(T))
+        self.assertNotEqual(typing.fingerprint(module.T),
+                            typing.fingerprint(T))
+
+    def test_memoized(self):
+        tp = typing.Dict[str, typing.List[float]]
+        digest = typing.fingerprint(tp)
+        self.assertIs(typing.fingerprint(tp), digest)
+
+        class C(tp):
+            pass
+
+        self.assertNotEqual(typing.fingerprint(C), digest)
+
+    def test_cache_weak(self):
+        import gc
+        import weakref
+        typing.fingerprint.cache_clear()
+        typing.fingerprint(int)
+        self.assertEqual(typing.fingerprint(int), typing.fingerprint(int))
+        info = typing.fingerprint.cache_info()
+        self.assertEqual((info.hits, info.misses), (2, 1))
+
+        class C(typing.List[int]):
+            pass
+
+        digest = typing.fingerprint(C)
+        self.assertNotIn('__fingerprint__', vars(C))
+        self.assertEqual(typing.fingerprint(C), digest)
+        ref = weakref.ref(C)
+        del C
+        gc.collect()
+        self.assertIsNone(ref())
+
+    def test_not_a_type(self):
+        with self.assertRaises(TypeError):
+            typing.fingerprint(42)
+
+    def test_stable(self):
+        import os
+        import subprocess
+        tp = typing.Mapping[str, Union[Tuple[int, ...], SimpleMapping]]
+        code = '\n'.join([
+            "import sys, typing, test_typing",
+            "from typing import Mapping, Tuple, Union",
+            "tp = Mapping[str, Union[Tuple[int, ...],",
+            "                        test_typing.SimpleMapping]]",
+            "sys.stdout.write(typing.fingerprint(tp))",
+        ])
+        cwd = os.path.dirname(os.path.abspath(typing.__file__))
+        for seed in ('1', '2'):
+            env = dict(os.environ, PYTHONHASHSEED=seed)
+            out = subprocess.check_output([sys.executable, '-c', code],
+                                          env=env, cwd=cwd)
+            self.assertEqual(out.decode('ascii'), typing.fingerprint(tp))
+
+
 class ForwardRefTests(TestCase):
 
     def test_basics(self):
@@ -891,6 +1532,48 @@ class ForwardRefTests(TestCase):
         with self.assertRaises(TypeError):
             isinstance(42, fr)
 
+    def test_code_cache(self):
+        fr1 = typing._ForwardRef('List[int]')
+        fr2 = typing._ForwardRef('List[int]')
+        assert fr1 is not fr2
+        assert fr1.__forward_code__ is fr2.__forward_code__
+
+    def test_frame_not_kept(self):
+        import gc
+        import weakref
+
+        class Big:
+            pass
+
+        def make():
+            big = Big()
+
+            class Local:
+                pass
+
+            fr = typing._ForwardRef('Local')
+            return fr, Local, weakref.ref(big)
+
+        fr, Local, big = make()
+        gc.collect()
+        assert big() is None
+        assert fr.__forward_frame__ is None
+        assert fr.__forward_locals__ == {'Local': Local}
+        assert issubclass(Local, fr)
+
+    def test_keep_frames(self):
+        typing._ForwardRef.keep_frames = True
+        try:
+            fr = typing._ForwardRef('Later')
+        finally:
+            typing._ForwardRef.keep_frames = False
+
+        class Later:
+            pass
+
+        assert fr.__forward_frame__ is not None
+        assert issubclass(Later, fr)
+
     def test_union_forward(self):
 
         def foo(a: Union['T']):
@@ -1010,6 +1693,174 @@ class ForwardRefTests(TestCase):
         assert hints == {'a': ns['C'], 'return': ns['D']}
 
 
+class GetTypeHintsCacheTests(TestCase):
+
+    def test_cached(self):
+
+        def foo(a: 'Employee', b: int = None) -> 'typing.List[int]':
+            pass
+
+        get_type_hints.cache_clear()
+        h1 = get_type_hints(foo)
+        h2 = get_type_hints(foo)
+        self.assertEqual(h1, {'a': Employee, 'b': Optional[int],
+                              'return': typing.List[int]})
+        self.assertEqual(h1, h2)
+        assert h1 is not h2
+        info = get_type_hints.cache_info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (1, 1, 1))
+        get_type_hints.cache_clear()
+        assert not hasattr(foo, '__type_hints_cache__')
+        self.assertEqual(get_type_hints.cache_info().currsize, 0)
+
+    def test_invalidation(self):
+
+        def foo(a: int = None):
+            pass
+
+        self.assertEqual(get_type_hints(foo), {'a': Optional[int]})
+        foo.__defaults__ = (0,)
+        self.assertEqual(get_type_hints(foo), {'a': int})
+        foo.__annotations__ = {'a': 'str'}
+        self.assertEqual(get_type_hints(foo), {'a': str})
+
+    def test_kwdefaults_invalidation(self):
+
+        def foo(*, a: int):
+            pass
+
+        self.assertEqual(get_type_hints(foo), {'a': int})
+        foo.__kwdefaults__ = {'a': None}
+        self.assertEqual(get_type_hints(foo), {'a': Optional[int]})
+
+    def test_methods(self):
+
+        class C:
+            def foo(self, a: 'Employee'):
+                pass
+
+        get_type_hints(C.foo)
+        self.assertEqual(get_type_hints(C().foo), {'a': Employee})
+        assert hasattr(C.foo, '__type_hints_cache__')
+
+    def test_forward_cache(self):
+        module = make_module('forward_cache_module',
+                             "X = int\n"
+                             "def f(a: 'X'): pass\n"
+                             "def g(b: 'X'): pass\n"
+                             "def h(c: 'X'): pass\n")
+        sys.modules[module.__name__] = module
+        self.addCleanup(sys.modules.pop, module.__name__)
+        typing._forward_cache.cache_clear()
+        self.assertEqual(get_type_hints(module.f), {'a': int})
+        self.assertEqual(get_type_hints(module.g), {'b': int})
+        info = typing._forward_cache.cache_info()
+        self.assertEqual((info.hits, info.misses), (1, 1))
+        # Rebinding a global used by the annotation invalidates the entry.
+        module.X = str
+        self.assertEqual(get_type_hints(module.h), {'c': str})
+        info = typing._forward_cache.cache_info()
+        self.assertEqual((info.hits, info.misses), (1, 2))
+
+    def test_forward_cache_namespaces(self):
+        import gc
+        import weakref
+        ns = {'X': int}
+        exec("def f(a: 'X'): pass\n", ns)
+        typing._forward_cache.cache_clear()
+        self.assertEqual(get_type_hints(ns['f']), {'a': int})
+        self.assertEqual(len(typing._forward_cache), 0)
+
+        def load():
+            module = make_module('forward_cache_module',
+                                 "def f(a: 'int'): pass\n")
+            sys.modules[module.__name__] = module
+            try:
+                self.assertEqual(get_type_hints(module.f), {'a': int})
+            finally:
+                del sys.modules[module.__name__]
+            return weakref.ref(module)
+
+        ref = load()
+        self.assertEqual(len(typing._forward_cache), 1)
+        gc.collect()
+        self.assertIsNone(ref())
+
+
+BATCH_MODULE = """
+from typing import List, Optional, no_type_check
+
+class Node:
+
+    def add(self, child: 'Node') -> 'List[Node]':
+        pass
+
+    @staticmethod
+    def make(label: str = None) -> 'Node':
+        pass
+
+    @classmethod
+    def root(cls) -> 'Node':
+        pass
+
+    def plain(self):
+        pass
+
+    class Edge:
+
+        def follow(self) -> 'Node':
+            pass
+
+def walk(node: 'Node', depth: int = 0) -> 'Optional[Node]':
+    pass
+
+@no_type_check
+def skipped(node: 'Nonexistent'):
+    pass
+"""
+
+
+class BatchTypeHintsTests(TestCase):
+
+    def make_module(self):
+        import types
+        module = types.ModuleType('batch_module')
+        exec(BATCH_MODULE, module.__dict__)
+        return module
+
+    def test_module(self):
+        module = self.make_module()
+        hints = get_module_type_hints(module)
+        self.assertEqual(sorted(hints), ['Node.Edge.follow', 'Node.add',
+                                         'Node.make', 'Node.root', 'walk'])
+        Node = module.Node
+        self.assertEqual(hints['walk'], {'node': Node, 'depth': int,
+                                         'return': Optional[Node]})
+        self.assertEqual(hints['Node.add'], get_type_hints(Node.add))
+        self.assertEqual(hints['Node.make'], {'label': Optional[str],
+                                              'return': Node})
+        self.assertEqual(hints['Node.root'], {'return': Node})
+        self.assertEqual(hints['Node.Edge.follow'], {'return': Node})
+
+    def test_class(self):
+        module = self.make_module()
+        hints = get_class_type_hints(module.Node)
+        self.assertEqual(sorted(hints), ['Edge.follow', 'add', 'make', 'root'])
+        self.assertEqual(hints['add'], {'child': module.Node,
+                                        'return': typing.List[module.Node]})
+
+    def test_shares_cache(self):
+        module = self.make_module()
+        get_type_hints.cache_clear()
+        get_module_type_hints(module)
+        self.assertEqual(get_type_hints.cache_info().misses, 5)
+        get_type_hints(module.walk)
+        self.assertEqual(get_type_hints.cache_info().hits, 1)
+        # The results are copies.
+        get_module_type_hints(module)['walk'].clear()
+        assert get_type_hints(module.walk)
+
+
 class OverloadTests(TestCase):
 
     def test_overload_exists(self):
@@ -1038,6 +1889,141 @@ class OverloadTests(TestCase):
 
         blah()
 
+    def test_dispatch(self):
+        from typing import overload, dispatch_overloads
+
+        @overload
+        def describe(x: int) -> str:
+            return 'int'
+
+        @overload
+        def describe(x: typing.Sequence[int],
+                     y: typing.Callable[[int], int] = None) -> str:
+            return 'sequence'
+
+        @overload
+        def describe(x: str, **kwargs: int) -> str:
+            return 'str'
+
+        @dispatch_overloads
+        def describe(x, *args, **kwargs):
+            return 'other'
+
+        self.assertEqual(describe(1), 'int')
+        self.assertEqual(describe(True), 'int')
+        self.assertEqual(describe([1]), 'sequence')
+        self.assertEqual(describe((), len), 'sequence')
+        self.assertEqual(describe((), None), 'sequence')
+        self.assertEqual(describe((), 1), 'other')
+        self.assertEqual(describe(1.0), 'other')
+        self.assertEqual(describe(x=1), 'int')
+        self.assertEqual(describe('', a=1), 'str')
+        self.assertEqual(describe('', a=''), 'other')
+        self.assertEqual(describe([], y=None), 'sequence')
+        self.assertEqual(describe(1, 2, 3), 'other')
+        self.assertEqual(describe.__name__, 'describe')
+        self.assertEqual(len(describe.overloads), 3)
+        self.assertIs(describe.dispatch(int), describe.overloads[0])
+        self.assertIs(describe.dispatch(list, y=type(None)),
+                      describe.overloads[1])
+
+    def test_dispatch_method(self):
+        from typing import overload, dispatch_overloads
+
+        class C:
+
+            @overload
+            def meth(self, x: int) -> str:
+                return 'int'
+
+            @dispatch_overloads
+            def meth(self, x):
+                return 'other'
+
+        self.assertEqual(C().meth(1), 'int')
+        self.assertEqual(C().meth(''), 'other')
+
+    def test_dispatch_none(self):
+        from typing import overload, dispatch_overloads
+
+        @overload
+        def utf8(value: None) -> None:
+            return None
+
+        @overload
+        def utf8(value: bytes) -> bytes:
+            return value
+
+        @overload
+        def utf8(value: str) -> bytes:
+            return value.encode('utf-8')
+
+        @dispatch_overloads
+        def utf8(value):
+            raise TypeError
+
+        self.assertIsNone(utf8(None))
+        self.assertEqual(utf8(b'a'), b'a')
+        self.assertEqual(utf8('a'), b'a')
+        self.assertIs(utf8.dispatch(type(None)), utf8.overloads[0])
+
+    def test_dispatch_methods_same_name(self):
+        from typing import overload, dispatch_overloads
+
+        class A:
+
+            @overload
+            def meth(self, x: int) -> str:
+                return 'int'
+
+            def meth(self, x):
+                return 'A'
+
+        class B:
+
+            @overload
+            def meth(self, x: str) -> str:
+                return 'str'
+
+            @dispatch_overloads
+            def meth(self, x):
+                return 'B'
+
+        self.assertEqual(A().meth(1), 'A')
+        self.assertEqual(B().meth(1), 'B')
+        self.assertEqual(B().meth(''), 'str')
+        self.assertEqual(len(B.meth.overloads), 1)
+        # A's variants were dropped once its implementation was seen.
+        self.assertNotIn('meth', [name for _, name, _
+                                  in typing._overload_registry.values()])
+
+    def test_dispatch_register(self):
+        from typing import overload, dispatch_overloads
+
+        class M(object):
+            pass
+
+        @overload
+        def f(x: typing.Mapping) -> str:
+            return 'mapping'
+
+        @dispatch_overloads
+        def f(x):
+            return 'other'
+
+        self.assertEqual(f(M()), 'other')
+        typing.Mapping.__extra__.register(M)
+        self.assertEqual(f(M()), 'mapping')
+
+    def test_dispatch_without_overloads(self):
+        from typing import dispatch_overloads
+
+        with self.assertRaises(TypeError):
+
+            @dispatch_overloads
+            def undeclared():
+                pass
+
 
 PY35 = sys.version_info[:2] >= (3, 5)
 
@@ -1357,6 +2343,131 @@ class NamedTupleTests(TestCase):
             jane2 = pickle.loads(z)
             self.assertEqual(jane2, jane)
 
+    def test_namedtuple_api(self):
+        Point = NamedTuple('Point', [('x', int), ('y', int)])
+        p = Point(1, y=2)
+        self.assertEqual(p, (1, 2))
+        self.assertEqual(repr(p), 'Point(x=1, y=2)')
+        self.assertEqual(Point.__doc__, 'Point(x, y)')
+        self.assertEqual(Point.y.__doc__, 'Alias for field number 1')
+        self.assertEqual(Point.__module__, __name__)
+        self.assertEqual(Point.__slots__, ())
+        self.assertEqual(Point._make([3, 4]), (3, 4))
+        self.assertEqual(p._replace(y=5), (1, 5))
+        self.assertEqual(dict(p._asdict()), {'x': 1, 'y': 2})
+        with self.assertRaises(AttributeError):
+            p.z = 3
+        with self.assertRaises(TypeError):
+            Point._make([1])
+        with self.assertRaises(ValueError):
+            p._replace(z=3)
+        with self.assertRaises(TypeError):
+            Point(1)
+        with self.assertRaises(TypeError):
+            Point(1, 2, 3)
+        with self.assertRaises(TypeError):
+            Point(1, x=2)
+        with self.assertRaises(TypeError):
+            Point(1, z=2)
+
+    def test_namedtuple_signature(self):
+        import inspect
+        Point = NamedTuple('Point', [('x', int), ('y', int)])
+        self.assertEqual(str(inspect.signature(Point)), '(x, y)')
+
+        class Point3(Point):
+
+            def __new__(cls, x, y=0, z=0):
+                return super().__new__(cls, x, y)
+
+        self.assertEqual(str(inspect.signature(Point3)), '(x, y=0, z=0)')
+
+    @skipUnless(sys.version_info[:2] >= (3, 7), 'New in 3.7')
+    def test_namedtuple_field_defaults(self):
+        Point = NamedTuple('Point', [('x', int), ('y', int)])
+        self.assertEqual(Point._field_defaults, {})
+        self.assertIs(Point._fields_defaults, Point._field_defaults)
+
+    def test_invalid_names(self):
+        for typename, fields in [('1x', []), ('class', []),
+                                 ('P', [('_x', int)]),
+                                 ('P', [('x', int), ('x', str)]),
+                                 ('P', [('x y', int)])]:
+            with self.assertRaises(ValueError):
+                NamedTuple(typename, fields)
+
+    def test_validate(self):
+
+        class Boss(object):
+            pass
+
+        Emp = NamedTuple('Emp', [('name', typing.Text),
+                                 ('ids', typing.List[int]),
+                                 ('boss', 'Optional[Boss]')])
+        self.assertEqual(len(Emp._field_checkers), 3)
+        Emp('Joe', [1], None)._validate()
+        Emp('Jim', [], Boss())._validate()
+        with self.assertRaises(TypeError):
+            Emp('Jim', ['1'], None)._validate()
+        with self.assertRaises(TypeError):
+            Emp('Jim', [], 'Joe')._validate()
+
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class RecordBatchTests(TestCase):
+
+    Row = NamedTuple('Row', [('id', int), ('score', Optional[float]),
+                             ('ok', bool), ('name', typing.Text),
+                             ('raw', Optional[bytes]),
+                             ('tags', typing.List[str])])
+
+    rows = [(1, 0.5, True, 'a', b'x', ['t']),
+            (2, None, False, 'bc', None, []),
+            (3, 2.0, True, '', b'', ['u', 'v'])]
+
+    def check_batch(self, use_numpy):
+        batch = typing.RecordBatch(self.Row, self.rows, use_numpy=use_numpy)
+        self.assertEqual(batch.use_numpy, use_numpy)
+        self.assertEqual(len(batch), 3)
+        records = batch.to_records()
+        self.assertEqual(records, [self.Row(*row) for row in self.rows])
+        self.assertTrue(all(type(r) is self.Row for r in records))
+        self.assertIs(type(records[0].ok), bool)
+        self.assertEqual(batch[1], self.Row(*self.rows[1]))
+        self.assertEqual(batch[-1], self.Row(*self.rows[-1]))
+        self.assertEqual(list(batch), records)
+        self.assertEqual(batch[1:].to_records(), records[1:])
+        self.assertEqual(list(batch.column('id')), [1, 2, 3])
+        self.assertEqual(list(batch.column('score')), [0.5, 0.0, 2.0])
+        self.assertGreater(batch.nbytes, 0)
+        with self.assertRaises(IndexError):
+            batch[3]
+        empty = typing.RecordBatch(self.Row, use_numpy=use_numpy)
+        self.assertEqual(len(empty), 0)
+        self.assertEqual(empty.to_records(), [])
+
+    def test_array(self):
+        self.check_batch(False)
+        batch = typing.RecordBatch(self.Row, self.rows, use_numpy=False)
+        self.assertIn(batch.column('id').typecode, ('q', 'l'))
+        self.assertEqual(batch.column('name'), ['a', 'bc', ''])
+
+    @skipUnless(numpy, 'requires NumPy')
+    def test_numpy(self):
+        self.check_batch(True)
+        batch = typing.RecordBatch(self.Row, self.rows)
+        self.assertEqual(batch.column('id').dtype, numpy.dtype('i8'))
+        self.assertEqual(batch.column('tags').dtype, numpy.dtype(object))
+
+    def test_wrong_rows(self):
+        with self.assertRaises(TypeError):
+            typing.RecordBatch(self.Row, [(1, 2)], use_numpy=False)
+
 
 class IOTests(TestCase):
 
@@ -1481,5 +2592,117 @@ class AllTests(TestCase):
         assert 'Text' in a
 
 
+class ProfilingTests(TestCase):
+
+    def test_profiling(self):
+        typing.profiling_report(clear=True)
+        typing.enable_profiling()
+        try:
+
+            class C(Generic[T]):
+                pass
+
+            C[Employee]
+            Union[Employee, Manager, int]
+        finally:
+            typing.disable_profiling()
+        C[int]
+        report = typing.profiling_report(clear=True).splitlines()
+        rows = [line.split() for line in report[1:-1]]
+        assert ['typing.GenericMeta', __name__, '2'] in [r[:3] for r in rows]
+        assert ['typing.UnionMeta', __name__, '1'] in [r[:3] for r in rows]
+        assert report[-1].split()[:2] == ['total', '3']
+        assert len(typing.profiling_report().splitlines()) == 2
+
+    def test_disable_restores(self):
+        typing.enable_profiling()
+        new = typing.GenericMeta.__dict__['__new__'].__func__
+        typing.disable_profiling()
+        restored = typing.GenericMeta.__dict__['__new__'].__func__
+        assert restored is new.__profiled__
+
+
+class StatsTests(TestCase):
+
+    def test_stats(self):
+        typing.stats(clear=True)
+        typing.enable_stats()
+        try:
+            typing.List[Employee]
+            typing.List[Employee]
+            isinstance([], typing.Sequence)
+            issubclass(Manager, Union[Employee, int])
+        finally:
+            typing.disable_stats()
+        typing.List[int]
+        calls = typing.stats(clear=True)['calls']
+        getitem = calls['GenericMeta', '__getitem__']
+        assert getitem['count'] == 2
+        assert getitem['types'] == {typing.List: 2}
+        assert getitem['seconds'] > 0
+        assert calls['GenericMeta', '__instancecheck__']['count'] == 1
+        assert calls['UnionMeta', '__subclasscheck__']['count'] == 1
+        assert typing.stats()['calls'] == {}
+
+    def test_stats_types_weak(self):
+        import gc
+        import weakref
+
+        class C(Generic[T]):
+            pass
+
+        typing.stats(clear=True)
+        typing.enable_stats()
+        try:
+            isinstance(1, C)
+        finally:
+            typing.disable_stats()
+        calls = typing.stats()['calls']
+        assert calls['GenericMeta', '__instancecheck__']['types'] == {C: 1}
+        del calls
+        ref = weakref.ref(C)
+        del C
+        gc.collect()
+        assert ref() is None
+        calls = typing.stats(clear=True)['calls']
+        assert calls['GenericMeta', '__instancecheck__']['count'] == 1
+
+    def test_cache_stats(self):
+        typing._generic_cache.cache_clear()
+        typing.List[Employee]
+        typing.List[Employee]
+        caches = typing.stats()['caches']
+        assert caches['_generic_cache']['hits'] == 1
+        assert caches['_generic_cache']['hit_ratio'] == 0.5
+        assert '_union_cache' in caches
+
+    def test_disable_restores(self):
+        typing.enable_stats()
+        typing.disable_stats()
+        assert not hasattr(typing.GenericMeta.__getitem__, '__stats_wrapped__')
+
+
+class LazyTests(TestCase):
+
+    def test_lazy_mode(self):
+        import os
+        import subprocess
+        code = '\n'.join([
+            "import typing",
+            "assert 'TextIO' not in vars(typing)",
+            "assert 'TextIO' in dir(typing)",
+            "from typing.io import TextIO",
+            "assert TextIO is typing.TextIO",
+            "assert typing.IO in TextIO.__mro__",
+            "assert issubclass(int, typing.SupportsInt)",
+            "assert typing.ItemsView[int, str] is typing.ItemsView[int, str]",
+            "assert not hasattr(typing, 'Nonexistent')",
+            "from typing import *",
+        ])
+        env = dict(os.environ, PYTHONTYPINGLAZY='1')
+        cwd = os.path.dirname(os.path.abspath(typing.__file__))
+        subprocess.check_call([sys.executable, '-c', code], env=env, cwd=cwd)
+
+
 if __name__ == '__main__':
     main()